@@ -6,6 +6,7 @@ https://home-assistant.io/components/camera.mqtt/
 """
 
 import asyncio
+from functools import partial
 import logging
 
 import voluptuous as vol
@@ -16,7 +17,8 @@ from homeassistant.core import callback
 from homeassistant.const import CONF_NAME
 from homeassistant.components import mqtt, camera
 from homeassistant.components.camera import Camera, PLATFORM_SCHEMA
-from homeassistant.components.mqtt.discovery import MQTT_DISCOVERY_NEW
+from homeassistant.components.mqtt.discovery import (
+    MQTT_DISCOVERY_NEW, async_setup_discovered)
 from homeassistant.helpers import config_validation as cv
 
 _LOGGER = logging.getLogger(__name__)
@@ -42,18 +44,21 @@ async def async_setup_platform(hass: HomeAssistantType, config: ConfigType,
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Set up MQTT camera dynamically through MQTT discovery."""
-    async def async_discover(discovery_payload):
-        """Discover and add a MQTT camera."""
-        config = PLATFORM_SCHEMA(discovery_payload)
-        await _async_setup_entity(hass, config, async_add_entities)
+    async def async_discover(discovery_payloads):
+        """Discover and add MQTT cameras."""
+        await async_setup_discovered(
+            discovery_payloads, PLATFORM_SCHEMA,
+            partial(_async_setup_entity, hass), async_add_entities)
 
     async_dispatcher_connect(
         hass, MQTT_DISCOVERY_NEW.format(camera.DOMAIN, 'mqtt'),
         async_discover)
 
 
-async def _async_setup_entity(hass, config, async_add_entities):
+async def _async_setup_entity(hass, config, async_add_entities,
+                              discovery_hash=None):
     """Set up the MQTT Camera."""
+    # pylint: disable=unused-argument
     async_add_entities([MqttCamera(
         config.get(CONF_NAME),
         config.get(CONF_UNIQUE_ID),
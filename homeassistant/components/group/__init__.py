@@ -381,7 +381,7 @@ class Group(Entity):
         """
         group = Group(
             hass, name,
-            order=len(hass.states.async_entity_ids(DOMAIN)),
+            order=hass.states.async_entity_ids_count(DOMAIN),
             visible=visible, icon=icon, view=view, control=control,
             user_defined=user_defined, entity_ids=entity_ids, mode=mode
         )
@@ -4,22 +4,30 @@ Provide pre-made queries on top of the recorder component.
 For more details about this component, please refer to the documentation at
 https://home-assistant.io/components/history/
 """
-from collections import defaultdict
+from collections import defaultdict, deque
 from datetime import timedelta
 from itertools import groupby
+import json
 import logging
+import threading
 import time
 
+from aiohttp import web
+from aiohttp.hdrs import CONTENT_TYPE
 import voluptuous as vol
 
 from homeassistant.const import (
-    HTTP_BAD_REQUEST, CONF_DOMAINS, CONF_ENTITIES, CONF_EXCLUDE, CONF_INCLUDE)
+    HTTP_BAD_REQUEST, CONF_DOMAINS, CONF_ENTITIES, CONF_EXCLUDE, CONF_INCLUDE,
+    CONTENT_TYPE_JSON, EVENT_STATE_CHANGED)
+import homeassistant.core as ha
 import homeassistant.util.dt as dt_util
-from homeassistant.components import recorder, script
+from homeassistant.components import recorder
 from homeassistant.components.http import HomeAssistantView
 from homeassistant.const import ATTR_HIDDEN
+from homeassistant.components.recorder import snapshot, statistics
 from homeassistant.components.recorder.util import session_scope, execute
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.json import JSONEncoder
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -27,16 +35,27 @@ DOMAIN = 'history'
 DEPENDENCIES = ['recorder', 'http']
 
 CONF_ORDER = 'use_include_order'
+CONF_RECENT_WINDOW = 'recent_window'
+CONF_RECENT_MAX_STATES = 'recent_max_states'
+
+DATA_RECENT_HISTORY = 'history_recent'
+
+DEFAULT_RECENT_MAX_STATES = 5000
 
 CONFIG_SCHEMA = vol.Schema({
     DOMAIN: recorder.FILTER_SCHEMA.extend({
         vol.Optional(CONF_ORDER, default=False): cv.boolean,
+        vol.Optional(CONF_RECENT_WINDOW): cv.time_period,
+        vol.Optional(CONF_RECENT_MAX_STATES,
+                     default=DEFAULT_RECENT_MAX_STATES): cv.positive_int,
     })
 }, extra=vol.ALLOW_EXTRA)
 
-SIGNIFICANT_DOMAINS = ('thermostat', 'climate')
 IGNORE_DOMAINS = ('zone', 'scene',)
 
+# Most states encoded at once when streaming the history
+STREAM_CHUNK_SIZE = 1000
+
 
 def last_recorder_run(hass):
     """Retrieve the last closed recorder run from the database."""
@@ -53,35 +72,41 @@ def last_recorder_run(hass):
 
 
 def get_significant_states(hass, start_time, end_time=None, entity_ids=None,
-                           filters=None, include_start_time_state=True):
+                           filters=None, include_start_time_state=True,
+                           minimal_response=False, no_attributes=False):
     """
     Return states changes during UTC period start_time - end_time.
 
     Significant states are all states where there is a state change,
     as well as all states from certain domains (for instance
     thermostat so that we get current temperature in our graphs).
+    The recorder stores if a state is significant when writing it.
+
+    With no_attributes the attributes are not decoded and the states are
+    returned without them. See states_to_json for minimal_response.
     """
     timer_start = time.perf_counter()
     from homeassistant.components.recorder.models import States
 
-    with session_scope(hass=hass) as session:
-        query = session.query(States).filter(
-            (States.domain.in_(SIGNIFICANT_DOMAINS) |
-             (States.last_changed == States.last_updated)) &
-            (States.last_updated > start_time))
+    recent = hass.data.get(DATA_RECENT_HISTORY)
+    if recent is not None and filters is not None:
+        result = recent.significant_states(
+            start_time, end_time, entity_ids, filters,
+            include_start_time_state, no_attributes)
+        if result is not None:
+            if minimal_response:
+                _minimal_response(result)
+            return result
 
-        if filters:
-            query = filters.apply(query, entity_ids)
-
-        if end_time is not None:
-            query = query.filter(States.last_updated < end_time)
+    with session_scope(hass=hass) as session:
+        query = _significant_states_query(
+            session, start_time, end_time, entity_ids, filters,
+            no_attributes)
 
         query = query.order_by(States.last_updated)
 
-        states = (
-            state for state in execute(query)
-            if (_is_significant(state) and
-                not state.attributes.get(ATTR_HIDDEN, False)))
+        states = execute(
+            query, _state_without_attributes if no_attributes else None)
 
     if _LOGGER.isEnabledFor(logging.DEBUG):
         elapsed = time.perf_counter() - timer_start
@@ -90,16 +115,182 @@ def get_significant_states(hass, start_time, end_time=None, entity_ids=None,
 
     return states_to_json(
         hass, states, start_time, entity_ids, filters,
-        include_start_time_state)
+        include_start_time_state, minimal_response, no_attributes)
+
+
+def stream_significant_states(hass, start_time, end_time=None,
+                              entity_ids=None, filters=None,
+                              include_start_time_state=True,
+                              minimal_response=False, no_attributes=False):
+    """Yield the JSON of get_significant_states in chunks.
+
+    States are read from the cursor entity by entity and at most
+    STREAM_CHUNK_SIZE states are encoded at once, so memory use does not
+    grow with the period.
+    """
+    from homeassistant.components.recorder.models import States
+
+    start_states = {}
+    if include_start_time_state:
+        for state in get_states(hass, start_time, entity_ids, filters=filters,
+                                no_attributes=no_attributes):
+            state.last_changed = start_time
+            state.last_updated = start_time
+            start_states[state.entity_id] = state
+
+    with session_scope(hass=hass) as session:
+        query = _significant_states_query(
+            session, start_time, end_time, entity_ids, filters,
+            no_attributes)
+
+        query = query.order_by(States.entity_id, States.last_updated) \
+            .yield_per(STREAM_CHUNK_SIZE)
+
+        if no_attributes:
+            states = (_state_without_attributes(row) for row in query)
+        else:
+            states = (dbstate.to_native() for dbstate in query)
+        states = (state for state in states if state is not None)
+
+        yield '['
+        first = True
+        for _, group in _merge_start_states(states, start_states):
+            if not first:
+                yield ','
+            first = False
+            yield from _stream_states(group, minimal_response)
+        yield ']'
+
+
+def _merge_start_states(states, start_states):
+    """Group states sorted by entity id and add the start time states.
+
+    Entities that only have a start time state are included as well.
+    """
+    pending = sorted(start_states)
+    for ent_id, group in groupby(states, lambda state: state.entity_id):
+        while pending and pending[0] < ent_id:
+            start_id = pending.pop(0)
+            yield start_id, [start_states[start_id]]
+
+        if pending and pending[0] == ent_id:
+            pending.pop(0)
+            yield ent_id, _prepend(start_states[ent_id], group)
+        else:
+            yield ent_id, group
+
+    for start_id in pending:
+        yield start_id, [start_states[start_id]]
+
+
+def _prepend(first, rest):
+    """Yield first and then all items of rest."""
+    yield first
+    yield from rest
+
+
+def _stream_states(states, minimal_response=False):
+    """Yield the states of an entity as JSON array in chunks."""
+    chunk = ['[']
+    previous = None
+    for index, state in enumerate(states):
+        # The previous state is known not to be the last one here
+        if previous is not None:
+            if minimal_response and index > 1:
+                previous = _minimal_state(previous)
+            chunk.append(
+                json.dumps(previous, sort_keys=True, cls=JSONEncoder))
+            chunk.append(',')
+        previous = state
+        if len(chunk) >= 2 * STREAM_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    if previous is not None:
+        chunk.append(json.dumps(previous, sort_keys=True, cls=JSONEncoder))
+    chunk.append(']')
+    yield ''.join(chunk)
+
+
+def _significant_states_query(session, start_time, end_time, entity_ids,
+                              filters, no_attributes=False):
+    """Return the query for the significant states of a period."""
+    from homeassistant.components.recorder.models import States
+
+    query = _states_query(session, no_attributes).filter(
+        States.significant & (States.last_updated > start_time))
+
+    if filters:
+        query = filters.apply(query, entity_ids)
+
+    if end_time is not None:
+        query = query.filter(States.last_updated < end_time)
+
+    return query
+
+
+def _states_query(session, no_attributes):
+    """Return a query for states.
+
+    With no_attributes only the columns needed to create states without
+    attributes are selected. Convert its rows with
+    _state_without_attributes.
+    """
+    from homeassistant.components.recorder.models import States
+
+    if not no_attributes:
+        return session.query(States)
+
+    return session.query(
+        States.entity_id, States.state, States.last_changed,
+        States.last_updated, States.context_id, States.context_user_id)
+
+
+def _state_without_attributes(row):
+    """Convert a row of a no_attributes query to a state."""
+    from homeassistant.components.recorder.models import process_timestamp
+
+    return ha.State(
+        row.entity_id, row.state, None,
+        process_timestamp(row.last_changed),
+        process_timestamp(row.last_updated),
+        context=ha.Context(id=row.context_id, user_id=row.context_user_id))
+
+
+def _visible_state_without_attributes(row):
+    """Convert a row to a state without attributes unless it is hidden.
+
+    The query needs to select the serialized attributes as well. They are
+    only decoded when the state may be hidden.
+    """
+    attributes = row.attributes
+    if attributes is None:
+        attributes = row.shared_attrs
+
+    if attributes and '"{}"'.format(ATTR_HIDDEN) in attributes:
+        try:
+            if json.loads(attributes).get(ATTR_HIDDEN, False):
+                return None
+        except ValueError:
+            _LOGGER.exception("Error converting row to state: %s", row)
+            return None
+
+    return _state_without_attributes(row)
 
 
 def state_changes_during_period(hass, start_time, end_time=None,
-                                entity_id=None):
+                                entity_id=None, no_attributes=False):
     """Return states changes during UTC period start_time - end_time."""
     from homeassistant.components.recorder.models import States
 
+    recent = hass.data.get(DATA_RECENT_HISTORY)
+    if recent is not None:
+        result = recent.state_changes(
+            start_time, end_time, entity_id, no_attributes)
+        if result is not None:
+            return result
+
     with session_scope(hass=hass) as session:
-        query = session.query(States).filter(
+        query = _states_query(session, no_attributes).filter(
             (States.last_changed == States.last_updated) &
             (States.last_updated > start_time))
 
@@ -112,9 +303,11 @@ def state_changes_during_period(hass, start_time, end_time=None,
         entity_ids = [entity_id] if entity_id is not None else None
 
         states = execute(
-            query.order_by(States.last_updated))
+            query.order_by(States.last_updated),
+            _state_without_attributes if no_attributes else None)
 
-    return states_to_json(hass, states, start_time, entity_ids)
+    return states_to_json(hass, states, start_time, entity_ids,
+                          no_attributes=no_attributes)
 
 
 def get_last_state_changes(hass, number_of_states, entity_id):
@@ -142,9 +335,10 @@ def get_last_state_changes(hass, number_of_states, entity_id):
 
 
 def get_states(hass, utc_point_in_time, entity_ids=None, run=None,
-               filters=None):
+               filters=None, no_attributes=False):
     """Return the states at a specific point in time."""
-    from homeassistant.components.recorder.models import States
+    from homeassistant.components.recorder.models import (
+        States, StateAttributes)
 
     if run is None:
         run = recorder.run_information(hass, utc_point_in_time)
@@ -153,8 +347,6 @@ def get_states(hass, utc_point_in_time, entity_ids=None, run=None,
         if run is None:
             return []
 
-    from sqlalchemy import and_, func
-
     with session_scope(hass=hass) as session:
         if entity_ids and len(entity_ids) == 1:
             # Use an entirely different (and extremely fast) query if we only
@@ -169,41 +361,25 @@ def get_states(hass, utc_point_in_time, entity_ids=None, run=None,
 
             most_recent_state_ids = most_recent_state_ids.limit(1)
 
+            most_recent_state_ids = most_recent_state_ids.subquery()
+
         else:
             # We have more than one entity to look at (most commonly we want
             # all entities,) so we need to do a search on all states since the
-            # last recorder run started.
+            # last recorder run started, or the last snapshot after it.
+            most_recent_state_ids = snapshot.most_recent_state_ids(
+                session, run.start, utc_point_in_time)
 
-            most_recent_states_by_date = session.query(
-                States.entity_id.label('max_entity_id'),
-                func.max(States.last_updated).label('max_last_updated')
-            ).filter(
-                (States.last_updated >= run.start) &
-                (States.last_updated < utc_point_in_time)
-            )
+        query = _states_query(session, no_attributes)
 
-            if entity_ids:
-                most_recent_states_by_date.filter(
-                    States.entity_id.in_(entity_ids))
+        if no_attributes:
+            # The serialized attributes are needed to leave out hidden states
+            query = query.add_columns(
+                States.attributes, StateAttributes.shared_attrs).outerjoin(
+                    StateAttributes,
+                    States.attributes_id == StateAttributes.attributes_id)
 
-            most_recent_states_by_date = most_recent_states_by_date.group_by(
-                States.entity_id)
-
-            most_recent_states_by_date = most_recent_states_by_date.subquery()
-
-            most_recent_state_ids = session.query(
-                func.max(States.state_id).label('max_state_id')
-            ).join(most_recent_states_by_date, and_(
-                States.entity_id == most_recent_states_by_date.c.max_entity_id,
-                States.last_updated == most_recent_states_by_date.c.
-                max_last_updated))
-
-            most_recent_state_ids = most_recent_state_ids.group_by(
-                States.entity_id)
-
-        most_recent_state_ids = most_recent_state_ids.subquery()
-
-        query = session.query(States).join(
+        query = query.join(
             most_recent_state_ids,
             States.state_id == most_recent_state_ids.c.max_state_id
         ).filter((~States.domain.in_(IGNORE_DOMAINS)))
@@ -211,6 +387,9 @@ def get_states(hass, utc_point_in_time, entity_ids=None, run=None,
         if filters:
             query = filters.apply(query, entity_ids)
 
+        if no_attributes:
+            return execute(query, _visible_state_without_attributes)
+
         return [state for state in execute(query)
                 if not state.attributes.get(ATTR_HIDDEN, False)]
 
@@ -221,7 +400,9 @@ def states_to_json(
         start_time,
         entity_ids,
         filters=None,
-        include_start_time_state=True):
+        include_start_time_state=True,
+        minimal_response=False,
+        no_attributes=False):
     """Convert SQL results into JSON friendly data structure.
 
     This takes our state list and turns it into a JSON friendly data
@@ -230,13 +411,17 @@ def states_to_json(
     We also need to go back and create a synthetic zero data point for
     each list of states, otherwise our graphs won't start on the Y
     axis correctly.
+
+    With minimal_response, only the first and the last state of an entity
+    are states, the ones in between are [last_updated, state] pairs.
     """
     result = defaultdict(list)
 
     # Get the states at the start time
     timer_start = time.perf_counter()
     if include_start_time_state:
-        for state in get_states(hass, start_time, entity_ids, filters=filters):
+        for state in get_states(hass, start_time, entity_ids, filters=filters,
+                                no_attributes=no_attributes):
             state.last_changed = start_time
             state.last_updated = start_time
             result[state.entity_id].append(state)
@@ -249,9 +434,25 @@ def states_to_json(
     # Append all changes to it
     for ent_id, group in groupby(states, lambda state: state.entity_id):
         result[ent_id].extend(group)
+
+    if minimal_response:
+        _minimal_response(result)
+
     return result
 
 
+def _minimal_response(result):
+    """Replace all but the first and last state of each entity by pairs."""
+    for ent_states in result.values():
+        ent_states[1:-1] = [
+            _minimal_state(state) for state in ent_states[1:-1]]
+
+
+def _minimal_state(state):
+    """Return the [last_updated, state] pair of a state."""
+    return [state.last_updated, state.state]
+
+
 def get_state(hass, utc_point_in_time, entity_id, run=None):
     """Return a state at a specific point in time."""
     states = list(get_states(hass, utc_point_in_time, (entity_id,), run))
@@ -272,6 +473,14 @@ async def async_setup(hass, config):
         filters.included_domains = include.get(CONF_DOMAINS, [])
     use_include_order = conf.get(CONF_ORDER)
 
+    window = conf.get(CONF_RECENT_WINDOW)
+    instance = hass.data[recorder.DATA_INSTANCE]
+    if window is not None and EVENT_STATE_CHANGED not in instance.exclude_t:
+        recent = hass.data[DATA_RECENT_HISTORY] = RecentHistory(
+            hass, window, conf[CONF_RECENT_MAX_STATES],
+            instance.entity_filter)
+        hass.bus.async_listen(EVENT_STATE_CHANGED, recent.async_add_event)
+
     hass.http.register_view(HistoryPeriodView(filters, use_include_order))
     await hass.components.frontend.async_register_built_in_panel(
         'history', 'history', 'hass:poll-box')
@@ -324,12 +533,28 @@ class HistoryPeriodView(HomeAssistantView):
         if entity_ids:
             entity_ids = entity_ids.lower().split(',')
         include_start_time_state = 'skip_initial_state' not in request.query
+        minimal_response = 'minimal_response' in request.query
+        no_attributes = 'no_attributes' in request.query
 
         hass = request.app['hass']
 
-        result = await hass.async_add_job(
-            get_significant_states, hass, start_time, end_time,
-            entity_ids, self.filters, include_start_time_state)
+        resolution = request.query.get('resolution')
+        if resolution is not None:
+            if resolution not in statistics.RESOLUTIONS:
+                return self.json_message(
+                    'Invalid resolution', HTTP_BAD_REQUEST)
+            return await self._async_statistics(
+                hass, start_time, end_time, entity_ids, resolution)
+
+        if 'stream' in request.query and not self.use_include_order:
+            return await self._async_stream(
+                request, hass, start_time, end_time, entity_ids,
+                include_start_time_state, minimal_response, no_attributes)
+
+        result = await recorder.async_add_read_job(
+            hass, get_significant_states, hass, start_time, end_time,
+            entity_ids, self.filters, include_start_time_state,
+            minimal_response, no_attributes)
         result = list(result.values())
         if _LOGGER.isEnabledFor(logging.DEBUG):
             elapsed = time.perf_counter() - timer_start
@@ -352,6 +577,46 @@ class HistoryPeriodView(HomeAssistantView):
 
         return await hass.async_add_job(self.json, result)
 
+    async def _async_statistics(self, hass, start_time, end_time, entity_ids,
+                                resolution):
+        """Return the statistics of numeric sensors over a period."""
+        result = await recorder.async_add_read_job(
+            hass, statistics.get_statistics, hass, start_time, end_time,
+            entity_ids, resolution)
+
+        if entity_ids is None:
+            result = {entity_id: values for entity_id, values in result.items()
+                      if self.filters.is_included(entity_id)}
+
+        return await hass.async_add_job(self.json, list(result.values()))
+
+    async def _async_stream(self, request, hass, start_time, end_time,
+                            entity_ids, include_start_time_state,
+                            minimal_response, no_attributes):
+        """Stream the history as it is read from the database."""
+        chunks = stream_significant_states(
+            hass, start_time, end_time, entity_ids, self.filters,
+            include_start_time_state, minimal_response, no_attributes)
+
+        response = web.StreamResponse(
+            headers={CONTENT_TYPE: CONTENT_TYPE_JSON})
+        response.enable_compression()
+        await response.prepare(request)
+
+        try:
+            while True:
+                chunk = await recorder.async_add_read_job(
+                    hass, next, chunks, None)
+                if chunk is None:
+                    break
+                await response.write(chunk.encode('utf-8'))
+        finally:
+            # The generator holds the database session
+            await recorder.async_add_read_job(hass, chunks.close)
+
+        await response.write_eof()
+        return response
+
 
 class Filters:
     """Container for the configured include and exclude filters."""
@@ -363,6 +628,33 @@ class Filters:
         self.included_entities = []
         self.included_domains = []
 
+    def is_included(self, entity_id, entity_ids=None):
+        """Return if apply lets the states of an entity through.
+
+        Used for data that is not queried from the states table.
+        """
+        if entity_ids is not None:
+            return entity_id in entity_ids
+
+        domain = ha.split_entity_id(entity_id)[0]
+        if domain in IGNORE_DOMAINS:
+            return False
+
+        included = True
+        if self.excluded_domains and not self.included_domains:
+            included = domain not in self.excluded_domains
+            if self.included_entities:
+                included = included and entity_id in self.included_entities
+        elif self.included_domains:
+            included = (domain in self.included_domains or
+                        entity_id in self.included_entities)
+            if self.excluded_domains:
+                included = included and domain not in self.excluded_domains
+        elif self.included_entities:
+            included = entity_id in self.included_entities
+
+        return included and entity_id not in self.excluded_entities
+
     def apply(self, query, entity_ids=None):
         """Apply the include/exclude filter on domains and entities on query.
 
@@ -413,11 +705,170 @@ class Filters:
         return query
 
 
-def _is_significant(state):
-    """Test if state is significant for history charts.
+class RecentHistory:
+    """The recorded states of the recent past, kept in memory.
 
-    Will only test for things that are not filtered out in SQL.
+    Besides the states within the window, the state before them is kept
+    for every entity, so the state at any point in the window is known.
+    Queries that start within the window are answered without the
+    database.
     """
-    # scripts that are not cancellable will never change state
-    return (state.domain != 'script' or
-            state.attributes.get(script.ATTR_CAN_CANCEL))
+
+    def __init__(self, hass, window, max_states, entity_filter):
+        """Initialize the recent history.
+
+        Each entity keeps at most max_states states. Only the entities
+        that pass the entity_filter of the recorder are kept.
+        """
+        self.hass = hass
+        self.window = window
+        self.max_states = max_states
+        self.entity_filter = entity_filter
+        self.start = dt_util.utcnow()
+        # States of each entity, ordered by last_updated
+        self._states = {}
+        # Queries copy the states from the thread pool of the recorder
+        self._lock = threading.Lock()
+
+    @ha.callback
+    def async_add_event(self, event):
+        """Add the new state of a state_changed event."""
+        entity_id = event.data['entity_id']
+        if not self.entity_filter(entity_id):
+            return
+
+        new_state = event.data.get('new_state')
+        if new_state is None:
+            # Recorded as an empty state when the entity is removed
+            new_state = ha.State(
+                entity_id, '', None, event.time_fired, event.time_fired,
+                event.context)
+
+        window_start = dt_util.utcnow() - self.window
+        with self._lock:
+            states = self._states.get(entity_id)
+            if states is None:
+                states = self._states[entity_id] = deque(
+                    maxlen=self.max_states)
+                # None when the entity did not exist before
+                states.append(event.data.get('old_state'))
+            states.append(new_state)
+
+            # Keep the state before the window
+            while len(states) > 1 and states[1].last_updated < window_start:
+                states.popleft()
+
+    def _get(self, start_time, end_time, entity_ids):
+        """Return the state at start_time and the states after it.
+
+        Returns {'entity_id': (state or None, [list of states])}, or None
+        when not all states since start_time are in memory.
+        """
+        if start_time < self.start or \
+                start_time < dt_util.utcnow() - self.window:
+            return None
+
+        with self._lock:
+            buffered = {
+                entity_id: list(states)
+                for entity_id, states in self._states.items()
+                if entity_ids is None or entity_id in entity_ids}
+
+        # Entities without states in memory did not change since the start
+        if entity_ids is None:
+            current = self.hass.states.all()
+        else:
+            current = [self.hass.states.get(entity_id)
+                       for entity_id in entity_ids]
+        for state in current:
+            if state is not None and state.entity_id not in buffered:
+                buffered[state.entity_id] = [state]
+
+        result = {}
+        for entity_id, states in buffered.items():
+            if not self.entity_filter(entity_id):
+                continue
+            if states[0] is not None and \
+                    states[0].last_updated >= start_time:
+                return None
+
+            start_state = None
+            after = []
+            for state in states:
+                if state is None:
+                    continue
+                if state.last_updated < start_time:
+                    start_state = state
+                elif state.last_updated > start_time and (
+                        end_time is None or state.last_updated < end_time):
+                    after.append(state)
+            result[entity_id] = (start_state, after)
+
+        return result
+
+    def significant_states(self, start_time, end_time, entity_ids, filters,
+                           include_start_time_state, no_attributes):
+        """Return get_significant_states from memory, or None."""
+        from homeassistant.components.recorder.models import is_significant
+
+        states = self._get(start_time, end_time, entity_ids)
+        if states is None:
+            return None
+
+        result = defaultdict(list)
+        for entity_id, (start_state, after) in states.items():
+            if not filters.is_included(entity_id, entity_ids):
+                continue
+
+            ent_states = []
+            if include_start_time_state and _is_visible(start_state):
+                ent_states.append(
+                    _copy_state(start_state, no_attributes, start_time))
+
+            ent_states.extend(
+                _copy_state(state, no_attributes) for state in after
+                if is_significant(state.domain, state.attributes,
+                                  state.last_changed == state.last_updated))
+            if ent_states:
+                result[entity_id] = ent_states
+
+        return result
+
+    def state_changes(self, start_time, end_time, entity_id, no_attributes):
+        """Return state_changes_during_period from memory, or None."""
+        entity_ids = [entity_id.lower()] if entity_id is not None else None
+        states = self._get(start_time, end_time, entity_ids)
+        if states is None:
+            return None
+
+        result = defaultdict(list)
+        for ent_id, (start_state, after) in states.items():
+            ent_states = []
+            if _is_visible(start_state):
+                ent_states.append(
+                    _copy_state(start_state, no_attributes, start_time))
+
+            ent_states.extend(
+                _copy_state(state, no_attributes) for state in after
+                if state.last_changed == state.last_updated)
+            if ent_states:
+                result[ent_id] = ent_states
+
+        return result
+
+
+def _is_visible(state):
+    """Return if get_states returns the state."""
+    return (state is not None and state.domain not in IGNORE_DOMAINS and
+            not state.attributes.get(ATTR_HIDDEN, False))
+
+
+def _copy_state(state, no_attributes, point_in_time=None):
+    """Return a state to hand out, moved to point_in_time if given."""
+    if not no_attributes and point_in_time is None:
+        return state
+    return ha.State(
+        state.entity_id, state.state,
+        None if no_attributes else state.attributes,
+        point_in_time or state.last_changed,
+        point_in_time or state.last_updated, state.context)
@@ -6,25 +6,31 @@ https://home-assistant.io/components/logbook/
 """
 from datetime import timedelta
 from itertools import groupby
+import json
 import logging
 
+from aiohttp import web
+from aiohttp.hdrs import CONTENT_TYPE
 import voluptuous as vol
 
 from homeassistant.loader import bind_hass
 from homeassistant.components import sun
 from homeassistant.components.http import HomeAssistantView
+from homeassistant.components.recorder.const import DATA_INSTANCE
 from homeassistant.const import (
-    ATTR_DOMAIN, ATTR_ENTITY_ID, ATTR_HIDDEN, ATTR_NAME, ATTR_SERVICE,
-    CONF_EXCLUDE, CONF_INCLUDE, EVENT_HOMEASSISTANT_START,
+    ATTR_DOMAIN, ATTR_ENTITY_ID, ATTR_FRIENDLY_NAME, ATTR_HIDDEN, ATTR_NAME,
+    ATTR_SERVICE, CONF_EXCLUDE, CONF_INCLUDE, CONTENT_TYPE_JSON,
+    EVENT_HOMEASSISTANT_START,
     EVENT_HOMEASSISTANT_STOP, EVENT_LOGBOOK_ENTRY, EVENT_STATE_CHANGED,
     HTTP_BAD_REQUEST, STATE_NOT_HOME, STATE_OFF, STATE_ON)
 from homeassistant.core import (
-    DOMAIN as HA_DOMAIN, State, callback, split_entity_id)
+    DOMAIN as HA_DOMAIN, Event, callback, split_entity_id)
 from homeassistant.components.alexa.smart_home import EVENT_ALEXA_SMART_HOME
 from homeassistant.components.homekit.const import (
     ATTR_DISPLAY_NAME, ATTR_VALUE, DOMAIN as DOMAIN_HOMEKIT,
     EVENT_HOMEKIT_CHANGED)
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.json import JSONEncoder
 import homeassistant.util.dt as dt_util
 
 _LOGGER = logging.getLogger(__name__)
@@ -33,6 +39,7 @@ ATTR_MESSAGE = 'message'
 
 CONF_DOMAINS = 'domains'
 CONF_ENTITIES = 'entities'
+CONF_MATERIALIZE = 'materialize'
 CONTINUOUS_DOMAINS = ['proximity', 'sensor']
 
 DEPENDENCIES = ['recorder', 'frontend']
@@ -41,6 +48,12 @@ DOMAIN = 'logbook'
 
 GROUP_BY_MINUTES = 15
 
+STORAGE_KEY = 'logbook.materialized'
+STORAGE_VERSION = 1
+
+# Most entries encoded at once when streaming the logbook
+STREAM_CHUNK_SIZE = 1000
+
 CONFIG_SCHEMA = vol.Schema({
     DOMAIN: vol.Schema({
         CONF_EXCLUDE: vol.Schema({
@@ -52,7 +65,8 @@ CONFIG_SCHEMA = vol.Schema({
             vol.Optional(CONF_ENTITIES, default=[]): cv.entity_ids,
             vol.Optional(CONF_DOMAINS, default=[]):
                 vol.All(cv.ensure_list, [cv.string])
-        })
+        }),
+        vol.Optional(CONF_MATERIALIZE, default=False): cv.boolean,
     }),
 }, extra=vol.ALLOW_EXTRA)
 
@@ -105,7 +119,28 @@ async def async_setup(hass, config):
         message = message.async_render()
         async_log_entry(hass, name, message, domain, entity_id)
 
-    hass.http.register_view(LogbookView(config.get(DOMAIN, {})))
+    conf = config.get(DOMAIN, {})
+
+    # Time since when the entries of all recorded events are written
+    store = hass.helpers.storage.Store(STORAGE_VERSION, STORAGE_KEY)
+    data = await store.async_load()
+    materialized_since = None
+    if data is not None and data['since'] is not None:
+        materialized_since = dt_util.parse_datetime(data['since'])
+
+    if not conf.get(CONF_MATERIALIZE):
+        # Entries written from now on would have a gap
+        if materialized_since is not None:
+            await store.async_save({'since': None})
+        materialized_since = None
+    else:
+        if materialized_since is None:
+            materialized_since = dt_util.utcnow()
+            await store.async_save({'since': materialized_since.isoformat()})
+        hass.data[DATA_INSTANCE].add_event_writer(
+            LogbookWriter(hass, conf).write)
+
+    hass.http.register_view(LogbookView(conf, materialized_since))
 
     await hass.components.frontend.async_register_built_in_panel(
         'logbook', 'logbook', 'hass:format-list-bulleted-type')
@@ -122,9 +157,10 @@ class LogbookView(HomeAssistantView):
     name = 'api:logbook'
     extra_urls = ['/api/logbook/{datetime}']
 
-    def __init__(self, config):
+    def __init__(self, config, materialized_since=None):
         """Initialize the logbook view."""
         self.config = config
+        self.materialized_since = materialized_since
 
     async def get(self, request, datetime=None):
         """Retrieve logbook entries."""
@@ -143,16 +179,87 @@ class LogbookView(HomeAssistantView):
             period = int(period)
 
         entity_id = request.query.get('entity')
+        context_id = request.query.get('context_id')
         start_day = dt_util.as_utc(datetime) - timedelta(days=period - 1)
         end_day = start_day + timedelta(days=period)
         hass = request.app['hass']
 
+        continuation = request.query.get('continue')
+        if continuation is not None:
+            continuation = dt_util.parse_datetime(continuation)
+            if continuation is None:
+                return self.json_message('Invalid continue', HTTP_BAD_REQUEST)
+            start_day = max(start_day, dt_util.as_utc(continuation))
+
+        limit = request.query.get('limit')
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                limit = 0
+            if limit < 1:
+                return self.json_message('Invalid limit', HTTP_BAD_REQUEST)
+
+            def json_page():
+                """Fetch a page of events and generate JSON."""
+                entries, next_start = _get_events_page(
+                    hass, self.config, start_day, end_day, limit, entity_id,
+                    context_id)
+                if next_start is not None:
+                    # Without a '+' it can be passed back in the query as is
+                    next_start = next_start.strftime('%Y-%m-%dT%H:%M:%SZ')
+                return self.json({'entries': entries, 'continue': next_start})
+
+            return await hass.components.recorder.async_add_read_job(
+                json_page)
+
+        if 'stream' in request.query:
+            return await self._async_stream(
+                request, hass, start_day, end_day, entity_id, context_id)
+
+        if self.materialized_since is not None and \
+                start_day >= self.materialized_since:
+            def json_entries():
+                """Fetch written entries and generate JSON."""
+                return self.json(_get_entries(
+                    hass, start_day, end_day, entity_id, context_id))
+
+            return await hass.components.recorder.async_add_read_job(
+                json_entries)
+
         def json_events():
             """Fetch events and generate JSON."""
-            return self.json(list(
-                _get_events(hass, self.config, start_day, end_day, entity_id)))
-
-        return await hass.async_add_job(json_events)
+            return self.json(list(_get_events(
+                hass, self.config, start_day, end_day, entity_id,
+                context_id)))
+
+        return await hass.components.recorder.async_add_read_job(
+            json_events)
+
+    async def _async_stream(self, request, hass, start_day, end_day,
+                            entity_id, context_id):
+        """Stream the entries as the events are read from the database."""
+        recorder = hass.components.recorder
+        chunks = _stream_events(
+            hass, self.config, start_day, end_day, entity_id, context_id)
+
+        response = web.StreamResponse(
+            headers={CONTENT_TYPE: CONTENT_TYPE_JSON})
+        response.enable_compression()
+        await response.prepare(request)
+
+        try:
+            while True:
+                chunk = await recorder.async_add_read_job(next, chunks, None)
+                if chunk is None:
+                    break
+                await response.write(chunk.encode('utf-8'))
+        finally:
+            # The generator holds the database session
+            await recorder.async_add_read_job(chunks.close)
+
+        await response.write_eof()
+        return response
 
 
 def humanify(hass, events):
@@ -201,160 +308,399 @@ def humanify(hass, events):
         # Yield entries
         for event in events_batch:
             if event.event_type == EVENT_STATE_CHANGED:
-
-                to_state = State.from_dict(event.data.get('new_state'))
-
-                domain = to_state.domain
+                entity_id = event.data.get('entity_id')
 
                 # Skip all but the last sensor state
-                if domain in CONTINUOUS_DOMAINS and \
-                   event != last_sensor_event[to_state.entity_id]:
-                    continue
-
-                # Don't show continuous sensor value changes in the logbook
-                if domain in CONTINUOUS_DOMAINS and \
-                   to_state.attributes.get('unit_of_measurement'):
+                if entity_id.startswith(domain_prefixes) and \
+                   event != last_sensor_event[entity_id]:
                     continue
 
-                yield {
-                    'when': event.time_fired,
-                    'name': to_state.name,
-                    'message': _entry_message_from_state(domain, to_state),
-                    'domain': domain,
-                    'entity_id': to_state.entity_id,
-                    'context_id': event.context.id,
-                    'context_user_id': event.context.user_id
-                }
-
             elif event.event_type == EVENT_HOMEASSISTANT_START:
                 if start_stop_events.get(event.time_fired.minute) == 2:
                     continue
 
-                yield {
-                    'when': event.time_fired,
-                    'name': "Home Assistant",
-                    'message': "started",
-                    'domain': HA_DOMAIN,
-                    'context_id': event.context.id,
-                    'context_user_id': event.context.user_id
-                }
+            entry = _humanify_event(hass, event)
+            if entry is None:
+                continue
 
-            elif event.event_type == EVENT_HOMEASSISTANT_STOP:
-                if start_stop_events.get(event.time_fired.minute) == 2:
-                    action = "restarted"
-                else:
-                    action = "stopped"
-
-                yield {
-                    'when': event.time_fired,
-                    'name': "Home Assistant",
-                    'message': action,
-                    'domain': HA_DOMAIN,
-                    'context_id': event.context.id,
-                    'context_user_id': event.context.user_id
-                }
-
-            elif event.event_type == EVENT_LOGBOOK_ENTRY:
-                domain = event.data.get(ATTR_DOMAIN)
-                entity_id = event.data.get(ATTR_ENTITY_ID)
-                if domain is None and entity_id is not None:
-                    try:
-                        domain = split_entity_id(str(entity_id))[0]
-                    except IndexError:
-                        pass
-
-                yield {
-                    'when': event.time_fired,
-                    'name': event.data.get(ATTR_NAME),
-                    'message': event.data.get(ATTR_MESSAGE),
-                    'domain': domain,
-                    'entity_id': entity_id,
-                    'context_id': event.context.id,
-                    'context_user_id': event.context.user_id
-                }
-
-            elif event.event_type == EVENT_ALEXA_SMART_HOME:
-                data = event.data
-                entity_id = data['request'].get('entity_id')
-
-                if entity_id:
-                    state = hass.states.get(entity_id)
-                    name = state.name if state else entity_id
-                    message = "send command {}/{} for {}".format(
-                        data['request']['namespace'],
-                        data['request']['name'], name)
-                else:
-                    message = "send command {}/{}".format(
-                        data['request']['namespace'], data['request']['name'])
-
-                yield {
-                    'when': event.time_fired,
-                    'name': 'Amazon Alexa',
-                    'message': message,
-                    'domain': 'alexa',
-                    'entity_id': entity_id,
-                    'context_id': event.context.id,
-                    'context_user_id': event.context.user_id
-                }
-
-            elif event.event_type == EVENT_HOMEKIT_CHANGED:
-                data = event.data
-                entity_id = data.get(ATTR_ENTITY_ID)
-                value = data.get(ATTR_VALUE)
-
-                value_msg = " to {}".format(value) if value else ''
-                message = "send command {}{} for {}".format(
-                    data[ATTR_SERVICE], value_msg, data[ATTR_DISPLAY_NAME])
-
-                yield {
-                    'when': event.time_fired,
-                    'name': 'HomeKit',
-                    'message': message,
-                    'domain': DOMAIN_HOMEKIT,
-                    'entity_id': entity_id,
-                    'context_id': event.context.id,
-                    'context_user_id': event.context.user_id
-                }
-
-
-def _get_events(hass, config, start_day, end_day, entity_id=None):
+            if event.event_type == EVENT_HOMEASSISTANT_STOP and \
+                    start_stop_events.get(event.time_fired.minute) == 2:
+                entry['message'] = "restarted"
+
+            yield entry
+
+
+def _humanify_event(hass, event):
+    """Return the entry of a single event, without grouping it.
+
+    Returns None for events that are never shown.
+    """
+    if event.event_type == EVENT_STATE_CHANGED:
+        # Only the few fields used are read from the state data
+        to_state = event.data.get('new_state')
+        entity_id = to_state['entity_id']
+        domain, object_id = split_entity_id(entity_id)
+        attributes = to_state.get('attributes') or {}
+
+        # Don't show continuous sensor value changes in the logbook
+        if domain in CONTINUOUS_DOMAINS and \
+           attributes.get('unit_of_measurement'):
+            return None
+
+        return {
+            'when': event.time_fired,
+            'name': (attributes.get(ATTR_FRIENDLY_NAME) or
+                     object_id.replace('_', ' ')),
+            'message': _entry_message(domain, to_state['state']),
+            'domain': domain,
+            'entity_id': entity_id,
+            'context_id': event.context.id,
+            'context_user_id': event.context.user_id
+        }
+
+    if event.event_type == EVENT_HOMEASSISTANT_START:
+        return {
+            'when': event.time_fired,
+            'name': "Home Assistant",
+            'message': "started",
+            'domain': HA_DOMAIN,
+            'context_id': event.context.id,
+            'context_user_id': event.context.user_id
+        }
+
+    if event.event_type == EVENT_HOMEASSISTANT_STOP:
+        return {
+            'when': event.time_fired,
+            'name': "Home Assistant",
+            'message': "stopped",
+            'domain': HA_DOMAIN,
+            'context_id': event.context.id,
+            'context_user_id': event.context.user_id
+        }
+
+    if event.event_type == EVENT_LOGBOOK_ENTRY:
+        domain = event.data.get(ATTR_DOMAIN)
+        entity_id = event.data.get(ATTR_ENTITY_ID)
+        if domain is None and entity_id is not None:
+            try:
+                domain = split_entity_id(str(entity_id))[0]
+            except IndexError:
+                pass
+
+        return {
+            'when': event.time_fired,
+            'name': event.data.get(ATTR_NAME),
+            'message': event.data.get(ATTR_MESSAGE),
+            'domain': domain,
+            'entity_id': entity_id,
+            'context_id': event.context.id,
+            'context_user_id': event.context.user_id
+        }
+
+    if event.event_type == EVENT_ALEXA_SMART_HOME:
+        data = event.data
+        entity_id = data['request'].get('entity_id')
+
+        if entity_id:
+            state = hass.states.get(entity_id)
+            name = state.name if state else entity_id
+            message = "send command {}/{} for {}".format(
+                data['request']['namespace'],
+                data['request']['name'], name)
+        else:
+            message = "send command {}/{}".format(
+                data['request']['namespace'], data['request']['name'])
+
+        return {
+            'when': event.time_fired,
+            'name': 'Amazon Alexa',
+            'message': message,
+            'domain': 'alexa',
+            'entity_id': entity_id,
+            'context_id': event.context.id,
+            'context_user_id': event.context.user_id
+        }
+
+    if event.event_type == EVENT_HOMEKIT_CHANGED:
+        data = event.data
+        entity_id = data.get(ATTR_ENTITY_ID)
+        value = data.get(ATTR_VALUE)
+
+        value_msg = " to {}".format(value) if value else ''
+        message = "send command {}{} for {}".format(
+            data[ATTR_SERVICE], value_msg, data[ATTR_DISPLAY_NAME])
+
+        return {
+            'when': event.time_fired,
+            'name': 'HomeKit',
+            'message': message,
+            'domain': DOMAIN_HOMEKIT,
+            'entity_id': entity_id,
+            'context_id': event.context.id,
+            'context_user_id': event.context.user_id
+        }
+
+    return None
+
+
+def _get_events(hass, config, start_day, end_day, entity_id=None,
+                context_id=None):
     """Get events for a period of time."""
-    from homeassistant.components.recorder.models import Events, States
     from homeassistant.components.recorder.util import (
         execute, session_scope)
 
     with session_scope(hass=hass) as session:
-        query = session.query(Events).order_by(Events.time_fired) \
-            .outerjoin(States, (Events.event_id == States.event_id))  \
-            .filter(Events.event_type.in_(ALL_EVENT_TYPES)) \
-            .filter((Events.time_fired > start_day)
-                    & (Events.time_fired < end_day)) \
-            .filter((States.last_updated == States.last_changed)
-                    | (States.state_id.is_(None)))
+        query = _events_query(
+            session, config, start_day, end_day, entity_id, context_id)
+        events = execute(
+            query, lambda row: row.Events.to_native(row.States))
+    return humanify(hass, _exclude_events(events, config))
+
+
+def _get_events_page(hass, config, start_day, end_day, limit,
+                     entity_id=None, context_id=None):
+    """Get the entries of a page of about limit events.
+
+    The page runs to the end of the GROUP_BY_MINUTES batch of its last
+    event, so events grouped by humanify are never split across pages.
+    Returns the entries and the start of the next page, which is None
+    after the last page.
+    """
+    from homeassistant.components.recorder.models import Events
+    from homeassistant.components.recorder.util import (
+        execute, session_scope)
+
+    def to_native(row):
+        """Convert a row of the query to an event."""
+        return row.Events.to_native(row.States)
+
+    with session_scope(hass=hass) as session:
+        query = _events_query(
+            session, config, start_day, end_day, entity_id, context_id)
+        events = execute(query.limit(limit), to_native)
+
+        next_start = None
+        if len(events) == limit:
+            next_start = _batch_start(events[-1].time_fired) + \
+                timedelta(minutes=GROUP_BY_MINUTES)
+            # The first limit rows all are before the end of the batch
+            events.extend(execute(
+                query.filter(Events.time_fired < next_start).offset(limit),
+                to_native))
+            if next_start >= end_day:
+                next_start = None
+
+    return list(humanify(hass, _exclude_events(events, config))), next_start
+
+
+def _get_entries(hass, start_day, end_day, entity_id=None,
+                 context_id=None):
+    """Get the entries written by LogbookWriter for a period of time."""
+    from homeassistant.components.recorder.models import LogbookEntries
+    from homeassistant.components.recorder.util import (
+        execute, session_scope)
+
+    with session_scope(hass=hass) as session:
+        query = session.query(LogbookEntries) \
+            .filter((LogbookEntries.time_fired >= start_day) &
+                    (LogbookEntries.time_fired < end_day)) \
+            .order_by(LogbookEntries.time_fired, LogbookEntries.entry_id)
 
         if entity_id is not None:
-            query = query.filter(States.entity_id == entity_id.lower())
+            query = query.filter(
+                LogbookEntries.entity_id == entity_id.lower())
 
-        events = execute(query)
-    return humanify(hass, _exclude_events(events, config))
+        if context_id is not None:
+            query = query.filter(LogbookEntries.context_id == context_id)
+
+        return execute(query)
+
+
+def _stream_events(hass, config, start_day, end_day, entity_id=None,
+                   context_id=None):
+    """Yield the JSON of the entries in chunks.
+
+    Events are read from the cursor STREAM_CHUNK_SIZE rows at a time,
+    so memory use does not grow with the period.
+    """
+    from homeassistant.components.recorder.util import session_scope
+
+    with session_scope(hass=hass) as session:
+        query = _events_query(
+            session, config, start_day, end_day, entity_id, context_id)
+        events = (row.Events.to_native(row.States)
+                  for row in query.yield_per(STREAM_CHUNK_SIZE))
+        events = (event for event in events if event is not None)
+
+        chunk = ['[']
+        for entry in humanify(hass, _exclude_events(events, config)):
+            if len(chunk) > 1:
+                chunk.append(',')
+            chunk.append(json.dumps(entry, cls=JSONEncoder))
+            if len(chunk) >= 2 * STREAM_CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = ['']
+        chunk.append(']')
+        yield ''.join(chunk)
+
+
+def _events_query(session, config, start_day, end_day, entity_id=None,
+                  context_id=None):
+    """Return the query of the events of a period and their states.
+
+    The entity and context filters and the configured entities and
+    domains are applied in SQL, the rest is left to _exclude_events.
+    """
+    from homeassistant.components.recorder.models import Events, States
+    from sqlalchemy.orm import joinedload
+
+    query = session.query(Events, States) \
+        .options(joinedload(States.old_state)) \
+        .order_by(Events.time_fired, Events.event_id) \
+        .outerjoin(States, (Events.event_id == States.event_id))  \
+        .filter((Events.time_fired >= start_day)
+                & (Events.time_fired < end_day)) \
+        .filter((States.last_updated == States.last_changed)
+                | (States.state_id.is_(None)))
+
+    if entity_id is not None:
+        # Only state changes have an entity in the states table
+        query = query \
+            .filter(Events.event_type == EVENT_STATE_CHANGED) \
+            .filter(States.entity_id == entity_id.lower())
+    else:
+        query = query.filter(Events.event_type.in_(ALL_EVENT_TYPES))
+        states_filter = _states_filter(config)
+        if states_filter is not None:
+            query = query.filter(
+                States.state_id.is_(None) | states_filter)
+
+    if context_id is not None:
+        query = query.filter(Events.context_id == context_id)
+
+    return query
+
+
+def _states_filter(config):
+    """Return the SQL filter of the states of included entities.
+
+    It matches the entity and domain filters of _exclude_events and is
+    None when none are configured.
+    """
+    from homeassistant.components.recorder.models import States
+    from sqlalchemy import and_, or_
+
+    excluded_entities = config.get(CONF_EXCLUDE, {}).get(CONF_ENTITIES)
+    excluded_domains = config.get(CONF_EXCLUDE, {}).get(CONF_DOMAINS)
+    included_entities = config.get(CONF_INCLUDE, {}).get(CONF_ENTITIES)
+    included_domains = config.get(CONF_INCLUDE, {}).get(CONF_DOMAINS)
+
+    # Included entities are shown even if their domain is not
+    included = []
+    if included_entities:
+        included.append(States.entity_id.in_(included_entities))
+
+    clauses = []
+    if excluded_entities:
+        clauses.append(~States.entity_id.in_(excluded_entities))
+    if excluded_domains and included_domains:
+        clauses.append(~States.domain.in_(excluded_domains))
+        clauses.append(or_(States.domain.in_(included_domains), *included))
+    elif excluded_domains:
+        clauses.append(or_(~States.domain.in_(excluded_domains), *included))
+    elif included_domains:
+        clauses.append(or_(States.domain.in_(included_domains), *included))
+    elif included:
+        clauses.extend(included)
+
+    if not clauses:
+        return None
+    return and_(*clauses)
+
+
+def _batch_start(time_fired):
+    """Return the start of the GROUP_BY_MINUTES batch of time_fired."""
+    return time_fired.replace(
+        minute=time_fired.minute - time_fired.minute % GROUP_BY_MINUTES,
+        second=0, microsecond=0)
+
+
+class LogbookWriter:
+    """Write the entries of the recorded events to the logbook table.
+
+    The entries match the ones of humanify. Instead of grouping the events
+    when they are read, the entry of the previous sensor state of a batch
+    is replaced and a stop followed by a start is updated to a restart.
+    """
+
+    def __init__(self, hass, config):
+        """Initialize the writer."""
+        self.hass = hass
+        self.config = config
+
+    def write(self, session, events):
+        """Write the entries of the events that were recorded."""
+        from homeassistant.components.recorder.models import LogbookEntries
+
+        events = (_stored_event(event) for event in events
+                  if event.event_type in ALL_EVENT_TYPES)
+
+        for event in _exclude_events(events, self.config):
+            if event.event_type == EVENT_STATE_CHANGED:
+                entity_id = event.data['entity_id']
+                if split_entity_id(entity_id)[0] in CONTINUOUS_DOMAINS:
+                    session.flush()
+                    # Only the last state of a batch is shown
+                    session.query(LogbookEntries).filter(
+                        (LogbookEntries.entity_id == entity_id) &
+                        (LogbookEntries.time_fired >=
+                         _batch_start(event.time_fired))
+                    ).delete(synchronize_session=False)
+
+            elif event.event_type == EVENT_HOMEASSISTANT_START:
+                stopped = session.query(LogbookEntries).filter(
+                    (LogbookEntries.domain == HA_DOMAIN) &
+                    (LogbookEntries.message == "stopped") &
+                    (LogbookEntries.time_fired >= event.time_fired.replace(
+                        second=0, microsecond=0))).first()
+                if stopped is not None:
+                    stopped.message = "restarted"
+                    continue
+
+            entry = _humanify_event(self.hass, event)
+            if entry is not None:
+                session.add(LogbookEntries.from_entry(entry))
+
+
+def _stored_event(event):
+    """Return the event with its states as they are stored."""
+    if event.event_type != EVENT_STATE_CHANGED:
+        return event
+
+    old_state = event.data.get('old_state')
+    new_state = event.data.get('new_state')
+    return Event(event.event_type, {
+        'entity_id': event.data['entity_id'],
+        'old_state': old_state.as_dict() if old_state else None,
+        'new_state': new_state.as_dict() if new_state else None,
+    }, event.origin, event.time_fired, event.context)
 
 
 def _exclude_events(events, config):
-    """Get list of filtered events."""
-    excluded_entities = []
-    excluded_domains = []
-    included_entities = []
-    included_domains = []
+    """Yield the events that are not filtered."""
+    excluded_entities = set()
+    excluded_domains = set()
+    included_entities = set()
+    included_domains = set()
     exclude = config.get(CONF_EXCLUDE)
     if exclude:
-        excluded_entities = exclude[CONF_ENTITIES]
-        excluded_domains = exclude[CONF_DOMAINS]
+        excluded_entities = set(exclude[CONF_ENTITIES])
+        excluded_domains = set(exclude[CONF_DOMAINS])
     include = config.get(CONF_INCLUDE)
     if include:
-        included_entities = include[CONF_ENTITIES]
-        included_domains = include[CONF_DOMAINS]
+        included_entities = set(include[CONF_ENTITIES])
+        included_domains = set(include[CONF_DOMAINS])
 
-    filtered_events = []
     for event in events:
         domain, entity_id = None, None
 
@@ -425,28 +771,32 @@ def _exclude_events(events, config):
             # check if logbook entry is excluded for this entity
             if entity_id in excluded_entities:
                 continue
-        filtered_events.append(event)
-    return filtered_events
+        yield event
 
 
 def _entry_message_from_state(domain, state):
     """Convert a state to a message for the logbook."""
+    return _entry_message(domain, state.state)
+
+
+def _entry_message(domain, state):
+    """Convert a state value to a message for the logbook."""
     # We pass domain in so we don't have to split entity_id again
     if domain == 'device_tracker':
-        if state.state == STATE_NOT_HOME:
+        if state == STATE_NOT_HOME:
             return 'is away'
-        return 'is at {}'.format(state.state)
+        return 'is at {}'.format(state)
 
     if domain == 'sun':
-        if state.state == sun.STATE_ABOVE_HORIZON:
+        if state == sun.STATE_ABOVE_HORIZON:
             return 'has risen'
         return 'has set'
 
-    if state.state == STATE_ON:
+    if state == STATE_ON:
         # Future: combine groups and its entity entries ?
         return "turned on"
 
-    if state.state == STATE_OFF:
+    if state == STATE_OFF:
         return "turned off"
 
-    return "changed to {}".format(state.state)
+    return "changed to {}".format(state)
@@ -11,8 +11,10 @@ from operator import attrgetter
 import os
 import socket
 import ssl
+import threading
 import time
-from typing import Any, Callable, List, Optional, Union, cast  # noqa: F401
+from typing import (  # noqa: F401
+    Any, Callable, Dict, List, Optional, Union, cast)
 
 import attr
 import requests.certs
@@ -101,6 +103,9 @@ ATTR_DISCOVERY_HASH = 'discovery_hash'
 
 MAX_RECONNECT_WAIT = 300  # seconds
 
+# Messages waiting for the event loop before new ones are dropped
+MAX_PENDING_MESSAGES = 10000
+
 
 def valid_topic(value: Any) -> str:
     """Validate that this is a valid topic name/filter."""
@@ -566,6 +571,101 @@ class Subscription:
     encoding = attr.ib(type=str, default='utf-8')
 
 
+class _TopicNode:
+    """Node of the subscription trie for one level of a topic filter."""
+
+    __slots__ = ('children', 'subscriptions')
+
+    def __init__(self) -> None:
+        """Initialize the node."""
+        self.children = {}  # type: Dict[str, _TopicNode]
+        self.subscriptions = []  # type: List[Subscription]
+
+
+class SubscriptionTrie:
+    """Subscriptions indexed by the levels of their topic filter.
+
+    Matching a topic only visits the nodes of its levels and of the
+    wildcards along the way, instead of testing every subscription.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the trie."""
+        self._root = _TopicNode()
+
+    def add(self, subscription: Subscription) -> None:
+        """Add a subscription."""
+        node = self._root
+        for level in subscription.topic.split('/'):
+            child = node.children.get(level)
+            if child is None:
+                child = node.children[level] = _TopicNode()
+            node = child
+        node.subscriptions.append(subscription)
+
+    def remove(self, subscription: Subscription) -> None:
+        """Remove a subscription, raise ValueError if it was not added."""
+        path = [self._root]
+        for level in subscription.topic.split('/'):
+            child = path[-1].children.get(level)
+            if child is None:
+                raise ValueError(subscription)
+            path.append(child)
+        path[-1].subscriptions.remove(subscription)
+
+        # Prune the nodes that are left empty
+        levels = subscription.topic.split('/')
+        while len(path) > 1 and not path[-1].subscriptions and \
+                not path[-1].children:
+            path.pop()
+            del path[-1].children[levels[len(path) - 1]]
+
+    def has_filter(self, topic: str) -> bool:
+        """Return if there is a subscription on the exact topic filter."""
+        node = self._root
+        for level in topic.split('/'):
+            node = node.children.get(level)
+            if node is None:
+                return False
+        return bool(node.subscriptions)
+
+    def match(self, topic: str) -> List[Subscription]:
+        """Return the subscriptions with a filter that matches topic.
+
+        Like paho.mqtt.matcher.MQTTMatcher, a filter ending in # matches
+        its parent level as well, and wildcards at the first level do not
+        match topics starting with $.
+        """
+        # Wildcards at the first level do not match topics starting with $
+        wildcards = not topic.startswith('$')
+        matches = []  # type: List[Subscription]
+        nodes = [self._root]
+        for level in topic.split('/'):
+            next_nodes = []
+            for node in nodes:
+                child = node.children.get(level)
+                if child is not None:
+                    next_nodes.append(child)
+                if wildcards:
+                    child = node.children.get('+')
+                    if child is not None:
+                        next_nodes.append(child)
+                    child = node.children.get('#')
+                    if child is not None:
+                        matches.extend(child.subscriptions)
+            if not next_nodes:
+                return matches
+            nodes = next_nodes
+            wildcards = True
+
+        for node in nodes:
+            matches.extend(node.subscriptions)
+            child = node.children.get('#')
+            if child is not None:
+                matches.extend(child.subscriptions)
+        return matches
+
+
 @attr.s(slots=True, frozen=True)
 class Message:
     """MQTT Message."""
@@ -595,9 +695,17 @@ class MQTT:
         self.port = port
         self.keepalive = keepalive
         self.subscriptions = []  # type: List[Subscription]
+        self._subscription_trie = SubscriptionTrie()
         self.birth_message = birth_message
         self._mqttc = None  # type: mqtt.Client
         self._paho_lock = asyncio.Lock(loop=hass.loop)
+        # Messages received by the paho thread, handled by the event loop
+        self._pending_messages = []  # type: List[Any]
+        self._pending_lock = threading.Lock()
+        self._handle_scheduled = False
+        self.messages_received = 0
+        self.messages_dispatched = 0
+        self.messages_dropped = 0
 
         if protocol == PROTOCOL_31:
             proto = mqtt.MQTTv31  # type: int
@@ -684,17 +792,20 @@ class MQTT:
 
         subscription = Subscription(topic, msg_callback, qos, encoding)
         self.subscriptions.append(subscription)
+        self._subscription_trie.add(subscription)
 
         await self._async_perform_subscription(topic, qos)
 
         @callback
         def async_remove() -> None:
             """Remove subscription."""
-            if subscription not in self.subscriptions:
+            try:
+                self._subscription_trie.remove(subscription)
+            except ValueError:
                 raise HomeAssistantError("Can't remove subscription twice")
             self.subscriptions.remove(subscription)
 
-            if any(other.topic == topic for other in self.subscriptions):
+            if self._subscription_trie.has_filter(topic):
                 # Other subscriptions on topic remaining - don't unsubscribe.
                 return
             self.hass.async_create_task(self._async_unsubscribe(topic))
@@ -750,17 +861,44 @@ class MQTT:
                 self.async_publish(*attr.astuple(self.birth_message)))
 
     def _mqtt_on_message(self, _mqttc, _userdata, msg) -> None:
-        """Message received callback."""
-        self.hass.add_job(self._mqtt_handle_message, msg)
+        """Message received callback.
+
+        Messages are handed to the event loop in batches, waking it up
+        once per batch instead of once per message.
+        """
+        with self._pending_lock:
+            self.messages_received += 1
+            if len(self._pending_messages) >= MAX_PENDING_MESSAGES:
+                self.messages_dropped += 1
+                if self.messages_dropped == 1:
+                    _LOGGER.warning(
+                        "Dropping MQTT messages, more than %d are waiting "
+                        "to be handled", MAX_PENDING_MESSAGES)
+                return
+            self._pending_messages.append(msg)
+            if self._handle_scheduled:
+                return
+            self._handle_scheduled = True
+
+        self.hass.add_job(self._mqtt_handle_messages)
+
+    @callback
+    def _mqtt_handle_messages(self) -> None:
+        """Handle the messages received since the last batch."""
+        with self._pending_lock:
+            messages = self._pending_messages
+            self._pending_messages = []
+            self._handle_scheduled = False
+
+        for msg in messages:
+            self._mqtt_handle_message(msg)
+        self.messages_dispatched += len(messages)
 
     @callback
     def _mqtt_handle_message(self, msg) -> None:
         _LOGGER.debug("Received message on %s: %s", msg.topic, msg.payload)
 
-        for subscription in self.subscriptions:
-            if not _match_topic(subscription.topic, msg.topic):
-                continue
-
+        for subscription in self._subscription_trie.match(msg.topic):
             payload = msg.payload  # type: SubscribePayloadType
             if subscription.encoding is not None:
                 try:
@@ -808,18 +946,6 @@ def _raise_on_error(result_code: int) -> None:
             'Error talking to MQTT: {}'.format(mqtt.error_string(result_code)))
 
 
-def _match_topic(subscription: str, topic: str) -> bool:
-    """Test if topic matches subscription."""
-    from paho.mqtt.matcher import MQTTMatcher
-    matcher = MQTTMatcher()
-    matcher[subscription] = True
-    try:
-        next(matcher.iter_match(topic))
-        return True
-    except StopIteration:
-        return False
-
-
 class MqttAvailability(Entity):
     """Mixin used for platforms that report availability."""
 
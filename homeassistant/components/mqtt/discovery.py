@@ -5,10 +5,13 @@ For more details about this component, please refer to the documentation at
 https://home-assistant.io/components/mqtt/#discovery
 """
 import asyncio
+from collections import OrderedDict
 import json
 import logging
 import re
 
+import voluptuous as vol
+
 from homeassistant.components import mqtt
 from homeassistant.components.mqtt import CONF_STATE_TOPIC, ATTR_DISCOVERY_HASH
 from homeassistant.const import CONF_PLATFORM
@@ -60,6 +63,9 @@ MQTT_DISCOVERY_NEW = 'mqtt_discovery_new_{}_{}'
 
 TOPIC_BASE = '~'
 
+# Seconds discovery payloads are collected before they are processed
+DISCOVERY_WINDOW = 0.1
+
 ABBREVIATIONS = {
     'aux_cmd_t': 'aux_command_topic',
     'aux_stat_tpl': 'aux_state_template',
@@ -170,8 +176,13 @@ ABBREVIATIONS = {
 async def async_start(hass: HomeAssistantType, discovery_topic, hass_config,
                       config_entry=None) -> bool:
     """Initialize of MQTT Discovery."""
+    # Discovery payloads waiting for the window to end, by discovery hash
+    pending = OrderedDict()  # type: OrderedDict
+    processing = False
+
     async def async_device_message_received(topic, payload, qos):
         """Process the received message."""
+        nonlocal processing
         match = TOPIC_MATCHER.match(topic)
 
         if not match:
@@ -214,19 +225,59 @@ async def async_start(hass: HomeAssistantType, discovery_topic, hass_config,
 
         discovery_hash = (component, discovery_id)
 
-        if discovery_hash in hass.data[ALREADY_DISCOVERED]:
-            _LOGGER.info(
-                "Component has already been discovered: %s %s, sending update",
-                component, discovery_id)
-            async_dispatcher_send(
-                hass, MQTT_DISCOVERY_UPDATED.format(discovery_hash), payload)
-        elif payload:
+        if pending.pop(discovery_hash, None) is not None:
+            _LOGGER.debug("Replacing pending discovery payload of %s %s",
+                          component, discovery_id)
+
+        if not payload:
+            # Removals are not delayed, the entity is gone at once
+            if discovery_hash in hass.data[ALREADY_DISCOVERED]:
+                async_dispatcher_send(hass, MQTT_DISCOVERY_UPDATED.format(
+                    discovery_hash), payload)
+            return
+
+        pending[discovery_hash] = (payload, node_id, object_id)
+        if not processing:
+            processing = True
+            hass.async_create_task(async_process_pending())
+
+    async def async_process_pending():
+        """Process the payloads received during the discovery window.
+
+        New components are grouped by platform, so each platform adds all
+        of its new entities at once.
+        """
+        nonlocal processing
+        await asyncio.sleep(DISCOVERY_WINDOW)
+        payloads = list(pending.items())
+        pending.clear()
+        processing = False
+
+        new_payloads = OrderedDict()  # type: OrderedDict
+        for discovery_hash, (payload, node_id, object_id) in payloads:
+            component, discovery_id = discovery_hash
+
+            if discovery_hash in hass.data[ALREADY_DISCOVERED]:
+                if payload == hass.data[ALREADY_DISCOVERED][discovery_hash]:
+                    _LOGGER.debug("Discovery payload of %s %s is unchanged",
+                                  component, discovery_id)
+                    continue
+                _LOGGER.info(
+                    "Component has already been discovered: %s %s, "
+                    "sending update", component, discovery_id)
+                hass.data[ALREADY_DISCOVERED][discovery_hash] = payload
+                async_dispatcher_send(hass, MQTT_DISCOVERY_UPDATED.format(
+                    discovery_hash), payload)
+                continue
+
             # Add component
             platform = payload.get(CONF_PLATFORM, 'mqtt')
             if platform not in ALLOWED_PLATFORMS.get(component, []):
                 _LOGGER.warning("Platform %s (component %s) is not allowed",
                                 platform, component)
-                return
+                continue
+
+            hass.data[ALREADY_DISCOVERED][discovery_hash] = dict(payload)
 
             payload[CONF_PLATFORM] = platform
             if CONF_STATE_TOPIC not in payload:
@@ -234,15 +285,17 @@ async def async_start(hass: HomeAssistantType, discovery_topic, hass_config,
                     discovery_topic, component,
                     '%s/' % node_id if node_id else '', object_id)
 
-            hass.data[ALREADY_DISCOVERED][discovery_hash] = None
             payload[ATTR_DISCOVERY_HASH] = discovery_hash
 
             _LOGGER.info("Found new component: %s %s", component, discovery_id)
+            new_payloads.setdefault((component, platform), []).append(payload)
 
+        for (component, platform), platform_payloads in new_payloads.items():
             if platform not in CONFIG_ENTRY_PLATFORMS.get(component, []):
-                await async_load_platform(
-                    hass, component, platform, payload, hass_config)
-                return
+                for payload in platform_payloads:
+                    await async_load_platform(
+                        hass, component, platform, payload, hass_config)
+                continue
 
             config_entries_key = '{}.{}'.format(component, platform)
             async with hass.data[DATA_CONFIG_ENTRY_LOCK]:
@@ -252,7 +305,7 @@ async def async_start(hass: HomeAssistantType, discovery_topic, hass_config,
                     hass.data[CONFIG_ENTRY_IS_SETUP].add(config_entries_key)
 
             async_dispatcher_send(hass, MQTT_DISCOVERY_NEW.format(
-                component, platform), payload)
+                component, platform), platform_payloads)
 
     hass.data[DATA_CONFIG_ENTRY_LOCK] = asyncio.Lock()
     hass.data[CONFIG_ENTRY_IS_SETUP] = set()
@@ -261,3 +314,25 @@ async def async_start(hass: HomeAssistantType, discovery_topic, hass_config,
         hass, discovery_topic + '/#', async_device_message_received, 0)
 
     return True
+
+
+async def async_setup_discovered(discovery_payloads, platform_schema,
+                                 async_setup_entity, async_add_entities):
+    """Set up the entities of discovery payloads and add them at once.
+
+    async_setup_entity is called with the config, an add entities function
+    and the discovery hash of each payload.
+    """
+    entities = []  # type: list
+    for discovery_payload in discovery_payloads:
+        try:
+            config = platform_schema(discovery_payload)
+        except vol.Invalid as err:
+            _LOGGER.error("Invalid discovery payload for %s: %s",
+                          discovery_payload[ATTR_DISCOVERY_HASH], err)
+            continue
+        await async_setup_entity(config, entities.extend,
+                                 discovery_payload[ATTR_DISCOVERY_HASH])
+
+    if entities:
+        async_add_entities(entities)
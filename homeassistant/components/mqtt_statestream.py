@@ -4,20 +4,26 @@ Publish simple item state changes via MQTT.
 For more details about this component, please refer to the documentation at
 https://home-assistant.io/components/mqtt_statestream/
 """
+from collections import OrderedDict
+from datetime import timedelta
 import json
 
 import voluptuous as vol
 
 from homeassistant.const import (CONF_DOMAINS, CONF_ENTITIES, CONF_EXCLUDE,
-                                 CONF_INCLUDE, MATCH_ALL)
+                                 CONF_INCLUDE, EVENT_HOMEASSISTANT_STOP,
+                                 MATCH_ALL)
 from homeassistant.core import callback
 from homeassistant.components.mqtt import valid_publish_topic
 from homeassistant.helpers.entityfilter import generate_filter
-from homeassistant.helpers.event import async_track_state_change
+from homeassistant.helpers.event import (
+    async_track_point_in_utc_time, async_track_state_change)
 from homeassistant.helpers.json import JSONEncoder
 import homeassistant.helpers.config_validation as cv
+import homeassistant.util.dt as dt_util
 
 CONF_BASE_TOPIC = 'base_topic'
+CONF_MIN_INTERVAL = 'min_interval'
 CONF_PUBLISH_ATTRIBUTES = 'publish_attributes'
 CONF_PUBLISH_TIMESTAMPS = 'publish_timestamps'
 DEPENDENCIES = ['mqtt']
@@ -37,7 +43,8 @@ CONFIG_SCHEMA = vol.Schema({
         }),
         vol.Required(CONF_BASE_TOPIC): valid_publish_topic,
         vol.Optional(CONF_PUBLISH_ATTRIBUTES, default=False): cv.boolean,
-        vol.Optional(CONF_PUBLISH_TIMESTAMPS, default=False): cv.boolean
+        vol.Optional(CONF_PUBLISH_TIMESTAMPS, default=False): cv.boolean,
+        vol.Optional(CONF_MIN_INTERVAL, default=timedelta()): cv.time_period,
     })
 }, extra=vol.ALLOW_EXTRA)
 
@@ -54,17 +61,22 @@ async def async_setup(hass, config):
                                      pub_include.get(CONF_ENTITIES, []),
                                      pub_exclude.get(CONF_DOMAINS, []),
                                      pub_exclude.get(CONF_ENTITIES, []))
+    min_interval = conf.get(CONF_MIN_INTERVAL)
     if not base_topic.endswith('/'):
         base_topic = base_topic + '/'
 
-    @callback
-    def _state_publisher(entity_id, old_state, new_state):
-        if new_state is None:
-            return
-
-        if not publish_filter(entity_id):
-            return
+    # Time the state of each entity was last published
+    last_published = {}
+    # Encoded attributes last published for each entity
+    published_attributes = {}
+    # Latest state of the entities waiting for min_interval to pass
+    pending = OrderedDict()
+    cancel_flush = None
 
+    @callback
+    def _publish(new_state):
+        """Publish a state, skipping the attributes that did not change."""
+        entity_id = new_state.entity_id
         payload = new_state.state
 
         mybase = base_topic + entity_id.replace('.', '/') + '/'
@@ -85,10 +97,69 @@ async def async_setup(hass, config):
                     True)
 
         if publish_attributes:
+            previous = published_attributes.get(entity_id, {})
+            encoded = published_attributes[entity_id] = {}
             for key, val in new_state.attributes.items():
-                encoded_val = json.dumps(val, cls=JSONEncoder)
-                hass.components.mqtt.async_publish(mybase + key,
-                                                   encoded_val, 1, True)
+                encoded_val = encoded[key] = json.dumps(val, cls=JSONEncoder)
+                # The previous value is retained by the broker
+                if previous.get(key) != encoded_val:
+                    hass.components.mqtt.async_publish(mybase + key,
+                                                       encoded_val, 1, True)
+
+    @callback
+    def _schedule_flush():
+        """Schedule publishing the pending state that is due first."""
+        nonlocal cancel_flush
+        if cancel_flush is not None or not pending:
+            return
+        next_due = min(last_published[entity_id] for entity_id in pending)
+        cancel_flush = async_track_point_in_utc_time(
+            hass, _flush_pending, next_due + min_interval)
+
+    @callback
+    def _flush_pending(now):
+        """Publish all pending states that are due, in one go."""
+        nonlocal cancel_flush
+        cancel_flush = None
+        for entity_id in list(pending):
+            if now - last_published[entity_id] >= min_interval:
+                last_published[entity_id] = now
+                _publish(pending.pop(entity_id))
+        _schedule_flush()
+
+    @callback
+    def _state_publisher(entity_id, old_state, new_state):
+        if new_state is None:
+            pending.pop(entity_id, None)
+            last_published.pop(entity_id, None)
+            published_attributes.pop(entity_id, None)
+            return
+
+        if not publish_filter(entity_id):
+            return
+
+        if not min_interval:
+            _publish(new_state)
+            return
+
+        now = dt_util.utcnow()
+        last = last_published.get(entity_id)
+        if entity_id not in pending and \
+                (last is None or now - last >= min_interval):
+            last_published[entity_id] = now
+            _publish(new_state)
+            return
+
+        # Only the latest state is published once min_interval has passed
+        pending[entity_id] = new_state
+        _schedule_flush()
+
+    @callback
+    def _publish_all_pending(event):
+        """Publish the final states of the pending entities."""
+        while pending:
+            _publish(pending.popitem(last=False)[1])
 
     async_track_state_change(hass, MATCH_ALL, _state_publisher)
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _publish_all_pending)
     return True
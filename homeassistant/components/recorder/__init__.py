@@ -8,14 +8,14 @@ For more details about this component, please refer to the documentation at
 https://home-assistant.io/components/recorder/
 """
 import asyncio
-from collections import namedtuple
+from collections import OrderedDict, deque, namedtuple
 import concurrent.futures
 from datetime import datetime, timedelta
 import logging
 import queue
 import threading
 import time
-from typing import Any, Dict, Optional  # noqa: F401
+from typing import Any, Callable, Dict, List, Optional  # noqa: F401
 
 import voluptuous as vol
 
@@ -23,14 +23,15 @@ from homeassistant.const import (
     ATTR_ENTITY_ID, CONF_DOMAINS, CONF_ENTITIES, CONF_EXCLUDE, CONF_INCLUDE,
     EVENT_HOMEASSISTANT_START, EVENT_HOMEASSISTANT_STOP, EVENT_STATE_CHANGED,
     EVENT_TIME_CHANGED, MATCH_ALL)
-from homeassistant.core import CoreState, HomeAssistant, callback
+from homeassistant.components import websocket_api
+from homeassistant.core import CoreState, Event, HomeAssistant, callback
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.entityfilter import generate_filter
 from homeassistant.helpers.typing import ConfigType
 import homeassistant.util.dt as dt_util
 from homeassistant.loader import bind_hass
 
-from . import migration, purge
+from . import migration, purge, snapshot, statistics
 from .const import DATA_INSTANCE
 from .util import session_scope
 
@@ -57,9 +58,36 @@ CONF_DB_URL = 'db_url'
 CONF_PURGE_KEEP_DAYS = 'purge_keep_days'
 CONF_PURGE_INTERVAL = 'purge_interval'
 CONF_EVENT_TYPES = 'event_types'
+CONF_COMMIT_INTERVAL = 'commit_interval'
+CONF_COMMIT_MAX_ROWS = 'commit_max_rows'
+CONF_MINIMAL_STATE_EVENTS = 'minimal_state_events'
+CONF_MAX_QUEUE_SIZE = 'max_queue_size'
+CONF_OVERFLOW_POLICY = 'overflow_policy'
+CONF_STATISTICS_KEEP_DAYS = 'statistics_keep_days'
+
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_DROP_NEW = 'drop_new'
+
+DEFAULT_COMMIT_INTERVAL = 1
+DEFAULT_COMMIT_MAX_ROWS = 1000
+DEFAULT_STATISTICS_KEEP_DAYS = 365 * 2
 
 CONNECT_RETRY_WAIT = 3
 
+# Number of shared attribute ids kept in memory by the recorder
+ATTRIBUTES_CACHE_SIZE = 2048
+
+# Connections and threads for queries of history, logbook and statistics
+READ_POOL_SIZE = 4
+
+# Seconds of commits the rows per second metric is calculated over
+METRICS_WINDOW = 60
+
+WS_TYPE_RECORDER_METRICS = 'recorder/metrics'
+SCHEMA_WS_RECORDER_METRICS = websocket_api.BASE_COMMAND_MESSAGE_SCHEMA.extend({
+    vol.Required('type'): WS_TYPE_RECORDER_METRICS,
+})
+
 FILTER_SCHEMA = vol.Schema({
     vol.Optional(CONF_EXCLUDE, default={}): vol.Schema({
         vol.Optional(CONF_DOMAINS): vol.All(cv.ensure_list, [cv.string]),
@@ -79,6 +107,18 @@ CONFIG_SCHEMA = vol.Schema({
         vol.Optional(CONF_PURGE_INTERVAL, default=1):
             vol.All(vol.Coerce(int), vol.Range(min=0)),
         vol.Optional(CONF_DB_URL): cv.string,
+        vol.Optional(CONF_COMMIT_INTERVAL, default=DEFAULT_COMMIT_INTERVAL):
+            vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_COMMIT_MAX_ROWS, default=DEFAULT_COMMIT_MAX_ROWS):
+            vol.All(vol.Coerce(int), vol.Range(min=1)),
+        vol.Optional(CONF_MINIMAL_STATE_EVENTS, default=False): cv.boolean,
+        vol.Optional(CONF_MAX_QUEUE_SIZE, default=0):
+            vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(CONF_OVERFLOW_POLICY, default=OVERFLOW_DROP_OLDEST):
+            vol.In([OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEW]),
+        vol.Optional(CONF_STATISTICS_KEEP_DAYS,
+                     default=DEFAULT_STATISTICS_KEEP_DAYS):
+            vol.All(vol.Coerce(int), vol.Range(min=1)),
     })
 }, extra=vol.ALLOW_EXTRA)
 
@@ -89,6 +129,20 @@ async def wait_connection_ready(hass):
     return await hass.data[DATA_INSTANCE].async_db_ready
 
 
+@bind_hass
+def async_add_read_job(hass, target, *args):
+    """Run a function that queries the database in a read thread.
+
+    This method must be run in the event loop.
+    """
+    async def run_job():
+        """Wait for the job, as a task Home Assistant can wait for."""
+        return await hass.loop.run_in_executor(
+            hass.data[DATA_INSTANCE].read_executor, target, *args)
+
+    return hass.async_add_job(run_job())
+
+
 def run_information(hass, point_in_time: Optional[datetime] = None):
     """Return information about current run.
 
@@ -115,6 +169,8 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     conf = config.get(DOMAIN, {})
     keep_days = conf.get(CONF_PURGE_KEEP_DAYS)
     purge_interval = conf.get(CONF_PURGE_INTERVAL)
+    commit_interval = conf.get(CONF_COMMIT_INTERVAL, DEFAULT_COMMIT_INTERVAL)
+    commit_max_rows = conf.get(CONF_COMMIT_MAX_ROWS, DEFAULT_COMMIT_MAX_ROWS)
 
     db_url = conf.get(CONF_DB_URL, None)
     if not db_url:
@@ -125,10 +181,20 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     exclude = conf.get(CONF_EXCLUDE, {})
     instance = hass.data[DATA_INSTANCE] = Recorder(
         hass=hass, keep_days=keep_days, purge_interval=purge_interval,
-        uri=db_url, include=include, exclude=exclude)
+        uri=db_url, include=include, exclude=exclude,
+        commit_interval=commit_interval, commit_max_rows=commit_max_rows,
+        minimal_state_events=conf.get(CONF_MINIMAL_STATE_EVENTS, False),
+        max_queue_size=conf.get(CONF_MAX_QUEUE_SIZE, 0),
+        overflow_policy=conf.get(CONF_OVERFLOW_POLICY, OVERFLOW_DROP_OLDEST),
+        statistics_keep_days=conf.get(
+            CONF_STATISTICS_KEEP_DAYS, DEFAULT_STATISTICS_KEEP_DAYS))
     instance.async_initialize()
     instance.start()
 
+    hass.components.websocket_api.async_register_command(
+        WS_TYPE_RECORDER_METRICS, websocket_recorder_metrics,
+        SCHEMA_WS_RECORDER_METRICS)
+
     async def async_handle_purge_service(service):
         """Handle calls to the purge service."""
         instance.do_adhoc_purge(**service.data)
@@ -140,22 +206,99 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     return await instance.async_db_ready
 
 
+@callback
+def websocket_recorder_metrics(hass, connection, msg):
+    """Return the health metrics of the recorder."""
+    connection.send_message(websocket_api.result_message(
+        msg['id'], hass.data[DATA_INSTANCE].get_metrics()))
+
+
 PurgeTask = namedtuple('PurgeTask', ['keep_days', 'repack'])
 
 
+class RecorderQueue(queue.Queue):
+    """Queue that drops events instead of growing past max_events.
+
+    Only events count towards max_events and only events are dropped,
+    purge tasks and the stop marker are always queued.
+    """
+
+    def __init__(self, max_events: int = 0,
+                 overflow_policy: str = OVERFLOW_DROP_OLDEST) -> None:
+        """Initialize the queue, a max_events of 0 is unbounded."""
+        super().__init__()
+        self.max_events = max_events
+        self.overflow_policy = overflow_policy
+        self.dropped = 0
+        self._events = 0
+
+    def put_event(self, event: Event) -> None:
+        """Put an event in the queue, dropping one if it is full."""
+        with self.not_full:
+            if self.max_events and self._events >= self.max_events:
+                if self.dropped % 10000 == 0:
+                    _LOGGER.warning(
+                        "The recorder queue holds %d events, dropping "
+                        "events (%s)", self._events, self.overflow_policy)
+                self.dropped += 1
+                if self.overflow_policy == OVERFLOW_DROP_NEW:
+                    return
+                self._drop_oldest_event()
+
+            self._put(event)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _drop_oldest_event(self) -> None:
+        """Remove the oldest event. Must be called with the mutex held."""
+        for index, item in enumerate(self.queue):
+            if isinstance(item, Event):
+                del self.queue[index]
+                self._events -= 1
+                self.unfinished_tasks -= 1
+                return
+
+    def _put(self, item: Any) -> None:
+        """Put an item in the queue."""
+        if isinstance(item, Event):
+            self._events += 1
+        super()._put(item)
+
+    def _get(self) -> Any:
+        """Get an item from the queue."""
+        item = super()._get()
+        if isinstance(item, Event):
+            self._events -= 1
+        return item
+
+
 class Recorder(threading.Thread):
     """A threaded recorder class."""
 
     def __init__(self, hass: HomeAssistant, keep_days: int,
                  purge_interval: int, uri: str,
-                 include: Dict, exclude: Dict) -> None:
+                 include: Dict, exclude: Dict,
+                 commit_interval: float = DEFAULT_COMMIT_INTERVAL,
+                 commit_max_rows: int = DEFAULT_COMMIT_MAX_ROWS,
+                 minimal_state_events: bool = False,
+                 max_queue_size: int = 0,
+                 overflow_policy: str = OVERFLOW_DROP_OLDEST,
+                 statistics_keep_days: int = DEFAULT_STATISTICS_KEEP_DAYS
+                 ) -> None:
         """Initialize the recorder."""
         threading.Thread.__init__(self, name='Recorder')
 
         self.hass = hass
         self.keep_days = keep_days
         self.purge_interval = purge_interval
-        self.queue = queue.Queue()  # type: Any
+        self.commit_interval = commit_interval
+        self.commit_max_rows = commit_max_rows
+        self.minimal_state_events = minimal_state_events
+        self.statistics_keep_days = statistics_keep_days
+        self.statistics = statistics.StatisticsCollector()
+        # Called with a session and the events of every commit
+        self._event_writers = []  # type: List[Callable[[Any, List], None]]
+        self.queue = RecorderQueue(max_queue_size, overflow_policy)
         self.recording_start = dt_util.utcnow()
         self.db_url = uri
         self.async_db_ready = asyncio.Future(loop=hass.loop)
@@ -167,13 +310,35 @@ class Recorder(threading.Thread):
             exclude.get(CONF_DOMAINS, []), exclude.get(CONF_ENTITIES, []))
         self.exclude_t = exclude.get(CONF_EVENT_TYPES, [])
 
+        # Time and number of rows of the commits within METRICS_WINDOW
+        self._commits = deque()  # type: deque
+        self._commit_latency = None  # type: Optional[float]
+        self._metrics_lock = threading.Lock()
+
+        # Id of the last recorded state of each entity
+        self._state_ids = {}  # type: Dict[str, int]
+        # Serialized attributes to the id of their state_attributes row
+        self._attributes_ids = OrderedDict()  # type: OrderedDict
+
         self.get_session = None
+        self.read_engine = None  # type: Any
+        self.get_read_session = None
+        self.read_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=READ_POOL_SIZE, thread_name_prefix='RecorderRead')
 
     @callback
     def async_initialize(self):
         """Initialize the recorder."""
         self.hass.bus.async_listen(MATCH_ALL, self.event_listener)
 
+    def add_event_writer(self, writer):
+        """Add a writer of rows derived from the recorded events.
+
+        The writer is called in the recorder thread with a new session and
+        the events of each commit, after they were committed.
+        """
+        self._event_writers.append(writer)
+
     def do_adhoc_purge(self, **kwargs):
         """Trigger an adhoc purge retaining keep_days worth of data."""
         keep_days = kwargs.get(ATTR_KEEP_DAYS, self.keep_days)
@@ -183,9 +348,8 @@ class Recorder(threading.Thread):
 
     def run(self):
         """Start processing events to save."""
-        from .models import States, Events
+        from .models import Events
         from homeassistant.components import persistent_notification
-        from sqlalchemy import exc
 
         tries = 1
         connected = False
@@ -218,6 +382,7 @@ class Recorder(threading.Thread):
             return
 
         shutdown_task = object()
+        snapshot_task = object()
         hass_started = concurrent.futures.Future()
 
         @callback
@@ -275,19 +440,63 @@ class Recorder(threading.Thread):
 
             self.hass.helpers.event.track_point_in_time(async_purge, run)
 
+        # Start periodic snapshots of the states
+        @callback
+        def async_snapshot(now):
+            """Trigger a snapshot."""
+            self.queue.put(snapshot_task)
+
+        self.hass.helpers.event.track_time_interval(
+            async_snapshot, snapshot.SNAPSHOT_INTERVAL)
+
+        # Events that are waiting to be committed in a single transaction
+        batch = []  # type: List[Any]
+        batch_rows = 0
+        batch_start = 0.0
+
         while True:
-            event = self.queue.get()
+            if not batch:
+                event = self.queue.get()
+            else:
+                # Keep draining the queue until the commit interval of the
+                # oldest pending event has passed. With an interval of 0 the
+                # batch is committed as soon as the queue is empty.
+                timeout = self.commit_interval - (
+                    time.monotonic() - batch_start)
+                try:
+                    if timeout > 0:
+                        event = self.queue.get(timeout=timeout)
+                    else:
+                        event = self.queue.get_nowait()
+                except queue.Empty:
+                    self._commit_events(batch)
+                    batch = []
+                    continue
 
             if event is None:
+                self._commit_events(batch)
+                self._write_statistics(all_periods=True)
                 self._close_run()
+                self.read_executor.shutdown()
                 self._close_connection()
                 self.queue.task_done()
                 return
-            if isinstance(event, PurgeTask):
-                purge.purge_old_data(self, event.keep_days, event.repack)
+            if isinstance(event, (PurgeTask, purge.PurgeRun)):
+                self._commit_events(batch)
+                batch = []
+                if isinstance(event, PurgeTask):
+                    event = purge.PurgeRun(event.keep_days, event.repack)
+                # Continue after the events that were queued meanwhile
+                if not event.run(self):
+                    self.queue.put(event)
+                # Cached attribute rows may have been deleted
+                self._attributes_ids.clear()
                 self.queue.task_done()
                 continue
-            elif event.event_type == EVENT_TIME_CHANGED:
+            elif event is snapshot_task:
+                self._commit_events(batch)
+                batch = []
+                self._write_snapshot()
                 self.queue.task_done()
                 continue
             elif event.event_type in self.exclude_t:
@@ -300,39 +509,234 @@ class Recorder(threading.Thread):
                     self.queue.task_done()
                     continue
 
-            tries = 1
-            updated = False
-            while not updated and tries <= 10:
-                if tries != 1:
-                    time.sleep(CONNECT_RETRY_WAIT)
-                try:
-                    with session_scope(session=self.get_session()) as session:
-                        dbevent = Events.from_event(event)
-                        session.add(dbevent)
-                        session.flush()
-
-                        if event.event_type == EVENT_STATE_CHANGED:
-                            dbstate = States.from_event(event)
-                            dbstate.event_id = dbevent.event_id
-                            session.add(dbstate)
-                    updated = True
-
-                except exc.OperationalError as err:
-                    _LOGGER.error("Error in database connectivity: %s. "
-                                  "(retrying in %s seconds)", err,
-                                  CONNECT_RETRY_WAIT)
-                    tries += 1
-
-            if not updated:
-                _LOGGER.error("Error in database update. Could not save "
-                              "after %d tries. Giving up", tries)
+            if not batch:
+                batch_rows = 0
+                batch_start = time.monotonic()
+
+            batch.append(event)
+            batch_rows += 2 if event.event_type == EVENT_STATE_CHANGED else 1
+
+            if batch_rows >= self.commit_max_rows:
+                self._commit_events(batch)
+                batch = []
+
+    def _commit_events(self, events):
+        """Write events and their states in a single transaction."""
+        from sqlalchemy import exc
+
+        if not events:
+            return
+
+        # Ids that are only valid once the transaction is committed
+        new_attributes_ids = {}  # type: Dict[str, int]
+        new_state_ids = {}  # type: Dict[str, Optional[int]]
+
+        tries = 1
+        updated = False
+        while not updated and tries <= 10:
+            if tries != 1:
+                time.sleep(CONNECT_RETRY_WAIT)
+            try:
+                commit_start = time.monotonic()
+                with session_scope(session=self.get_session()) as session:
+                    rows = self._add_events(
+                        session, events, new_attributes_ids, new_state_ids)
+                self._add_commit_metrics(commit_start, rows)
+                updated = True
+
+            except exc.OperationalError as err:
+                _LOGGER.error("Error in database connectivity: %s. "
+                              "(retrying in %s seconds)", err,
+                              CONNECT_RETRY_WAIT)
+                new_attributes_ids.clear()
+                new_state_ids.clear()
+                tries += 1
 
+        if not updated:
+            _LOGGER.error("Error in database update. Could not save %d "
+                          "events after %d tries. Giving up",
+                          len(events), tries)
+        else:
+            self.statistics.add_events(events)
+            self._write_statistics()
+            self._write_derived(events)
+
+        for entity_id, state_id in new_state_ids.items():
+            if state_id is None:
+                self._state_ids.pop(entity_id, None)
+            else:
+                self._state_ids[entity_id] = state_id
+
+        self._attributes_ids.update(new_attributes_ids)
+        while len(self._attributes_ids) > ATTRIBUTES_CACHE_SIZE:
+            self._attributes_ids.popitem(last=False)
+
+        for _ in events:
             self.queue.task_done()
 
+    def _add_events(self, session, events, new_attributes_ids,
+                    new_state_ids):
+        """Add events and the states of state_changed events to session."""
+        from .models import States, Events
+
+        dbevents = []
+        dbstates = []
+        # States of this batch by entity id
+        batch_states = {}  # type: Dict[str, Any]
+
+        for event in events:
+            if event.event_type != EVENT_STATE_CHANGED:
+                dbevents.append(Events.from_event(event))
+                dbstates.append(None)
+                continue
+
+            entity_id = event.data['entity_id']
+            dbstate = States.from_event(event)
+
+            if event.data.get('old_state') is not None:
+                old_dbstate = batch_states.get(entity_id)
+                if old_dbstate is not None:
+                    dbstate.old_state = old_dbstate
+                else:
+                    dbstate.old_state_id = self._state_ids.get(entity_id)
+                linked = (old_dbstate is not None or
+                          dbstate.old_state_id is not None)
+            else:
+                linked = True
+
+            # Removals and states without a known old state keep the full
+            # event data, everything else can be rebuilt from the states.
+            minimal = (self.minimal_state_events and linked and
+                       event.data.get('new_state') is not None)
+
+            dbevents.append(Events.from_event(event, minimal))
+            dbstates.append(dbstate)
+
+            if event.data.get('new_state') is None:
+                batch_states.pop(entity_id, None)
+                new_state_ids[entity_id] = None
+            else:
+                batch_states[entity_id] = dbstate
+
+        session.add_all(dbevents)
+        session.flush()
+
+        for dbevent, dbstate in zip(dbevents, dbstates):
+            if dbstate is None:
+                continue
+            dbstate.event_id = dbevent.event_id
+            dbstate.attributes_id = self._get_attributes_id(
+                session, dbstate.attributes, new_attributes_ids)
+            dbstate.attributes = None
+            session.add(dbstate)
+
+        session.flush()
+
+        for entity_id, dbstate in batch_states.items():
+            new_state_ids[entity_id] = dbstate.state_id
+
+        return len(dbevents) + sum(
+            1 for dbstate in dbstates if dbstate is not None)
+
+    def _write_statistics(self, all_periods=False):
+        """Write the statistics of the periods that are over."""
+        from sqlalchemy import exc
+
+        if not self.statistics.complete(
+                None if all_periods else dt_util.utcnow()):
+            return
+
+        try:
+            with session_scope(session=self.get_session()) as session:
+                self.statistics.write(session)
+        except exc.SQLAlchemyError as err:
+            _LOGGER.error("Error writing statistics: %s", err)
+
+    def _write_derived(self, events):
+        """Run the event writers on committed events."""
+        from sqlalchemy import exc
+
+        for writer in self._event_writers:
+            try:
+                with session_scope(session=self.get_session()) as session:
+                    writer(session, events)
+            except exc.SQLAlchemyError as err:
+                _LOGGER.error("Error writing rows of %s: %s", writer, err)
+
+    def _write_snapshot(self):
+        """Write a snapshot of the most recent state of each entity."""
+        from sqlalchemy import exc
+
+        try:
+            with session_scope(session=self.get_session()) as session:
+                snapshot.write_snapshot(
+                    session, self.run_info.start, dt_util.utcnow())
+        except exc.SQLAlchemyError as err:
+            # Queries work without snapshots, only slower
+            _LOGGER.error("Error writing snapshot of the states: %s", err)
+
+    def _add_commit_metrics(self, commit_start, rows):
+        """Record how long a commit of rows took."""
+        now = time.monotonic()
+        with self._metrics_lock:
+            self._commit_latency = now - commit_start
+            self._commits.append((now, rows))
+
+    def get_metrics(self):
+        """Return the health metrics of the recorder."""
+        now = time.monotonic()
+        with self._metrics_lock:
+            while self._commits and \
+                    self._commits[0][0] < now - METRICS_WINDOW:
+                self._commits.popleft()
+            rows = sum(commit[1] for commit in self._commits)
+            commit_latency = self._commit_latency
+
+        return {
+            'queue_depth': self.queue.qsize(),
+            'max_queue_size': self.queue.max_events,
+            'dropped_events': self.queue.dropped,
+            'commit_latency': commit_latency,
+            'rows_per_second': rows / METRICS_WINDOW,
+        }
+
+    def _get_attributes_id(self, session, shared_attrs, new_attributes_ids):
+        """Return the id of the state_attributes row for shared_attrs.
+
+        A new row is only added if no row with these attributes exists.
+        """
+        from .models import StateAttributes
+
+        attributes_id = new_attributes_ids.get(shared_attrs)
+        if attributes_id is not None:
+            return attributes_id
+
+        attributes_id = self._attributes_ids.get(shared_attrs)
+        if attributes_id is not None:
+            self._attributes_ids.move_to_end(shared_attrs)
+            return attributes_id
+
+        attributes_hash = StateAttributes.hash_shared_attrs(shared_attrs)
+        for dbattributes in session.query(StateAttributes).filter_by(
+                hash=attributes_hash):
+            if dbattributes.shared_attrs == shared_attrs:
+                break
+        else:
+            dbattributes = StateAttributes(
+                hash=attributes_hash, shared_attrs=shared_attrs)
+            session.add(dbattributes)
+            session.flush()
+
+        attributes_id = new_attributes_ids[shared_attrs] = \
+            dbattributes.attributes_id
+        return attributes_id
+
     @callback
     def event_listener(self, event):
         """Listen for new events and put them in the process queue."""
-        self.queue.put(event)
+        if event.event_type == EVENT_TIME_CHANGED:
+            return
+        self.queue.put_event(event)
 
     def block_till_done(self):
         """Block till all events processed."""
@@ -377,9 +781,57 @@ class Recorder(threading.Thread):
         self.engine = create_engine(self.db_url, **kwargs)
         models.Base.metadata.create_all(self.engine)
         self.get_session = scoped_session(sessionmaker(bind=self.engine))
+        self._setup_read_connection()
+
+    def _setup_read_connection(self):
+        """Set up the engine used by queries outside the recorder thread.
+
+        SQLite databases are read through read-only connections, which do
+        not block the writer in WAL mode. Other databases get a pool of
+        their own.
+        """
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import scoped_session
+        from sqlalchemy.orm import sessionmaker
+        from sqlalchemy.pool import QueuePool
+
+        if self.read_engine is not None:
+            self.read_engine.dispose()
+            self.read_engine = None
+
+        url = self.engine.url
+        if url.drivername.startswith('sqlite'):
+            if not url.database or url.database == ':memory:':
+                # Other connections can not see an in memory database
+                self.get_read_session = self.get_session
+                return
+
+            import sqlite3
+            from urllib.request import pathname2url
+
+            uri = 'file:{}?mode=ro'.format(pathname2url(url.database))
+
+            def connect():
+                """Open a read-only connection."""
+                return sqlite3.connect(
+                    uri, uri=True, check_same_thread=False)
+
+            self.read_engine = create_engine(
+                'sqlite://', creator=connect, poolclass=QueuePool,
+                pool_size=READ_POOL_SIZE)
+        else:
+            self.read_engine = create_engine(
+                url, pool_size=READ_POOL_SIZE)
+
+        self.get_read_session = scoped_session(
+            sessionmaker(bind=self.read_engine))
 
     def _close_connection(self):
         """Close the connection."""
+        if self.read_engine is not None:
+            self.read_engine.dispose()
+            self.read_engine = None
+        self.get_read_session = None
         self.engine.dispose()
         self.engine = None
         self.get_session = None
@@ -7,6 +7,12 @@ from .util import session_scope
 _LOGGER = logging.getLogger(__name__)
 PROGRESS_FILE = '.migration_progress'
 
+# Number of states updated per transaction when moving state attributes
+MOVE_ATTRIBUTES_CHUNK_SIZE = 10000
+
+# Number of states updated per transaction when setting their significance
+SIGNIFICANT_CHUNK_SIZE = 10000
+
 
 def migrate_schema(instance):
     """Check if the schema needs to be upgraded."""
@@ -218,11 +224,160 @@ def _apply_update(engine, new_version, old_version):
         ])
         _create_index(engine, "states", "ix_states_context_id")
         _create_index(engine, "states", "ix_states_context_user_id")
+    elif new_version == 7:
+        from .models import StateAttributes
+
+        StateAttributes.__table__.create(engine, checkfirst=True)
+        _add_columns(engine, "states", [
+            'attributes_id INTEGER',
+        ])
+        _create_index(engine, "states", "ix_states_attributes_id")
+        _move_state_attributes(engine)
+    elif new_version == 8:
+        _add_columns(engine, "states", [
+            'old_state_id INTEGER',
+        ])
+    elif new_version == 9:
+        _add_columns(engine, "states", [
+            'significant BOOLEAN',
+        ])
+        _create_index(engine, "states", "ix_states_significant_last_updated")
+        _update_significant(engine)
+    elif new_version == 10:
+        from .models import SnapshotStates, StateSnapshots
+
+        StateSnapshots.__table__.create(engine, checkfirst=True)
+        SnapshotStates.__table__.create(engine, checkfirst=True)
+    elif new_version == 11:
+        from .models import Statistics
+
+        Statistics.__table__.create(engine, checkfirst=True)
+    elif new_version == 12:
+        from .models import LogbookEntries
+
+        LogbookEntries.__table__.create(engine, checkfirst=True)
     else:
         raise ValueError("No schema migration defined for version {}"
                          .format(new_version))
 
 
+def _move_state_attributes(engine):
+    """Move the attributes of existing states to the shared table.
+
+    States are processed in chunks of MOVE_ATTRIBUTES_CHUNK_SIZE rows, each
+    in its own transaction.
+    """
+    from sqlalchemy import bindparam, text
+    from .models import StateAttributes
+
+    _LOGGER.info("Moving state attributes to a shared table. Note: this can "
+                 "take several minutes on large databases and slow "
+                 "computers. Please be patient!")
+
+    attributes_table = StateAttributes.__table__
+    select_states = text(
+        "SELECT state_id, attributes FROM states "
+        "WHERE state_id > :last_state_id AND attributes IS NOT NULL "
+        "ORDER BY state_id LIMIT :limit")
+    update_states = text(
+        "UPDATE states SET attributes_id = :attributes_id, attributes = NULL "
+        "WHERE state_id IN :state_ids").bindparams(
+            bindparam('state_ids', expanding=True))
+
+    attributes_ids = {}
+    last_state_id = 0
+
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select_states, last_state_id=last_state_id,
+                limit=MOVE_ATTRIBUTES_CHUNK_SIZE).fetchall()
+
+            if not rows:
+                return
+
+            state_ids = {}
+            for state_id, shared_attrs in rows:
+                attributes_id = attributes_ids.get(shared_attrs)
+                if attributes_id is None:
+                    result = connection.execute(
+                        attributes_table.insert().values(
+                            hash=StateAttributes.hash_shared_attrs(
+                                shared_attrs),
+                            shared_attrs=shared_attrs))
+                    attributes_id = attributes_ids[shared_attrs] = \
+                        result.inserted_primary_key[0]
+                state_ids.setdefault(attributes_id, []).append(state_id)
+
+            for attributes_id, ids in state_ids.items():
+                connection.execute(
+                    update_states, attributes_id=attributes_id,
+                    state_ids=ids)
+
+            last_state_id = rows[-1][0]
+            _LOGGER.debug("Moved attributes of states up to id %s",
+                          last_state_id)
+
+
+def _update_significant(engine):
+    """Set if the existing states are significant.
+
+    States are processed in chunks of SIGNIFICANT_CHUNK_SIZE rows, each in
+    its own transaction.
+    """
+    import json
+    from sqlalchemy import bindparam, text
+    from .models import is_significant
+
+    select_states = text(
+        "SELECT states.state_id, states.domain, "
+        "states.last_changed = states.last_updated, "
+        "COALESCE(states.attributes, state_attributes.shared_attrs) "
+        "FROM states LEFT OUTER JOIN state_attributes "
+        "ON states.attributes_id = state_attributes.attributes_id "
+        "WHERE states.state_id > :last_state_id "
+        "ORDER BY states.state_id LIMIT :limit")
+    update_states = text(
+        "UPDATE states SET significant = :significant "
+        "WHERE state_id IN :state_ids").bindparams(
+            bindparam('state_ids', expanding=True))
+
+    last_state_id = 0
+
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select_states, last_state_id=last_state_id,
+                limit=SIGNIFICANT_CHUNK_SIZE).fetchall()
+
+            if not rows:
+                return
+
+            state_ids = {True: [], False: []}
+            for state_id, domain, state_changed, attributes in rows:
+                # Only decode the attributes that can make a difference
+                if attributes and (domain == 'script' or
+                                   '"hidden"' in attributes):
+                    try:
+                        attributes = json.loads(attributes)
+                    except ValueError:
+                        attributes = {}
+                else:
+                    attributes = {}
+                state_ids[is_significant(
+                    domain, attributes, bool(state_changed))].append(state_id)
+
+            for significant, ids in state_ids.items():
+                if ids:
+                    connection.execute(
+                        update_states, significant=significant,
+                        state_ids=ids)
+
+            last_state_id = rows[-1][0]
+            _LOGGER.debug("Updated significance of states up to id %s",
+                          last_state_id)
+
+
 def _inspect_schema_version(engine, session):
     """Determine the schema version by inspecting the db structure.
 
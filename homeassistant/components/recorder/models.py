@@ -1,14 +1,17 @@
 """Models for SQLAlchemy."""
+import hashlib
 import json
 from datetime import datetime
 import logging
 
 from sqlalchemy import (
-    Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Text,
-    distinct)
+    Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String,
+    Text, distinct)
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
 
 import homeassistant.util.dt as dt_util
+from homeassistant.const import ATTR_HIDDEN, EVENT_STATE_CHANGED
 from homeassistant.core import (
     Context, Event, EventOrigin, State, split_entity_id)
 from homeassistant.helpers.json import JSONEncoder
@@ -17,10 +20,16 @@ from homeassistant.helpers.json import JSONEncoder
 # pylint: disable=invalid-name
 Base = declarative_base()
 
-SCHEMA_VERSION = 6
+SCHEMA_VERSION = 12
 
 _LOGGER = logging.getLogger(__name__)
 
+# All states of these domains are significant, not only the state changes
+SIGNIFICANT_DOMAINS = ('thermostat', 'climate')
+
+# Attribute of scripts that can change state
+ATTR_CAN_CANCEL = 'can_cancel'
+
 
 class Events(Base):  # type: ignore
     """Event history data."""
@@ -36,27 +45,43 @@ class Events(Base):  # type: ignore
     context_user_id = Column(String(36), index=True)
 
     @staticmethod
-    def from_event(event):
-        """Create an event database object from a native event."""
+    def from_event(event, minimal=False):
+        """Create an event database object from a native event.
+
+        With minimal, only the entity_id of a state_changed event is stored.
+        Its states are rebuilt from the states table by to_native.
+        """
+        if minimal:
+            event_data = json.dumps({'entity_id': event.data['entity_id']})
+        else:
+            event_data = json.dumps(event.data, cls=JSONEncoder)
         return Events(event_type=event.event_type,
-                      event_data=json.dumps(event.data, cls=JSONEncoder),
+                      event_data=event_data,
                       origin=str(event.origin),
                       time_fired=event.time_fired,
                       context_id=event.context.id,
                       context_user_id=event.context.user_id)
 
-    def to_native(self):
-        """Convert to a natve HA Event."""
+    def to_native(self, dbstate=None):
+        """Convert to a natve HA Event.
+
+        Pass the States row of a state_changed event as dbstate to avoid
+        looking it up when the event was stored minimal.
+        """
         context = Context(
             id=self.context_id,
             user_id=self.context_user_id
         )
         try:
+            data = json.loads(self.event_data)
+            if self.event_type == EVENT_STATE_CHANGED and \
+                    'new_state' not in data:
+                self._add_states(data, dbstate)
             return Event(
                 self.event_type,
-                json.loads(self.event_data),
+                data,
                 EventOrigin(self.origin),
-                _process_timestamp(self.time_fired),
+                process_timestamp(self.time_fired),
                 context=context,
             )
         except ValueError:
@@ -64,6 +89,41 @@ class Events(Base):  # type: ignore
             _LOGGER.exception("Error converting to event: %s", self)
             return None
 
+    def _add_states(self, data, dbstate):
+        """Add the old and new state of a minimal state_changed event."""
+        if dbstate is None:
+            from sqlalchemy.orm.session import Session
+
+            session = Session.object_session(self)
+            if session is None:
+                _LOGGER.warning("Unable to load the states of %s", self)
+                return
+
+            dbstate = session.query(States).filter(
+                States.event_id == self.event_id).first()
+            if dbstate is None:
+                return
+
+        # Match the data of events stored with all their data
+        data['old_state'] = None
+        if dbstate.old_state is not None:
+            data['old_state'] = _state_data(dbstate.old_state)
+        data['new_state'] = _state_data(dbstate)
+
+
+class StateAttributes(Base):   # type: ignore
+    """State attributes shared by all states that have the same ones."""
+
+    __tablename__ = 'state_attributes'
+    attributes_id = Column(Integer, primary_key=True)
+    hash = Column(String(40), index=True)
+    shared_attrs = Column(Text)
+
+    @staticmethod
+    def hash_shared_attrs(shared_attrs):
+        """Return the hash used to look up serialized attributes."""
+        return hashlib.sha1(shared_attrs.encode('utf-8')).hexdigest()
+
 
 class States(Base):   # type: ignore
     """State change history."""
@@ -75,6 +135,10 @@ class States(Base):   # type: ignore
     state = Column(String(255))
     attributes = Column(Text)
     event_id = Column(Integer, ForeignKey('events.event_id'), index=True)
+    attributes_id = Column(
+        Integer, ForeignKey('state_attributes.attributes_id'), index=True)
+    old_state_id = Column(Integer)
+    significant = Column(Boolean)
     last_changed = Column(DateTime(timezone=True), default=datetime.utcnow)
     last_updated = Column(DateTime(timezone=True), default=datetime.utcnow,
                           index=True)
@@ -82,11 +146,22 @@ class States(Base):   # type: ignore
     context_id = Column(String(36), index=True)
     context_user_id = Column(String(36), index=True)
 
+    # Loaded in the same query as the state
+    state_attributes = relationship(StateAttributes, lazy='joined')
+    old_state = relationship(
+        'States', foreign_keys=[old_state_id], remote_side=[state_id],
+        primaryjoin='States.old_state_id == States.state_id')
+
     __table_args__ = (
         # Used for fetching the state of entities at a specific time
         # (get_states in history.py)
         Index(
-            'ix_states_entity_id_last_updated', 'entity_id', 'last_updated'),)
+            'ix_states_entity_id_last_updated', 'entity_id', 'last_updated'),
+        # Used for fetching the significant states of a period
+        # (get_significant_states in history.py)
+        Index(
+            'ix_states_significant_last_updated', 'significant',
+            'last_updated'),)
 
     @staticmethod
     def from_event(event):
@@ -115,6 +190,10 @@ class States(Base):   # type: ignore
             dbstate.last_changed = state.last_changed
             dbstate.last_updated = state.last_updated
 
+        dbstate.significant = is_significant(
+            dbstate.domain, state.attributes if state else {},
+            dbstate.last_changed == dbstate.last_updated)
+
         return dbstate
 
     def to_native(self):
@@ -123,12 +202,16 @@ class States(Base):   # type: ignore
             id=self.context_id,
             user_id=self.context_user_id
         )
+        # Rows written before schema version 7 keep their own attributes
+        attributes = self.attributes
+        if attributes is None and self.state_attributes is not None:
+            attributes = self.state_attributes.shared_attrs
         try:
             return State(
                 self.entity_id, self.state,
-                json.loads(self.attributes),
-                _process_timestamp(self.last_changed),
-                _process_timestamp(self.last_updated),
+                json.loads(attributes or '{}'),
+                process_timestamp(self.last_changed),
+                process_timestamp(self.last_updated),
                 context=context,
             )
         except ValueError:
@@ -137,6 +220,117 @@ class States(Base):   # type: ignore
             return None
 
 
+class StateSnapshots(Base):   # type: ignore
+    """Snapshot of the most recent state of every entity."""
+
+    __tablename__ = 'state_snapshots'
+    snapshot_id = Column(Integer, primary_key=True)
+    point_in_time = Column(DateTime(timezone=True), index=True)
+    # States with a higher id were recorded after the snapshot
+    last_state_id = Column(Integer)
+    created = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+
+class SnapshotStates(Base):   # type: ignore
+    """State of an entity in a snapshot."""
+
+    __tablename__ = 'snapshot_states'
+    snapshot_id = Column(
+        Integer, ForeignKey('state_snapshots.snapshot_id'), primary_key=True)
+    # No foreign key, purged states simply drop out of the snapshot
+    state_id = Column(Integer, primary_key=True)
+
+
+class Statistics(Base):   # type: ignore
+    """Aggregate of the values of a numeric sensor during a period."""
+
+    __tablename__ = 'statistics'
+    statistic_id = Column(Integer, primary_key=True)
+    entity_id = Column(String(255))
+    # Length of the period in seconds
+    period = Column(Integer)
+    start = Column(DateTime(timezone=True), index=True)
+    min = Column(Float)
+    max = Column(Float)
+    mean = Column(Float)
+    last = Column(Float)
+    count = Column(Integer)
+    created = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_statistics_entity_id_period_start',
+              'entity_id', 'period', 'start'),)
+
+    @staticmethod
+    def from_aggregate(aggregate):
+        """Create a statistics row from an aggregate of the recorder."""
+        return Statistics(
+            entity_id=aggregate.entity_id,
+            period=aggregate.period,
+            start=aggregate.start,
+            min=aggregate.min,
+            max=aggregate.max,
+            mean=aggregate.sum / aggregate.count,
+            last=aggregate.last,
+            count=aggregate.count)
+
+    def to_native(self):
+        """Return the statistics as a dict."""
+        return {
+            'entity_id': self.entity_id,
+            'start': process_timestamp(self.start),
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'last': self.last,
+            'count': self.count,
+        }
+
+
+class LogbookEntries(Base):   # type: ignore
+    """Logbook entry of an event, written as the event is recorded."""
+
+    __tablename__ = 'logbook_entries'
+    entry_id = Column(Integer, primary_key=True)
+    time_fired = Column(DateTime(timezone=True), index=True)
+    name = Column(String(255))
+    message = Column(String(255))
+    domain = Column(String(64))
+    entity_id = Column(String(255))
+    context_id = Column(String(36), index=True)
+    context_user_id = Column(String(36))
+
+    __table_args__ = (
+        Index('ix_logbook_entries_entity_id_time_fired',
+              'entity_id', 'time_fired'),)
+
+    @staticmethod
+    def from_entry(entry):
+        """Create a row from a logbook entry."""
+        return LogbookEntries(
+            time_fired=entry['when'],
+            name=entry.get('name'),
+            message=entry.get('message'),
+            domain=entry.get('domain'),
+            entity_id=entry.get('entity_id'),
+            context_id=entry.get('context_id'),
+            context_user_id=entry.get('context_user_id'))
+
+    def to_native(self):
+        """Return the logbook entry as a dict."""
+        entry = {
+            'when': process_timestamp(self.time_fired),
+            'name': self.name,
+            'message': self.message,
+            'domain': self.domain,
+            'context_id': self.context_id,
+            'context_user_id': self.context_user_id,
+        }
+        if self.entity_id is not None:
+            entry['entity_id'] = self.entity_id
+        return entry
+
+
 class RecorderRuns(Base):   # type: ignore
     """Representation of recorder run."""
 
@@ -185,7 +379,32 @@ class SchemaChanges(Base):   # type: ignore
     changed = Column(DateTime(timezone=True), default=datetime.utcnow)
 
 
-def _process_timestamp(ts):
+def is_significant(domain, attributes, state_changed):
+    """Return if a state is significant for history charts.
+
+    Significant states are all state changes, as well as all states from
+    certain domains (for instance thermostat so that we get current
+    temperature in our graphs). Hidden states never are.
+    """
+    if attributes.get(ATTR_HIDDEN, False):
+        return False
+
+    # scripts that are not cancellable will never change state
+    if domain == 'script' and not attributes.get(ATTR_CAN_CANCEL):
+        return False
+
+    return state_changed or domain in SIGNIFICANT_DOMAINS
+
+
+def _state_data(dbstate):
+    """Return a state row as it is stored in the data of an event."""
+    state = dbstate.to_native()
+    if state is None:
+        return None
+    return json.loads(json.dumps(state, cls=JSONEncoder))
+
+
+def process_timestamp(ts):
     """Process a timestamp into datetime object."""
     if ts is None:
         return None
@@ -1,6 +1,7 @@
 """Purge old data helper."""
 from datetime import timedelta
 import logging
+import time
 
 import homeassistant.util.dt as dt_util
 
@@ -8,63 +9,295 @@ from .util import session_scope
 
 _LOGGER = logging.getLogger(__name__)
 
+# Rows looked at per transaction. Kept below the SQLite variable limit.
+PURGE_BATCH_SIZE = 500
+
+# Seconds spent purging before the recorder writes new events again
+PURGE_TIME_BUDGET = 1
+
 
 def purge_old_data(instance, purge_days, repack):
     """Purge events and states older than purge_days ago."""
-    from .models import States, Events
-    from sqlalchemy import func
+    purge_run = PurgeRun(purge_days, repack)
+    while not purge_run.run(instance):
+        pass
+
+
+class PurgeRun:
+    """Purge of the data older than purge_days, done in small batches.
+
+    Every batch is its own transaction, so the recorder can write new
+    events between the calls to run.
+    """
+
+    def __init__(self, purge_days, repack):
+        """Initialize the purge run."""
+        self.purge_before = dt_util.utcnow() - timedelta(days=purge_days)
+        self.repack = repack
+        self.deleted_states = 0
+        self.deleted_events = 0
+        self._batches = None
+
+    def run(self, instance, time_budget=None):
+        """Purge batches until done or time_budget seconds have passed.
+
+        Return True when the purge is done.
+        """
+        if time_budget is None:
+            time_budget = PURGE_TIME_BUDGET
+
+        if self._batches is None:
+            _LOGGER.debug("Purging events before %s", self.purge_before)
+            self._batches = self._purge(instance)
+
+        end = time.monotonic() + time_budget
+        for _ in self._batches:
+            if time.monotonic() >= end:
+                _LOGGER.info("Purging in progress, deleted %d states and %d "
+                             "events so far", self.deleted_states,
+                             self.deleted_events)
+                return False
+
+        _LOGGER.info("Purge done, deleted %d states and %d events",
+                     self.deleted_states, self.deleted_events)
+        return True
+
+    def _purge(self, instance):
+        """Delete the old data, yielding after every batch."""
+        from .models import States, Events
+        from sqlalchemy import func
+
+        # Rows written while purging are never old enough to be purged
+        with session_scope(session=instance.get_session()) as session:
+            max_state_id = session.query(func.max(States.state_id)) \
+                .filter(States.last_updated < self.purge_before).scalar()
+            max_event_id = session.query(func.max(Events.event_id)) \
+                .filter(Events.time_fired < self.purge_before).scalar()
+
+        while True:
+            with session_scope(session=instance.get_session()) as session:
+                purged = self._purge_snapshot(session)
+            if not purged:
+                break
+            yield
+
+        last_state_id = 0
+        while max_state_id is not None and last_state_id < max_state_id:
+            with session_scope(session=instance.get_session()) as session:
+                last_state_id = self._purge_states(
+                    session, last_state_id, max_state_id)
+            yield
+
+        last_attributes_id = 0
+        while last_attributes_id is not None:
+            with session_scope(session=instance.get_session()) as session:
+                last_attributes_id = self._purge_state_attributes(
+                    session, last_attributes_id)
+            yield
+
+        last_event_id = 0
+        while max_event_id is not None and last_event_id < max_event_id:
+            with session_scope(session=instance.get_session()) as session:
+                last_event_id = self._purge_events(
+                    session, last_event_id, max_event_id)
+            yield
+
+        while True:
+            with session_scope(session=instance.get_session()) as session:
+                deleted = self._purge_logbook_entries(session)
+            if not deleted:
+                break
+            yield
+
+        # Statistics are kept much longer than the states they come from
+        statistics_before = dt_util.utcnow() - timedelta(
+            days=instance.statistics_keep_days)
+        while True:
+            with session_scope(session=instance.get_session()) as session:
+                deleted = self._purge_statistics(session, statistics_before)
+            if not deleted:
+                break
+            yield
+
+        # Execute sqlite vacuum command to free up space on disk
+        _LOGGER.debug("DB engine driver: %s", instance.engine.driver)
+        if self.repack and instance.engine.driver == 'pysqlite':
+            from sqlalchemy import exc
+
+            _LOGGER.debug("Vacuuming SQLite to free space")
+            try:
+                instance.engine.execute("VACUUM")
+            except exc.OperationalError as err:
+                _LOGGER.error("Error vacuuming SQLite: %s.", err)
+
+    def _purge_snapshot(self, session):
+        """Delete the oldest snapshot taken before purge_before.
+
+        Return False when there is none left.
+        """
+        from .models import SnapshotStates, StateSnapshots
+
+        snapshot_id = session.query(StateSnapshots.snapshot_id) \
+            .filter(StateSnapshots.point_in_time < self.purge_before) \
+            .order_by(StateSnapshots.point_in_time) \
+            .limit(1) \
+            .scalar()
+
+        if snapshot_id is None:
+            return False
+
+        session.query(SnapshotStates) \
+            .filter(SnapshotStates.snapshot_id == snapshot_id) \
+            .delete(synchronize_session=False)
+        session.query(StateSnapshots) \
+            .filter(StateSnapshots.snapshot_id == snapshot_id) \
+            .delete(synchronize_session=False)
+        return True
 
-    purge_before = dt_util.utcnow() - timedelta(days=purge_days)
-    _LOGGER.debug("Purging events before %s", purge_before)
+    def _purge_states(self, session, last_state_id, max_state_id):
+        """Delete a batch of old states, return the last id looked at."""
+        from .models import States
+        from sqlalchemy import func
 
-    with session_scope(session=instance.get_session()) as session:
-        delete_states = session.query(States) \
-                            .filter((States.last_updated < purge_before))
+        rows = session.query(States.state_id, States.entity_id) \
+            .filter((States.state_id > last_state_id) &
+                    (States.state_id <= max_state_id) &
+                    (States.last_updated < self.purge_before)) \
+            .order_by(States.state_id) \
+            .limit(PURGE_BATCH_SIZE) \
+            .all()
+
+        if not rows:
+            return max_state_id
+
+        entity_ids = {row[1] for row in rows}
 
         # For each entity, the most recent state is protected from deletion
         # s.t. we can properly restore state even if the entity has not been
         # updated in a long time
-        protected_states = session.query(func.max(States.state_id)) \
-            .group_by(States.entity_id).all()
-
-        protected_state_ids = tuple(state[0] for state in protected_states)
-
-        if protected_state_ids:
-            delete_states = delete_states \
-                .filter(~States.state_id.in_(protected_state_ids))
-
-        deleted_rows = delete_states.delete(synchronize_session=False)
-        _LOGGER.debug("Deleted %s states", deleted_rows)
-
-        delete_events = session.query(Events) \
-            .filter((Events.time_fired < purge_before))
-
-        # We also need to protect the events belonging to the protected states.
-        # Otherwise, if the SQL server has "ON DELETE CASCADE" as default, it
-        # will delete the protected state when deleting its associated
-        # event. Also, we would be producing NULLed foreign keys otherwise.
-        if protected_state_ids:
-            protected_events = session.query(States.event_id) \
-                .filter(States.state_id.in_(protected_state_ids)) \
-                .filter(States.event_id.isnot(None)) \
-                .all()
-
-            protected_event_ids = tuple(state[0] for state in protected_events)
-
-            if protected_event_ids:
-                delete_events = delete_events \
-                    .filter(~Events.event_id.in_(protected_event_ids))
-
-        deleted_rows = delete_events.delete(synchronize_session=False)
-        _LOGGER.debug("Deleted %s events", deleted_rows)
-
-    # Execute sqlite vacuum command to free up space on disk
-    _LOGGER.debug("DB engine driver: %s", instance.engine.driver)
-    if repack and instance.engine.driver == 'pysqlite':
-        from sqlalchemy import exc
-
-        _LOGGER.debug("Vacuuming SQLite to free space")
-        try:
-            instance.engine.execute("VACUUM")
-        except exc.OperationalError as err:
-            _LOGGER.error("Error vacuuming SQLite: %s.", err)
+        protected_state_ids = {
+            row[0] for row in
+            session.query(func.max(States.state_id))
+            .filter(States.entity_id.in_(entity_ids))
+            .group_by(States.entity_id)}
+
+        # The old state of the first state that is kept is needed to
+        # rebuild its minimal state_changed event
+        first_kept = session.query(func.min(States.state_id)) \
+            .filter(States.entity_id.in_(entity_ids)) \
+            .filter(States.last_updated >= self.purge_before) \
+            .group_by(States.entity_id)
+        protected_state_ids.update(
+            row[0] for row in
+            session.query(States.old_state_id)
+            .filter(States.state_id.in_(first_kept) |
+                    States.state_id.in_(protected_state_ids)))
+
+        state_ids = {row[0] for row in rows} - protected_state_ids
+        if state_ids:
+            self.deleted_states += session.query(States) \
+                .filter(States.state_id.in_(state_ids)) \
+                .delete(synchronize_session=False)
+
+        return rows[-1][0]
+
+    @staticmethod
+    def _purge_state_attributes(session, last_attributes_id):
+        """Delete a batch of shared attributes no state refers to anymore.
+
+        Return the last id looked at or None when all were looked at.
+        """
+        from .models import States, StateAttributes
+
+        attributes_ids = [
+            row[0] for row in
+            session.query(StateAttributes.attributes_id)
+            .filter(StateAttributes.attributes_id > last_attributes_id)
+            .order_by(StateAttributes.attributes_id)
+            .limit(PURGE_BATCH_SIZE)]
+
+        if not attributes_ids:
+            return None
+
+        used_ids = {
+            row[0] for row in
+            session.query(States.attributes_id)
+            .filter(States.attributes_id.in_(attributes_ids))
+            .distinct()}
+
+        delete_ids = set(attributes_ids) - used_ids
+        if delete_ids:
+            session.query(StateAttributes) \
+                .filter(StateAttributes.attributes_id.in_(delete_ids)) \
+                .delete(synchronize_session=False)
+
+        return attributes_ids[-1]
+
+    def _purge_logbook_entries(self, session):
+        """Delete a batch of old logbook entries, return how many."""
+        from .models import LogbookEntries
+
+        entry_ids = [
+            row[0] for row in
+            session.query(LogbookEntries.entry_id)
+            .filter(LogbookEntries.time_fired < self.purge_before)
+            .limit(PURGE_BATCH_SIZE)]
+
+        if not entry_ids:
+            return 0
+
+        return session.query(LogbookEntries) \
+            .filter(LogbookEntries.entry_id.in_(entry_ids)) \
+            .delete(synchronize_session=False)
+
+    @staticmethod
+    def _purge_statistics(session, statistics_before):
+        """Delete a batch of statistics, return the number deleted."""
+        from .models import Statistics
+
+        statistic_ids = [
+            row[0] for row in
+            session.query(Statistics.statistic_id)
+            .filter(Statistics.start < statistics_before)
+            .limit(PURGE_BATCH_SIZE)]
+
+        if not statistic_ids:
+            return 0
+
+        return session.query(Statistics) \
+            .filter(Statistics.statistic_id.in_(statistic_ids)) \
+            .delete(synchronize_session=False)
+
+    def _purge_events(self, session, last_event_id, max_event_id):
+        """Delete a batch of old events, return the last id looked at."""
+        from .models import States, Events
+
+        event_ids = [
+            row[0] for row in
+            session.query(Events.event_id)
+            .filter((Events.event_id > last_event_id) &
+                    (Events.event_id <= max_event_id) &
+                    (Events.time_fired < self.purge_before))
+            .order_by(Events.event_id)
+            .limit(PURGE_BATCH_SIZE)]
+
+        if not event_ids:
+            return max_event_id
+
+        # We also need to protect the events belonging to the states that
+        # are kept. Otherwise, if the SQL server has "ON DELETE CASCADE" as
+        # default, it will delete the protected state when deleting its
+        # associated event. Also, we would be producing NULLed foreign keys
+        # otherwise.
+        protected_event_ids = {
+            row[0] for row in
+            session.query(States.event_id)
+            .filter(States.event_id.in_(event_ids))}
+
+        delete_ids = set(event_ids) - protected_event_ids
+        if delete_ids:
+            self.deleted_events += session.query(Events) \
+                .filter(Events.event_id.in_(delete_ids)) \
+                .delete(synchronize_session=False)
+
+        return event_ids[-1]
@@ -0,0 +1,93 @@
+"""Snapshots of the most recent state of every entity."""
+from datetime import timedelta
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+# Time between the snapshots written by the recorder
+SNAPSHOT_INTERVAL = timedelta(hours=1)
+
+
+def most_recent_state_ids(session, run_start, point_in_time):
+    """Return a subquery of the id of the most recent state of each entity.
+
+    Only states recorded since run_start and before point_in_time are
+    looked at. Instead of all states since run_start, only the states
+    recorded after the last snapshot in between are searched.
+    The subquery has a single column: max_state_id.
+    """
+    from sqlalchemy import and_, func, union_all
+    from sqlalchemy.orm import aliased
+    from .models import SnapshotStates, StateSnapshots, States
+
+    snapshot = session.query(StateSnapshots).filter(
+        (StateSnapshots.point_in_time >= run_start) &
+        (StateSnapshots.point_in_time < point_in_time)
+    ).order_by(StateSnapshots.point_in_time.desc()).first()
+
+    def recorded_since(states):
+        """Return the filter for the states to search."""
+        recorded = ((states.last_updated >= run_start) &
+                    (states.last_updated < point_in_time))
+        if snapshot is not None:
+            recorded &= states.state_id > snapshot.last_state_id
+        return recorded
+
+    most_recent_states_by_date = session.query(
+        States.entity_id.label('max_entity_id'),
+        func.max(States.last_updated).label('max_last_updated')
+    ).filter(recorded_since(States)).group_by(States.entity_id).subquery()
+
+    state_ids = session.query(
+        func.max(States.state_id).label('max_state_id')
+    ).join(most_recent_states_by_date, and_(
+        States.entity_id == most_recent_states_by_date.c.max_entity_id,
+        States.last_updated == most_recent_states_by_date.c.max_last_updated
+    )).group_by(States.entity_id)
+
+    if snapshot is None:
+        return state_ids.subquery()
+
+    # Entities that were not updated since keep the state of the snapshot
+    updated = aliased(States)
+    snapshot_state_ids = session.query(
+        SnapshotStates.state_id.label('max_state_id')
+    ).join(
+        States, States.state_id == SnapshotStates.state_id
+    ).filter(
+        (SnapshotStates.snapshot_id == snapshot.snapshot_id) &
+        ~States.entity_id.in_(
+            session.query(updated.entity_id).filter(recorded_since(updated))))
+
+    return union_all(
+        state_ids.statement, snapshot_state_ids.statement).alias()
+
+
+def write_snapshot(session, run_start, point_in_time):
+    """Store the most recent state of each entity at point_in_time.
+
+    The snapshot is used by the point in time queries after it, as long as
+    they are within the same recorder run.
+    """
+    from sqlalchemy import func, literal, select
+    from .models import SnapshotStates, StateSnapshots, States
+
+    last_state_id = session.query(func.max(States.state_id)).scalar()
+    if last_state_id is None:
+        return
+
+    state_ids = most_recent_state_ids(session, run_start, point_in_time)
+
+    dbsnapshot = StateSnapshots(
+        point_in_time=point_in_time, last_state_id=last_state_id)
+    session.add(dbsnapshot)
+    session.flush()
+
+    result = session.execute(
+        SnapshotStates.__table__.insert().from_select(
+            ['snapshot_id', 'state_id'],
+            select([literal(dbsnapshot.snapshot_id),
+                    state_ids.c.max_state_id])))
+
+    _LOGGER.debug("Wrote snapshot of %d states at %s", result.rowcount,
+                  point_in_time)
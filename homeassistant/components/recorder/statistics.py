@@ -0,0 +1,174 @@
+"""Long-term statistics of numeric sensors."""
+from datetime import timedelta
+import logging
+
+from homeassistant.const import EVENT_STATE_CHANGED
+import homeassistant.util.dt as dt_util
+
+from .util import execute, session_scope
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds per period of each resolution
+RESOLUTIONS = {
+    '5minute': 300,
+    'hour': 3600,
+}
+
+# Only the states of this domain are aggregated
+STATISTICS_DOMAIN = 'sensor'
+
+
+def period_start(utc_time, period):
+    """Return the start of the period of utc_time."""
+    timestamp = int(dt_util.as_timestamp(utc_time))
+    return dt_util.utc_from_timestamp(timestamp - timestamp % period)
+
+
+class Aggregate:
+    """Aggregate of the values of an entity during a period."""
+
+    def __init__(self, entity_id, period, start, value):
+        """Initialize the aggregate with its first value."""
+        self.entity_id = entity_id
+        self.period = period
+        self.start = start
+        self.end = start + timedelta(seconds=period)
+        self.min = self.max = self.last = value
+        self.sum = value
+        self.count = 1
+
+    def add(self, value):
+        """Add a value recorded after the ones added before."""
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.last = value
+        self.sum += value
+        self.count += 1
+
+    def merge_into(self, dbstatistic):
+        """Merge into the row stored for an earlier part of the period."""
+        total = dbstatistic.mean * dbstatistic.count + self.sum
+        dbstatistic.count += self.count
+        dbstatistic.mean = total / dbstatistic.count
+        dbstatistic.min = min(dbstatistic.min, self.min)
+        dbstatistic.max = max(dbstatistic.max, self.max)
+        dbstatistic.last = self.last
+
+
+class StatisticsCollector:
+    """Maintain the aggregates of the numeric sensors that are recorded.
+
+    Aggregates are kept in memory until their period is over and then
+    written to the statistics table.
+    """
+
+    def __init__(self):
+        """Initialize the collector."""
+        # Aggregate of the current period by entity id and period
+        self._aggregates = {}
+        # Aggregates of periods that are over and not written yet
+        self._completed = []
+        # End of the first period that is not over yet
+        self._next_end = None
+
+    def add_events(self, events):
+        """Add the new states of the state_changed events."""
+        for event in events:
+            if event.event_type != EVENT_STATE_CHANGED:
+                continue
+            state = event.data.get('new_state')
+            if state is None or state.domain != STATISTICS_DOMAIN:
+                continue
+            try:
+                value = float(state.state)
+            except ValueError:
+                continue
+            self._add_value(state.entity_id, state.last_updated, value)
+
+    def _add_value(self, entity_id, utc_time, value):
+        """Add the value of an entity to the aggregate of each period."""
+        for period in RESOLUTIONS.values():
+            start = period_start(utc_time, period)
+            aggregate = self._aggregates.get((entity_id, period))
+            if aggregate is not None and aggregate.start == start:
+                aggregate.add(value)
+                continue
+            if aggregate is not None and aggregate.start > start:
+                # Out of order value of a period that is already written
+                continue
+            new_aggregate = self._aggregates[(entity_id, period)] = \
+                Aggregate(entity_id, period, start, value)
+            if self._next_end is None or new_aggregate.end < self._next_end:
+                self._next_end = new_aggregate.end
+            if aggregate is not None:
+                self._completed.append(aggregate)
+
+    def complete(self, utc_now=None):
+        """Complete the aggregates of the periods over at utc_now.
+
+        Without utc_now all aggregates are completed, like on shutdown.
+        Return if there are aggregates to write.
+        """
+        if utc_now is None or \
+                (self._next_end is not None and self._next_end <= utc_now):
+            for key, aggregate in list(self._aggregates.items()):
+                if utc_now is None or aggregate.end <= utc_now:
+                    self._completed.append(aggregate)
+                    del self._aggregates[key]
+            self._next_end = min(
+                (aggregate.end for aggregate in self._aggregates.values()),
+                default=None)
+
+        return bool(self._completed)
+
+    def write(self, session):
+        """Write the completed aggregates.
+
+        Aggregates written for part of a period are merged with the rest
+        of it once it is over.
+        """
+        from .models import Statistics
+
+        for aggregate in self._completed:
+            dbstatistic = session.query(Statistics).filter(
+                (Statistics.entity_id == aggregate.entity_id) &
+                (Statistics.period == aggregate.period) &
+                (Statistics.start == aggregate.start)).first()
+            if dbstatistic is None:
+                session.add(Statistics.from_aggregate(aggregate))
+            else:
+                aggregate.merge_into(dbstatistic)
+
+        session.flush()
+        _LOGGER.debug("Wrote %d statistics", len(self._completed))
+        self._completed.clear()
+
+
+def get_statistics(hass, start_time, end_time=None, entity_ids=None,
+                   resolution='hour'):
+    """Return the statistics of the periods starting during the period.
+
+    Returns {'entity_id': [list of statistics]}, ordered by start.
+    """
+    from .models import Statistics
+
+    with session_scope(hass=hass) as session:
+        query = session.query(Statistics).filter(
+            (Statistics.period == RESOLUTIONS[resolution]) &
+            (Statistics.start >= period_start(
+                start_time, RESOLUTIONS[resolution])))
+
+        if end_time is not None:
+            query = query.filter(Statistics.start < end_time)
+
+        if entity_ids is not None:
+            query = query.filter(Statistics.entity_id.in_(entity_ids))
+
+        statistics = execute(
+            query.order_by(Statistics.entity_id, Statistics.start))
+
+    result = {}
+    for statistic in statistics:
+        result.setdefault(statistic['entity_id'], []).append(statistic)
+    return result
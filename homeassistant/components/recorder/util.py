@@ -13,9 +13,14 @@ QUERY_RETRY_WAIT = 0.1
 
 @contextmanager
 def session_scope(*, hass=None, session=None):
-    """Provide a transactional scope around a series of operations."""
+    """Provide a transactional scope around a series of operations.
+
+    Sessions for hass are for queries and use the read connections.
+    """
     if session is None and hass is not None:
-        session = hass.data[DATA_INSTANCE].get_session()
+        get_read_session = hass.data[DATA_INSTANCE].get_read_session
+        if get_read_session is not None:
+            session = get_read_session()
 
     if session is None:
         raise RuntimeError('Session required')
@@ -49,11 +54,17 @@ def commit(session, work):
     return False
 
 
-def execute(qry):
+def execute(qry, to_native=None):
     """Query the database and convert the objects to HA native form.
 
+    Pass to_native to convert rows that are not models, like the rows of
+    queries for several entities.
+
     This method also retries a few times in the case of stale connections.
     """
+    if to_native is None:
+        to_native = _to_native
+
     from sqlalchemy.exc import SQLAlchemyError
 
     for tryno in range(0, RETRIES):
@@ -61,7 +72,7 @@ def execute(qry):
             timer_start = time.perf_counter()
             result = [
                 row for row in
-                (row.to_native() for row in qry)
+                (to_native(row) for row in qry)
                 if row is not None]
 
             if _LOGGER.isEnabledFor(logging.DEBUG):
@@ -78,3 +89,8 @@ def execute(qry):
                 raise
             else:
                 time.sleep(QUERY_RETRY_WAIT)
+
+
+def _to_native(row):
+    """Convert a model to HA native form."""
+    return row.to_native()
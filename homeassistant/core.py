@@ -766,6 +766,8 @@ class StateMachine:
                  loop: asyncio.events.AbstractEventLoop) -> None:
         """Initialize state machine."""
         self._states = {}  # type: Dict[str, State]
+        # States per domain, kept in sync with _states
+        self._domain_index = {}  # type: Dict[str, Dict[str, State]]
         self._bus = bus
         self._loop = loop
 
@@ -786,23 +788,46 @@ class StateMachine:
         if domain_filter is None:
             return list(self._states.keys())
 
-        domain_filter = domain_filter.lower()
+        return list(self._domain_index.get(domain_filter.lower(), ()))
 
-        return [state.entity_id for state in self._states.values()
-                if state.domain == domain_filter]
+    @callback
+    def async_entity_ids_count(
+            self, domain_filter: Optional[str] = None) -> int:
+        """Count the entity ids that are being tracked.
 
-    def all(self)-> List[State]:
+        This method must be run in the event loop.
+        """
+        if domain_filter is None:
+            return len(self._states)
+
+        return len(self._domain_index.get(domain_filter.lower(), ()))
+
+    def all(self, domain_filter: Optional[str] = None)-> List[State]:
         """Create a list of all states."""
         return run_callback_threadsafe(  # type: ignore
-            self._loop, self.async_all).result()
+            self._loop, self.async_all, domain_filter).result()
 
     @callback
-    def async_all(self)-> List[State]:
+    def async_all(self, domain_filter: Optional[str] = None)-> List[State]:
         """Create a list of all states.
 
         This method must be run in the event loop.
         """
-        return list(self._states.values())
+        if domain_filter is None:
+            return list(self._states.values())
+
+        return list(
+            self._domain_index.get(domain_filter.lower(), {}).values())
+
+    @callback
+    def async_domain_states(self, domain: str) -> Iterator[State]:
+        """Iterate over the states of a domain without copying them.
+
+        The states must not be changed while iterating.
+
+        This method must be run in the event loop.
+        """
+        return iter(self._domain_index.get(domain.lower(), {}).values())
 
     def get(self, entity_id: str) -> Optional[State]:
         """Retrieve state of entity_id or None if not found.
@@ -841,6 +866,11 @@ class StateMachine:
         if old_state is None:
             return False
 
+        domain_states = self._domain_index[old_state.domain]
+        domain_states.pop(entity_id)
+        if not domain_states:
+            self._domain_index.pop(old_state.domain)
+
         self._bus.async_fire(EVENT_STATE_CHANGED, {
             'entity_id': entity_id,
             'old_state': old_state,
@@ -902,6 +932,7 @@ class StateMachine:
         state = State(entity_id, new_state, attributes, last_changed, None,
                       context)
         self._states[entity_id] = state
+        self._domain_index.setdefault(state.domain, {})[entity_id] = state
         self._bus.async_fire(EVENT_STATE_CHANGED, {
             'entity_id': entity_id,
             'old_state': old_state,
@@ -955,6 +986,12 @@ class ServiceRegistry:
         self._services = {}  # type: Dict[str, Dict[str, Service]]
         self._hass = hass
         self._async_unsub_call_event = None  # type: Optional[CALLBACK_TYPE]
+        # Futures of blocking calls, keyed by call id
+        self._pending_calls = {}  # type: Dict[str, asyncio.Future]
+        self._async_unsub_executed_event = \
+            None  # type: Optional[CALLBACK_TYPE]
+        # Call ids of call_service events this registry executes directly
+        self._direct_call_ids = set()  # type: Set[str]
 
     @property
     def services(self) -> Dict[str, Dict[str, Service]]:
@@ -1058,9 +1095,10 @@ class ServiceRegistry:
         If blocking = True, will return boolean if service executed
         successfully within SERVICE_CALL_LIMIT.
 
-        This method will fire an event to call the service.
-        This event will be picked up by this ServiceRegistry and any
-        other ServiceRegistry that is listening on the EventBus.
+        Services registered with this ServiceRegistry are executed
+        directly. This method will also fire an event to call the service,
+        which will be picked up by any other ServiceRegistry that is
+        listening on the EventBus.
 
         Because the service is sent as an event you are not allowed to use
         the keys ATTR_DOMAIN and ATTR_SERVICE in your service_data.
@@ -1083,9 +1121,10 @@ class ServiceRegistry:
         If blocking = True, will return boolean if service executed
         successfully within SERVICE_CALL_LIMIT.
 
-        This method will fire an event to call the service.
-        This event will be picked up by this ServiceRegistry and any
-        other ServiceRegistry that is listening on the EventBus.
+        Services registered with this ServiceRegistry are executed
+        directly. This method will also fire an event to call the service,
+        which will be picked up by any other ServiceRegistry that is
+        listening on the EventBus.
 
         Because the service is sent as an event you are not allowed to use
         the keys ATTR_DOMAIN and ATTR_SERVICE in your service_data.
@@ -1093,46 +1132,80 @@ class ServiceRegistry:
         This method is a coroutine.
         """
         context = context or Context()
+        domain = domain.lower()
+        service = service.lower()
         call_id = uuid.uuid4().hex
         event_data = {
-            ATTR_DOMAIN: domain.lower(),
-            ATTR_SERVICE: service.lower(),
+            ATTR_DOMAIN: domain,
+            ATTR_SERVICE: service,
             ATTR_SERVICE_DATA: service_data,
             ATTR_SERVICE_CALL_ID: call_id,
         }
 
+        if blocking:
+            fut = self._hass.loop.create_future()
+            self._pending_calls[call_id] = fut
+
+        # Services registered here are executed directly instead of going
+        # through the event bus. The call_service event is still fired so
+        # observers of the event keep working.
+        direct = self.has_service(domain, service)
+
+        if direct:
+            self._direct_call_ids.add(call_id)
+        elif blocking and self._async_unsub_executed_event is None:
+            # Another registry on the bus might execute the service
+            self._async_unsub_executed_event = self._hass.bus.async_listen(
+                EVENT_SERVICE_EXECUTED, self._async_service_executed)
+
+        self._hass.bus.async_fire(EVENT_CALL_SERVICE, event_data,
+                                  EventOrigin.local, context)
+
+        if direct:
+            self._hass.async_create_task(self._async_execute_service(
+                domain, service, service_data, call_id, context))
+
         if not blocking:
-            self._hass.bus.async_fire(
-                EVENT_CALL_SERVICE, event_data, EventOrigin.local, context)
             return None
 
-        fut = asyncio.Future()  # type: asyncio.Future
+        try:
+            done, _ = await asyncio.wait([fut], timeout=SERVICE_CALL_LIMIT)
+        finally:
+            self._pending_calls.pop(call_id, None)
 
-        @callback
-        def service_executed(event: Event) -> None:
-            """Handle an executed service."""
-            if event.data[ATTR_SERVICE_CALL_ID] == call_id:
-                fut.set_result(True)
-                unsub()
+            if not self._pending_calls and \
+                    self._async_unsub_executed_event is not None:
+                self._async_unsub_executed_event()
+                self._async_unsub_executed_event = None
 
-        unsub = self._hass.bus.async_listen(
-            EVENT_SERVICE_EXECUTED, service_executed)
+        return bool(done) and fut.result()
 
-        self._hass.bus.async_fire(EVENT_CALL_SERVICE, event_data,
-                                  EventOrigin.local, context)
+    @callback
+    def _async_service_executed(self, event: Event) -> None:
+        """Resolve the blocking call of a service executed elsewhere."""
+        self._async_resolve_call(event.data.get(ATTR_SERVICE_CALL_ID), True)
 
-        done, _ = await asyncio.wait([fut], timeout=SERVICE_CALL_LIMIT)
-        success = bool(done)
-        if not success:
-            unsub()
-        return success
+    @callback
+    def _async_resolve_call(self, call_id: Optional[str],
+                            success: bool) -> None:
+        """Resolve the future of a blocking call."""
+        fut = self._pending_calls.pop(call_id, None)  # type: ignore
+
+        if fut is not None and not fut.done():
+            fut.set_result(success)
 
     async def _event_to_service_call(self, event: Event) -> None:
         """Handle the SERVICE_CALLED events from the EventBus."""
+        call_id = event.data.get(ATTR_SERVICE_CALL_ID)
+
+        if call_id in self._direct_call_ids:
+            # Already executed by async_call
+            self._direct_call_ids.remove(call_id)
+            return
+
         service_data = event.data.get(ATTR_SERVICE_DATA) or {}
         domain = event.data.get(ATTR_DOMAIN).lower()  # type: ignore
         service = event.data.get(ATTR_SERVICE).lower()  # type: ignore
-        call_id = event.data.get(ATTR_SERVICE_CALL_ID)
 
         if not self.has_service(domain, service):
             if event.origin == EventOrigin.local:
@@ -1140,6 +1213,20 @@ class ServiceRegistry:
                                 domain, service)
             return
 
+        await self._async_execute_service(
+            domain, service, service_data, call_id, event.context)
+
+    async def _async_execute_service(
+            self, domain: str, service: str, service_data: Optional[Dict],
+            call_id: Optional[str], context: Context) -> None:
+        """Execute a service and fire a SERVICE_EXECUTED event."""
+        service_data = service_data or {}
+
+        if not self.has_service(domain, service):
+            _LOGGER.warning("Unable to find service %s/%s", domain, service)
+            self._async_resolve_call(call_id, False)
+            return
+
         service_handler = self._services[domain][service]
 
         def fire_service_executed() -> None:
@@ -1147,15 +1234,10 @@ class ServiceRegistry:
             if not call_id:
                 return
 
-            data = {ATTR_SERVICE_CALL_ID: call_id}
-
-            if (service_handler.is_coroutinefunction or
-                    service_handler.is_callback):
-                self._hass.bus.async_fire(EVENT_SERVICE_EXECUTED, data,
-                                          EventOrigin.local, event.context)
-            else:
-                self._hass.bus.fire(EVENT_SERVICE_EXECUTED, data,
-                                    EventOrigin.local, event.context)
+            self._hass.bus.async_fire(
+                EVENT_SERVICE_EXECUTED, {ATTR_SERVICE_CALL_ID: call_id},
+                EventOrigin.local, context)
+            self._async_resolve_call(call_id, True)
 
         try:
             if service_handler.schema:
@@ -1166,25 +1248,21 @@ class ServiceRegistry:
             fire_service_executed()
             return
 
-        service_call = ServiceCall(
-            domain, service, service_data, event.context)
+        service_call = ServiceCall(domain, service, service_data, context)
 
         try:
             if service_handler.is_callback:
                 service_handler.func(service_call)
-                fire_service_executed()
             elif service_handler.is_coroutinefunction:
                 await service_handler.func(service_call)
-                fire_service_executed()
             else:
-                def execute_service() -> None:
-                    """Execute a service and fires a SERVICE_EXECUTED event."""
-                    service_handler.func(service_call)
-                    fire_service_executed()
-
-                await self._hass.async_add_executor_job(execute_service)
+                await self._hass.async_add_executor_job(
+                    service_handler.func, service_call)
         except Exception:  # pylint: disable=broad-except
             _LOGGER.exception('Error executing service %s', service_call)
+            self._async_resolve_call(call_id, False)
+        else:
+            fire_service_executed()
 
 
 class Config:
@@ -1,6 +1,9 @@
 """Helpers for listening to events."""
 from datetime import timedelta
 import functools as ft
+import heapq
+import itertools
+import logging
 
 from homeassistant.loader import bind_hass
 from homeassistant.helpers.sun import get_astral_event_next
@@ -10,6 +13,12 @@ from ..const import (
 from ..util import dt as dt_util
 from ..util.async_ import run_callback_threadsafe
 
+_LOGGER = logging.getLogger(__name__)
+
+DATA_STATE_CHANGE_CALLBACKS = 'track_state_change_callbacks'
+DATA_STATE_CHANGE_LISTENER = 'track_state_change_listener'
+DATA_TIME_SCHEDULER = 'track_time_scheduler'
+
 # PyLint does not like the use of threaded_listener_factory
 # pylint: disable=invalid-name
 
@@ -63,10 +72,6 @@ def async_track_state_change(hass, entity_ids, action, from_state=None,
     @callback
     def state_change_listener(event):
         """Handle specific state changes."""
-        if entity_ids != MATCH_ALL and \
-           event.data.get('entity_id') not in entity_ids:
-            return
-
         old_state = event.data.get('old_state')
         if old_state is not None:
             old_state = old_state.state
@@ -80,12 +85,78 @@ def async_track_state_change(hass, entity_ids, action, from_state=None,
                                event.data.get('old_state'),
                                event.data.get('new_state'))
 
-    return hass.bus.async_listen(EVENT_STATE_CHANGED, state_change_listener)
+    if entity_ids == MATCH_ALL:
+        return hass.bus.async_listen(
+            EVENT_STATE_CHANGED, state_change_listener)
+
+    return _async_track_state_change_entities(
+        hass, entity_ids, state_change_listener)
 
 
 track_state_change = threaded_listener_factory(async_track_state_change)
 
 
+@callback
+def _async_track_state_change_entities(hass, entity_ids, listener):
+    """Register a state_changed listener for specific entity ids.
+
+    All listeners share a single EVENT_STATE_CHANGED listener on the bus
+    that looks up the listeners of the changed entity in an index, so a
+    state change only reaches the listeners that track that entity.
+
+    Must be run within the event loop.
+    """
+    entity_callbacks = hass.data.get(DATA_STATE_CHANGE_CALLBACKS)
+
+    if entity_callbacks is None:
+        entity_callbacks = hass.data[DATA_STATE_CHANGE_CALLBACKS] = {}
+
+        @callback
+        def state_change_dispatcher(event):
+            """Dispatch state changes to the listeners of the entity."""
+            listeners = entity_callbacks.get(event.data.get('entity_id'))
+
+            if listeners is None:
+                return
+
+            # Copy so listeners can unsubscribe while being dispatched
+            for func in listeners[:]:
+                try:
+                    hass.async_run_job(func, event)
+                except Exception:  # pylint: disable=broad-except
+                    _LOGGER.exception("Error dispatching %s to %s",
+                                      event, func)
+
+        hass.data[DATA_STATE_CHANGE_LISTENER] = hass.bus.async_listen(
+            EVENT_STATE_CHANGED, state_change_dispatcher)
+
+    entity_ids = set(entity_ids)
+
+    for entity_id in entity_ids:
+        entity_callbacks.setdefault(entity_id, []).append(listener)
+
+    @callback
+    def remove_listener():
+        """Remove the listener from the index."""
+        for entity_id in entity_ids:
+            listeners = entity_callbacks.get(entity_id)
+
+            if listeners is None or listener not in listeners:
+                continue
+
+            listeners.remove(listener)
+
+            if not listeners:
+                entity_callbacks.pop(entity_id)
+
+        if not entity_callbacks and \
+                hass.data.get(DATA_STATE_CHANGE_CALLBACKS) is entity_callbacks:
+            hass.data.pop(DATA_STATE_CHANGE_CALLBACKS)
+            hass.data.pop(DATA_STATE_CHANGE_LISTENER)()
+
+    return remove_listener
+
+
 @callback
 @bind_hass
 def async_track_template(hass, template, action, variables=None):
@@ -191,28 +262,8 @@ def async_track_point_in_utc_time(hass, action, point_in_time):
     # Ensure point_in_time is UTC
     point_in_time = dt_util.as_utc(point_in_time)
 
-    @callback
-    def point_in_time_listener(event):
-        """Listen for matching time_changed events."""
-        now = event.data[ATTR_NOW]
-
-        if now < point_in_time or hasattr(point_in_time_listener, 'run'):
-            return
-
-        # Set variable so that we will never run twice.
-        # Because the event bus might have to wait till a thread comes
-        # available to execute this listener it might occur that the
-        # listener gets lined up twice to be executed. This will make
-        # sure the second time it does nothing.
-        point_in_time_listener.run = True
-        async_unsub()
-
-        hass.async_run_job(action, now)
-
-    async_unsub = hass.bus.async_listen(EVENT_TIME_CHANGED,
-                                        point_in_time_listener)
-
-    return async_unsub
+    return _async_get_time_scheduler(hass).async_schedule(
+        point_in_time, action)
 
 
 track_point_in_utc_time = threaded_listener_factory(
@@ -340,43 +391,46 @@ def async_track_utc_time_change(hass, action,
     matching_minutes = dt_util.parse_time_expression(minute, 0, 59)
     matching_hours = dt_util.parse_time_expression(hour, 0, 23)
 
-    next_time = None
+    scheduler = _async_get_time_scheduler(hass)
+    remove_next = None
+
+    @callback
+    def schedule_next(now):
+        """Calculate the next matching time and schedule the listener."""
+        nonlocal remove_next
 
-    def calculate_next(now):
-        """Calculate and set the next time the trigger should fire."""
-        nonlocal next_time
+        if remove_next is not None:
+            remove_next()
 
         localized_now = dt_util.as_local(now) if local else now
         next_time = dt_util.find_next_time_expression_time(
             localized_now, matching_seconds, matching_minutes,
             matching_hours)
-
-    # Make sure rolling back the clock doesn't prevent the timer from
-    # triggering.
-    last_now = None
+        remove_next = scheduler.async_schedule(
+            next_time, pattern_time_change_listener)
 
     @callback
-    def pattern_time_change_listener(event):
-        """Listen for matching time_changed events."""
-        nonlocal next_time, last_now
-
-        now = event.data[ATTR_NOW]
+    def pattern_time_change_listener(now):
+        """Handle the next matching time."""
+        nonlocal remove_next
+        remove_next = None
+        schedule_next(now + timedelta(seconds=1))
+        hass.async_run_job(action, now)
 
-        if last_now is None or now < last_now:
-            # Time rolled back or next time not yet calculated
-            calculate_next(now)
+    # The next time is calculated from the first time_changed event and
+    # recalculated when time rolls back, so rolling back the clock doesn't
+    # prevent the timer from triggering.
+    remove_clock = scheduler.async_listen_clock(schedule_next)
 
-        last_now = now
+    @callback
+    def remove_listener():
+        """Remove the time pattern listener."""
+        remove_clock()
 
-        if next_time <= now:
-            hass.async_run_job(action, event.data[ATTR_NOW])
-            calculate_next(now + timedelta(seconds=1))
+        if remove_next is not None:
+            remove_next()
 
-    # We can't use async_track_point_in_utc_time here because it would
-    # break in the case that the system time abruptly jumps backwards.
-    # Our custom last_now logic takes care of resolving that scenario.
-    return hass.bus.async_listen(EVENT_TIME_CHANGED,
-                                 pattern_time_change_listener)
+    return remove_listener
 
 
 track_utc_time_change = threaded_listener_factory(async_track_utc_time_change)
@@ -393,6 +447,157 @@ def async_track_time_change(hass, action, hour=None, minute=None, second=None):
 track_time_change = threaded_listener_factory(async_track_time_change)
 
 
+@callback
+def _async_get_time_scheduler(hass):
+    """Return the time scheduler of this Home Assistant instance."""
+    scheduler = hass.data.get(DATA_TIME_SCHEDULER)
+
+    if scheduler is None:
+        scheduler = hass.data[DATA_TIME_SCHEDULER] = _TimeScheduler(hass)
+
+    return scheduler
+
+
+class _TimeScheduler:
+    """Run time listeners from a single time_changed listener.
+
+    Pending listeners are kept in a heap ordered by their point in time, so
+    every EVENT_TIME_CHANGED only looks at the earliest one instead of
+    waking up every pending listener.
+    """
+
+    def __init__(self, hass):
+        """Initialize the scheduler."""
+        self._hass = hass
+        self._heap = []
+        self._counter = itertools.count()
+        self._pending = 0
+        self._clock_listeners = []
+        self._new_clock_listeners = []
+        self._last_now = None
+        self._unsub = None
+
+    @callback
+    def async_schedule(self, point_in_time, action):
+        """Schedule action to be called once point_in_time has passed.
+
+        Returns a function that can be called to remove the listener.
+        """
+        # Mutable entry so that removing it doesn't require a heap search
+        entry = [point_in_time, next(self._counter), action]
+        heapq.heappush(self._heap, entry)
+        self._pending += 1
+        self._async_update_listener()
+
+        @callback
+        def remove_listener():
+            """Remove the point in time listener."""
+            if entry[2] is None:
+                return
+
+            entry[2] = None
+            self._async_entry_done()
+
+        return remove_listener
+
+    @callback
+    def async_listen_clock(self, listener):
+        """Call listener with the time of the next time_changed event.
+
+        The listener is called again whenever time rolls back.
+
+        Returns a function that can be called to remove the listener.
+        """
+        self._clock_listeners.append(listener)
+        self._new_clock_listeners.append(listener)
+        self._async_update_listener()
+
+        @callback
+        def remove_listener():
+            """Remove the clock listener."""
+            for listeners in (self._clock_listeners,
+                              self._new_clock_listeners):
+                if listener in listeners:
+                    listeners.remove(listener)
+
+            self._async_update_listener()
+
+        return remove_listener
+
+    @callback
+    def _async_entry_done(self):
+        """Mark an entry as no longer pending."""
+        self._pending -= 1
+
+        if not self._pending:
+            self._heap.clear()
+        # Drop removed entries once they make up most of the heap
+        elif len(self._heap) > 2 * self._pending + 100:
+            self._heap = [entry for entry in self._heap
+                          if entry[2] is not None]
+            heapq.heapify(self._heap)
+
+        self._async_update_listener()
+
+    @callback
+    def _async_update_listener(self):
+        """Only listen for time_changed events while there are listeners."""
+        if self._pending or self._clock_listeners:
+            if self._unsub is None:
+                self._unsub = self._hass.bus.async_listen(
+                    EVENT_TIME_CHANGED, self._async_time_changed)
+
+        elif self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+            self._last_now = None
+
+    @callback
+    def _async_time_changed(self, event):
+        """Run the listeners whose point in time has passed."""
+        now = event.data[ATTR_NOW]
+
+        if self._last_now is not None and now < self._last_now:
+            clock_listeners = list(self._clock_listeners)
+        else:
+            clock_listeners = self._new_clock_listeners
+
+        self._new_clock_listeners = []
+        self._last_now = now
+
+        for listener in clock_listeners:
+            self._async_run(listener, now)
+
+        heap = self._heap
+        due = []
+
+        # Collect first, listeners scheduled by the actions should only
+        # run on a next time_changed event.
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+
+            if entry[2] is not None:
+                due.append(entry)
+
+        for entry in due:
+            action = entry[2]
+
+            if action is None:
+                continue
+
+            entry[2] = None
+            self._async_entry_done()
+            self._async_run(action, now)
+
+    @callback
+    def _async_run(self, action, now):
+        """Run a time listener and log errors."""
+        try:
+            self._hass.async_run_job(action, now)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Error running time listener %s", action)
+
+
 def _process_state_match(parameter):
     """Convert parameter to function that matches input against parameter."""
     if parameter is None or parameter == MATCH_ALL:
@@ -1,20 +1,33 @@
-"""Support for restoring entity states on startup."""
+"""Support for restoring entity states on startup.
+
+The states are dumped to a store while Home Assistant runs and on stop.
+The database is only queried when there is no store yet.
+"""
 import asyncio
+import json
 import logging
 from datetime import timedelta
 
 import async_timeout
 
-from homeassistant.core import HomeAssistant, CoreState, callback
-from homeassistant.const import EVENT_HOMEASSISTANT_START
+from homeassistant.core import HomeAssistant, CoreState, State, callback
+from homeassistant.const import (
+    EVENT_HOMEASSISTANT_START, EVENT_HOMEASSISTANT_STOP)
 from homeassistant.loader import bind_hass
 from homeassistant.components.history import get_states, last_recorder_run
 from homeassistant.components.recorder import (
     wait_connection_ready, DOMAIN as _RECORDER)
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.json import JSONEncoder
 import homeassistant.util.dt as dt_util
 
 RECORDER_TIMEOUT = 10
 DATA_RESTORE_CACHE = 'restore_state_cache'
+DATA_RESTORE_STORE = 'restore_state_store'
+STORAGE_KEY = 'core.restore_state'
+STORAGE_VERSION = 1
+# Time between the dumps of the current states
+DUMP_INTERVAL = timedelta(minutes=15)
 _LOCK = 'restore_lock'
 _LOGGER = logging.getLogger(__name__)
 
@@ -55,14 +68,25 @@ async def async_get_last_state(hass, entity_id: str):
     if DATA_RESTORE_CACHE in hass.data:
         return hass.data[DATA_RESTORE_CACHE].get(entity_id)
 
-    if _RECORDER not in hass.config.components:
-        return None
-
     if hass.state not in (CoreState.starting, CoreState.not_running):
         _LOGGER.debug("Cache for %s can only be loaded during startup, not %s",
                       entity_id, hass.state)
         return None
 
+    if _LOCK not in hass.data:
+        hass.data[_LOCK] = asyncio.Lock(loop=hass.loop)
+
+    async with hass.data[_LOCK]:
+        if DATA_RESTORE_STORE not in hass.data:
+            await _async_load_stored_states(hass)
+
+    if DATA_RESTORE_CACHE in hass.data:
+        return hass.data[DATA_RESTORE_CACHE].get(entity_id)
+
+    # Fall back to the database, like before the states were dumped
+    if _RECORDER not in hass.config.components:
+        return None
+
     try:
         with async_timeout.timeout(RECORDER_TIMEOUT, loop=hass.loop):
             connected = await wait_connection_ready(hass)
@@ -72,9 +96,6 @@ async def async_get_last_state(hass, entity_id: str):
     if not connected:
         return None
 
-    if _LOCK not in hass.data:
-        hass.data[_LOCK] = asyncio.Lock(loop=hass.loop)
-
     async with hass.data[_LOCK]:
         if DATA_RESTORE_CACHE not in hass.data:
             await hass.async_add_job(
@@ -83,6 +104,46 @@ async def async_get_last_state(hass, entity_id: str):
     return hass.data.get(DATA_RESTORE_CACHE, {}).get(entity_id)
 
 
+async def _async_load_stored_states(hass: HomeAssistant):
+    """Load the restore cache from the states dumped by the last run.
+
+    From then on the states are dumped every DUMP_INTERVAL and on stop.
+    """
+    store = hass.data[DATA_RESTORE_STORE] = hass.helpers.storage.Store(
+        STORAGE_VERSION, STORAGE_KEY)
+
+    async def async_dump_states(*_):
+        """Dump the current states."""
+        states = [state.as_dict() for state in hass.states.async_all()]
+        data = await hass.async_add_executor_job(_encode_states, states)
+        await store.async_save(data)
+
+    async_track_time_interval(hass, async_dump_states, DUMP_INTERVAL)
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_dump_states)
+
+    data = await store.async_load()
+    if data is None:
+        _LOGGER.debug('No stored states found')
+        return
+
+    @callback
+    def remove_cache(event):
+        """Remove the states cache."""
+        hass.data.pop(DATA_RESTORE_CACHE, None)
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_START, remove_cache)
+
+    states = (State.from_dict(state) for state in data['states'])
+    hass.data[DATA_RESTORE_CACHE] = {
+        state.entity_id: state for state in states if state is not None}
+    _LOGGER.debug('Created cache with %s', list(hass.data[DATA_RESTORE_CACHE]))
+
+
+def _encode_states(states):
+    """Return the dumped states as data that can be stored."""
+    return {'states': json.loads(json.dumps(states, cls=JSONEncoder))}
+
+
 async def async_restore_state(entity, extract_info):
     """Call entity.async_restore_state with cached info."""
     if entity.hass.state not in (CoreState.starting, CoreState.not_running):
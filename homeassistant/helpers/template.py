@@ -217,7 +217,7 @@ class AllStates:
 
     def __len__(self):
         """Return number of states."""
-        return len(self._hass.states.async_entity_ids())
+        return self._hass.states.async_entity_ids_count()
 
     def __call__(self, entity_id):
         """Return the states."""
@@ -241,13 +241,13 @@ class DomainStates:
     def __iter__(self):
         """Return the iteration over all the states."""
         return iter(sorted(
-            (_wrap_state(state) for state in self._hass.states.async_all()
-             if state.domain == self._domain),
+            (_wrap_state(state) for state in
+             self._hass.states.async_domain_states(self._domain)),
             key=lambda state: state.entity_id))
 
     def __len__(self):
         """Return number of states."""
-        return len(self._hass.states.async_entity_ids(self._domain))
+        return self._hass.states.async_entity_ids_count(self._domain)
 
 
 class TemplateState(State):
@@ -2,13 +2,19 @@
 import argparse
 import asyncio
 from contextlib import suppress
-from datetime import datetime
+from datetime import datetime, timedelta
+import json
 import logging
+import socket
+import tempfile
+import threading
+import time
 from timeit import default_timer as timer
 
 from homeassistant import core
 from homeassistant.const import (
-    ATTR_NOW, EVENT_STATE_CHANGED, EVENT_TIME_CHANGED)
+    ATTR_NOW, EVENT_HOMEASSISTANT_STOP, EVENT_STATE_CHANGED,
+    EVENT_TIME_CHANGED)
 from homeassistant.util import dt as dt_util
 
 BENCHMARKS = {}
@@ -35,8 +41,14 @@ def run(args):
             loop = asyncio.new_event_loop()
             hass = core.HomeAssistant(loop)
             hass.async_stop_track_tasks()
-            runtime = loop.run_until_complete(bench(hass))
-            print('Benchmark {} done in {}s'.format(bench.__name__, runtime))
+            result = loop.run_until_complete(bench(hass))
+            # Benchmarks return their runtime or a dict of measurements
+            if not isinstance(result, dict):
+                result = {'runtime': result}
+            print('Benchmark {} done in {}s'.format(
+                bench.__name__, result.pop('runtime')))
+            for name, value in sorted(result.items()):
+                print('  {}: {}'.format(name, value))
             loop.run_until_complete(hass.async_stop())
             loop.close()
 
@@ -81,6 +93,7 @@ async def async_million_events(hass):
 async def async_million_time_changed_helper(hass):
     """Run a million events through time changed helper."""
     count = 0
+    hours = 10**6 // 3600
     event = asyncio.Event(loop=hass.loop)
 
     @core.callback
@@ -89,16 +102,17 @@ async def async_million_time_changed_helper(hass):
         nonlocal count
         count += 1
 
-        if count == 10**6:
+        if count == hours + 1:
             event.set()
 
     hass.helpers.event.async_track_time_change(listener, minute=0, second=0)
-    event_data = {
-        ATTR_NOW: datetime(2017, 10, 10, 15, 0, 0, tzinfo=dt_util.UTC)
-    }
+    start_time = datetime(2017, 10, 10, 15, 0, 0, tzinfo=dt_util.UTC)
 
-    for _ in range(10**6):
-        hass.bus.async_fire(EVENT_TIME_CHANGED, event_data)
+    # One event per second, the listener only matches once every hour
+    for seconds in range(hours * 3600 + 1):
+        hass.bus.async_fire(EVENT_TIME_CHANGED, {
+            ATTR_NOW: start_time + timedelta(seconds=seconds)
+        })
 
     start = timer()
 
@@ -141,6 +155,61 @@ async def async_million_state_changed_helper(hass):
     return timer() - start
 
 
+@benchmark
+async def async_state_changed_dispatch_1(hass):
+    """Dispatch state changes with a single tracked entity."""
+    return await _async_state_changed_dispatch(hass, 1)
+
+
+@benchmark
+async def async_state_changed_dispatch_100(hass):
+    """Dispatch state changes with 100 tracked entities."""
+    return await _async_state_changed_dispatch(hass, 100)
+
+
+@benchmark
+async def async_state_changed_dispatch_1000(hass):
+    """Dispatch state changes with 1000 tracked entities."""
+    return await _async_state_changed_dispatch(hass, 1000)
+
+
+async def _async_state_changed_dispatch(hass, listener_count):
+    count = 0
+    event_count = 10**5
+    entity_id = 'light.kitchen'
+    event = asyncio.Event(loop=hass.loop)
+
+    @core.callback
+    def listener(*args):
+        """Handle event."""
+        nonlocal count
+        count += 1
+
+        if count == event_count:
+            event.set()
+
+    hass.helpers.event.async_track_state_change(entity_id, listener)
+
+    for idx in range(listener_count - 1):
+        hass.helpers.event.async_track_state_change(
+            'light.other_{}'.format(idx), listener)
+
+    event_data = {
+        'entity_id': entity_id,
+        'old_state': core.State(entity_id, 'off'),
+        'new_state': core.State(entity_id, 'on'),
+    }
+
+    for _ in range(event_count):
+        hass.bus.async_fire(EVENT_STATE_CHANGED, event_data)
+
+    start = timer()
+
+    await event.wait()
+
+    return timer() - start
+
+
 @benchmark
 @asyncio.coroutine
 def logbook_filtering_state(hass):
@@ -189,3 +258,193 @@ def _logbook_filtering(hass, last_changed, last_updated):
     list(logbook.humanify(None, events))
 
     return timer() - start
+
+
+@benchmark
+async def async_mqtt_ingest_100_per_second(hass):
+    """Publish 100 messages per second to 100 MQTT sensors."""
+    return await _async_mqtt_ingest(hass, 100, 500)
+
+
+@benchmark
+async def async_mqtt_ingest_1000_per_second(hass):
+    """Publish 1000 messages per second to 100 MQTT sensors."""
+    return await _async_mqtt_ingest(hass, 1000, 5000)
+
+
+@benchmark
+async def async_mqtt_ingest_burst(hass):
+    """Publish messages to 100 MQTT sensors as fast as possible."""
+    return await _async_mqtt_ingest(hass, None, 10**4)
+
+
+async def _async_mqtt_ingest(hass, rate, message_count, sensor_count=100):
+    """Measure publish to state_changed through the embedded broker."""
+    import paho.mqtt.client as mqtt_client
+
+    client_config = await _async_setup_mqtt_sensors(hass, sensor_count)
+    published = {}
+    latencies = []
+    last_values = _mqtt_last_values(sensor_count, message_count)
+    done = asyncio.Event(loop=hass.loop)
+    start = end = None
+
+    @core.callback
+    def listener(event):
+        """Record the latency of a state written by a sensor."""
+        nonlocal end
+        end = timer()
+        new_state = event.data['new_state']
+        latencies.append(end - published[int(new_state.state)])
+
+        # Messages handled together only write the state of the last one
+        if last_values.get(new_state.entity_id) == new_state.state:
+            del last_values[new_state.entity_id]
+            if not last_values:
+                done.set()
+
+    hass.bus.async_listen(EVENT_STATE_CHANGED, listener)
+
+    def publish():
+        """Publish the messages at the rate."""
+        nonlocal start
+        connected = threading.Event()
+        client = mqtt_client.Client()
+        client.on_connect = lambda *args: connected.set()
+        client.username_pw_set(client_config[2], client_config[3])
+        client.connect(client_config[0], client_config[1])
+        client.loop_start()
+        # Messages published before the connection is accepted are dropped
+        connected.wait()
+
+        start = next_publish = timer()
+        for value in range(message_count):
+            if rate is not None:
+                next_publish += 1 / rate
+                time.sleep(max(0, next_publish - timer()))
+            published[value] = timer()
+            client.publish('benchmark/sensor_{}/state'.format(
+                value % sensor_count), json.dumps({'value': value}))
+        return client
+
+    client = await hass.async_add_executor_job(publish)
+
+    # QoS 0 messages can get lost, stop waiting for them at some point
+    with suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(done.wait(), 30, loop=hass.loop)
+
+    await hass.async_add_executor_job(client.disconnect)
+    client.loop_stop()
+
+    latencies.sort()
+    runtime = end - start
+    return {
+        'runtime': runtime,
+        'messages_per_second': message_count / runtime,
+        'sensors_missing_last_message': len(last_values),
+        'states_written': len(latencies),
+        'latency_p50_ms': latencies[len(latencies) // 2] * 1000,
+        'latency_p99_ms': latencies[len(latencies) * 99 // 100] * 1000,
+    }
+
+
+@benchmark
+async def async_mqtt_message_handling(hass):
+    """Handle MQTT messages for 100 sensors, without the network."""
+    from homeassistant.components import mqtt
+
+    message_count = 10**5
+    sensor_count = 100
+    await _async_setup_mqtt_sensors(hass, sensor_count)
+    last_values = _mqtt_last_values(sensor_count, message_count)
+    done = asyncio.Event(loop=hass.loop)
+
+    @core.callback
+    def listener(event):
+        """Handle event."""
+        new_state = event.data['new_state']
+        if last_values.get(new_state.entity_id) == new_state.state:
+            del last_values[new_state.entity_id]
+            if not last_values:
+                done.set()
+
+    hass.bus.async_listen(EVENT_STATE_CHANGED, listener)
+
+    messages = [
+        mqtt.Message('benchmark/sensor_{}/state'.format(value % sensor_count),
+                     json.dumps({'value': value}).encode('utf-8'))
+        for value in range(message_count)]
+    mqtt_data = hass.data[mqtt.DATA_MQTT]
+
+    start = timer()
+
+    # Hand over the messages like the paho thread does, in chunks that fit
+    # in the buffer of messages waiting for the event loop
+    # pylint: disable=protected-access
+    for chunk in range(0, message_count, 1000):
+        for message in messages[chunk:chunk + 1000]:
+            mqtt_data._mqtt_on_message(None, None, message)
+        while mqtt_data.messages_dispatched < chunk + 1000:
+            await asyncio.sleep(0)
+
+    await done.wait()
+
+    return timer() - start
+
+
+def _mqtt_last_values(sensor_count, message_count):
+    """Return the state of each sensor after the benchmark messages."""
+    return {'sensor.sensor_{}'.format(value % sensor_count): str(value)
+            for value in range(message_count)}
+
+
+async def _async_setup_mqtt_sensors(hass, sensor_count):
+    """Set up the embedded broker, MQTT and sensors rendering a template.
+
+    Return the client config of the broker.
+    """
+    from homeassistant.components import mqtt
+    from homeassistant.components.mqtt import server
+    from homeassistant.setup import async_setup_component
+
+    # Components are only loaded with a config dir
+    config_dir = tempfile.TemporaryDirectory()
+    hass.config.config_dir = config_dir.name
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    # The broker only accepts subscriptions of users with a password
+    with tempfile.NamedTemporaryFile() as passwd:
+        server_config, client_config = server.generate_config(
+            hass, passwd, 'benchmark')
+        server_config['listeners'] = {
+            'default': {'bind': '127.0.0.1:{}'.format(port), 'type': 'tcp'}}
+        await server.async_start(hass, 'benchmark', server_config)
+    client_config = ('127.0.0.1', port) + client_config[2:]
+
+    hass.data[mqtt.DATA_MQTT] = mqtt.MQTT(
+        hass, client_config[0], client_config[1], None,
+        mqtt.DEFAULT_KEEPALIVE, client_config[2], client_config[3], None,
+        None, None, None, client_config[5], None, None, None)
+    await hass.data[mqtt.DATA_MQTT].async_connect()
+    hass.config.components.add(mqtt.DOMAIN)
+
+    async def async_stop_mqtt(event):
+        """Stop MQTT and remove the config dir."""
+        await hass.data[mqtt.DATA_MQTT].async_disconnect()
+        config_dir.cleanup()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_stop_mqtt)
+
+    await async_setup_component(hass, 'sensor', {
+        'sensor': [{
+            'platform': 'mqtt',
+            'name': 'sensor_{}'.format(idx),
+            'state_topic': 'benchmark/sensor_{}/state'.format(idx),
+            'value_template': '{{ value_json.value }}',
+        } for idx in range(sensor_count)]})
+    await hass.async_block_till_done()
+
+    return client_config
@@ -1,6 +1,7 @@
 """Script to convert an old-format home-assistant.db to a new format one."""
 
 import argparse
+import json
 import os.path
 import sqlite3
 import sys
@@ -180,7 +181,9 @@ def run(script_args: List) -> int:
             last_changed=ts_to_dt(row[4]),
             last_updated=ts_to_dt(row[5]),
             event_id=id_mapping.get(row[6], row[6]),
-            domain=row[7]
+            domain=row[7],
+            significant=models.is_significant(
+                row[7], json.loads(row[3]), row[4] == row[5])
         ))
         if n % 1000 == 0:
             session.commit()
@@ -698,6 +698,8 @@ def init_recorder_component(hass, add_config=None):
     """Initialize the recorder."""
     config = dict(add_config) if add_config else {}
     config[recorder.CONF_DB_URL] = 'sqlite://'  # In memory DB
+    # Commit as soon as the queue is drained so tests do not wait
+    config.setdefault(recorder.CONF_COMMIT_INTERVAL, 0)
 
     with patch('homeassistant.components.recorder.migration.migrate_schema'):
         assert setup_component(hass, recorder.DOMAIN,
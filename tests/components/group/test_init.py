@@ -10,6 +10,7 @@ from homeassistant.const import (
     STATE_ON, STATE_OFF, STATE_HOME, STATE_UNKNOWN, ATTR_ICON, ATTR_HIDDEN,
     ATTR_ASSUMED_STATE, STATE_NOT_HOME, ATTR_FRIENDLY_NAME)
 import homeassistant.components.group as group
+from homeassistant.helpers.event import DATA_STATE_CHANGE_CALLBACKS
 
 from tests.common import get_test_home_assistant, assert_setup_component
 from tests.components.group import common
@@ -382,7 +383,10 @@ class TestComponentsGroup(unittest.TestCase):
         assert sorted(self.hass.states.entity_ids()) == \
             ['group.all_tests', 'group.empty_group', 'group.second_group',
              'group.test_group']
-        assert self.hass.bus.listeners['state_changed'] == 3
+        assert self.hass.bus.listeners['state_changed'] == 1
+        assert sorted(self.hass.data[DATA_STATE_CHANGE_CALLBACKS]) == \
+            ['hello.world', 'light.bowl', 'sensor.happy', 'test.one',
+             'test.two']
 
         with patch('homeassistant.config.load_yaml_config_file', return_value={
             'group': {
@@ -398,7 +402,9 @@ class TestComponentsGroup(unittest.TestCase):
 
         assert sorted(self.hass.states.entity_ids()) == \
             ['group.all_tests', 'group.hello']
-        assert self.hass.bus.listeners['state_changed'] == 2
+        assert self.hass.bus.listeners['state_changed'] == 1
+        assert sorted(self.hass.data[DATA_STATE_CHANGE_CALLBACKS]) == \
+            ['light.bowl', 'test.one', 'test.two']
 
     def test_changing_group_visibility(self):
         """Test that a group can be hidden and shown."""
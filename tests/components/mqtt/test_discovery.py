@@ -207,6 +207,17 @@ def test_non_duplicate_discovery(hass, mqtt_mock, caplog):
     assert state is not None
     assert state.name == 'Beer'
     assert state_duplicate is None
+    assert caplog.text.count('Found new component: binary_sensor bla') == 1
+
+    async_fire_mqtt_message(hass, 'homeassistant/binary_sensor/bla/config',
+                            '{ "name": "Beer" }')
+    yield from hass.async_block_till_done()
+    assert 'Component has already been discovered: ' \
+           'binary_sensor bla' not in caplog.text
+
+    async_fire_mqtt_message(hass, 'homeassistant/binary_sensor/bla/config',
+                            '{ "name": "Milk" }')
+    yield from hass.async_block_till_done()
     assert 'Component has already been discovered: ' \
            'binary_sensor bla' in caplog.text
 
@@ -242,3 +253,36 @@ def test_discovery_expansion(hass, mqtt_mock, caplog):
 
     state = hass.states.get('switch.DiscoveryExpansionTest1')
     assert state.state == STATE_ON
+
+
+async def test_discovery_batched_per_platform(hass, mqtt_mock):
+    """Test that components discovered together are added at once."""
+    from homeassistant.helpers.entity_platform import EntityPlatform
+
+    entry = MockConfigEntry(domain=mqtt.DOMAIN)
+    await async_start(hass, 'homeassistant', {}, entry)
+
+    added = []
+    original = EntityPlatform.async_add_entities
+
+    def async_add_entities(platform, new_entities, update_before_add=False):
+        """Record the entities added per call."""
+        if platform.platform_name == 'mqtt':
+            added.append((platform.domain, len(new_entities)))
+        return original(platform, new_entities, update_before_add)
+
+    with patch.object(EntityPlatform, 'async_add_entities',
+                      async_add_entities):
+        for name in ('Beer', 'Milk', 'Water'):
+            async_fire_mqtt_message(
+                hass, 'homeassistant/sensor/{}/config'.format(name),
+                '{{ "name": "{}" }}'.format(name))
+        async_fire_mqtt_message(
+            hass, 'homeassistant/switch/bla/config',
+            '{ "name": "Beer", "command_topic": "test_topic" }')
+        await hass.async_block_till_done()
+
+    assert sorted(added) == [('sensor', 3), ('switch', 1)]
+    assert hass.states.get('sensor.beer') is not None
+    assert hass.states.get('sensor.water') is not None
+    assert hass.states.get('switch.beer') is not None
@@ -735,3 +735,80 @@ def test_mqtt_subscribes_topics_on_connect(hass):
 async def test_setup_fails_without_config(hass):
     """Test if the MQTT component fails to load with no config."""
     assert not await async_setup_component(hass, mqtt.DOMAIN, {})
+
+
+async def test_messages_handled_in_batches(hass):
+    """Test that received messages wake up the event loop once per batch."""
+    await async_mock_mqtt_client(hass)
+    calls = []
+
+    @callback
+    def record_calls(topic, payload, qos):
+        """Record the received messages."""
+        calls.append((topic, payload))
+
+    await mqtt.async_subscribe(hass, 'test-topic', record_calls)
+    mqtt_data = hass.data['mqtt']
+
+    with mock.patch.object(hass, 'add_job') as mock_add_job, \
+            mock.patch.object(mqtt, 'MAX_PENDING_MESSAGES', 3):
+        for payload in (b'1', b'2', b'3', b'4'):
+            mqtt_data._mqtt_on_message(
+                None, None, mqtt.Message('test-topic', payload))
+
+        assert mock_add_job.mock_calls == [
+            mock.call(mqtt_data._mqtt_handle_messages)]
+
+    mqtt_data._mqtt_handle_messages()
+    assert calls == [
+        ('test-topic', '1'), ('test-topic', '2'), ('test-topic', '3')]
+    assert mqtt_data.messages_received == 4
+    assert mqtt_data.messages_dispatched == 3
+    assert mqtt_data.messages_dropped == 1
+
+    async_fire_mqtt_message(hass, 'test-topic', '5')
+    await hass.async_block_till_done()
+    assert calls[-1] == ('test-topic', '5')
+    assert mqtt_data.messages_dispatched == 4
+
+
+def test_subscription_trie_matches_like_paho():
+    """Test that the subscription trie matches topics like paho."""
+    from paho.mqtt.matcher import MQTTMatcher
+
+    filters = ['#', '+', 'a', 'a/#', 'a/+', 'a/b', 'a/+/c', 'a/b/#',
+               '+/b/+', '+/+/#', '$SYS/#', '$SYS/+', '/a', '+/a']
+    topics = ['a', 'a/b', 'a/b/c', 'a/b/c/d', 'a/x/c', 'b', 'b/b/b', '/a',
+              'a/', '$SYS', '$SYS/broker', '$SYS/broker/load']
+
+    trie = mqtt.SubscriptionTrie()
+    for topic in filters:
+        trie.add(mqtt.Subscription(topic, None))
+
+    for topic in topics:
+        matcher = MQTTMatcher()
+        for topic_filter in filters:
+            matcher[topic_filter] = topic_filter
+        assert sorted(sub.topic for sub in trie.match(topic)) == \
+            sorted(matcher.iter_match(topic)), topic
+
+
+def test_subscription_trie_remove():
+    """Test removing subscriptions from the subscription trie."""
+    trie = mqtt.SubscriptionTrie()
+    first = mqtt.Subscription('a/+/c', None)
+    second = mqtt.Subscription('a/+/c', None)
+    trie.add(first)
+    trie.add(second)
+
+    trie.remove(first)
+    assert trie.has_filter('a/+/c')
+    assert trie.match('a/b/c') == [second]
+
+    trie.remove(second)
+    assert not trie.has_filter('a/+/c')
+    assert trie.match('a/b/c') == []
+    assert not trie._root.children
+
+    with pytest.raises(ValueError):
+        trie.remove(second)
@@ -1,16 +1,23 @@
 """The tests for the Recorder component."""
 # pylint: disable=protected-access
+import json
+import threading
 import unittest
 from unittest.mock import patch
 
 import pytest
 
-from homeassistant.core import callback
-from homeassistant.const import MATCH_ALL
-from homeassistant.components.recorder import Recorder
+from homeassistant.core import Event, callback
+from homeassistant.setup import async_setup_component
+from homeassistant.const import EVENT_STATE_CHANGED, MATCH_ALL
+from homeassistant.components.recorder import (
+    OVERFLOW_DROP_NEW, PurgeTask, Recorder, RecorderQueue,
+    async_add_read_job)
 from homeassistant.components.recorder.const import DATA_INSTANCE
 from homeassistant.components.recorder.util import session_scope
-from homeassistant.components.recorder.models import States, Events
+from homeassistant.helpers.json import JSONEncoder
+from homeassistant.components.recorder.models import (
+    Events, States, StateAttributes)
 
 from tests.common import get_test_home_assistant, init_recorder_component
 
@@ -202,3 +209,221 @@ def test_recorder_setup_failure():
         rec.join()
 
     hass.stop()
+
+
+def test_commit_max_rows(hass_recorder):
+    """Test that events are committed in batches bounded by rows."""
+    hass = hass_recorder({'commit_max_rows': 4})
+    instance = hass.data[DATA_INSTANCE]
+    instance.commit_interval = 100
+
+    with patch.object(instance, '_commit_events',
+                      wraps=instance._commit_events) as commit_events:
+        # Two state changes are two events and two states
+        hass.states.set('test.one', 'on')
+        hass.states.set('test.two', 'on')
+        hass.block_till_done()
+        instance.block_till_done()
+
+    assert len(commit_events.mock_calls) == 1
+    assert len(commit_events.mock_calls[0][1][0]) == 2
+
+    with session_scope(hass=hass) as session:
+        assert session.query(States).count() == 2
+
+
+def test_commit_retry_operational_error(hass_recorder):
+    """Test that a batch is retried on an OperationalError."""
+    from sqlalchemy.exc import OperationalError
+
+    hass = hass_recorder()
+    from_event = Events.from_event
+    calls = []
+
+    def fail_once(event):
+        """Fail the first write."""
+        calls.append(event)
+        if len(calls) == 1:
+            raise OperationalError('INSERT', {}, Exception('locked'))
+        return from_event(event)
+
+    with patch('homeassistant.components.recorder.models.Events.from_event',
+               side_effect=fail_once), \
+            patch('homeassistant.components.recorder.time.sleep') as sleep:
+        hass.bus.fire('test_event')
+        hass.block_till_done()
+        hass.data[DATA_INSTANCE].block_till_done()
+
+    assert len(sleep.mock_calls) == 1
+    assert len(calls) == 2
+
+    with session_scope(hass=hass) as session:
+        assert session.query(Events).filter_by(
+            event_type='test_event').count() == 1
+
+
+def test_flush_on_stop(hass_recorder):
+    """Test that pending events are written when Home Assistant stops."""
+    hass = hass_recorder()
+    instance = hass.data[DATA_INSTANCE]
+    instance.commit_interval = 100
+
+    hass.states.set('test.recorder', 'on')
+    hass.block_till_done()
+
+    # Keep the in memory database around to check what was written
+    with patch.object(instance, '_close_connection'):
+        hass.stop()
+
+    with session_scope(session=instance.get_session()) as session:
+        assert session.query(States).filter_by(
+            entity_id='test.recorder').count() == 1
+
+
+def test_saving_state_shared_attributes(hass_recorder):
+    """Test that states with the same attributes share a row."""
+    hass = hass_recorder()
+    attributes = {'test_attr': 5, 'test_attr_10': 'nice'}
+
+    hass.states.set('test.one', 'on', attributes)
+    hass.states.set('test.two', 'on', attributes)
+    hass.states.set('test.one', 'off', attributes)
+    hass.states.set('test.one', 'off', {'test_attr': 6})
+    hass.block_till_done()
+    hass.data[DATA_INSTANCE].block_till_done()
+
+    with session_scope(hass=hass) as session:
+        assert session.query(StateAttributes).count() == 2
+        db_states = list(session.query(States).order_by(States.state_id))
+        assert len({state.attributes_id for state in db_states[:3]}) == 1
+        assert all(state.attributes is None for state in db_states)
+        states = [state.to_native() for state in db_states]
+
+    assert [state.attributes for state in states] == [
+        attributes, attributes, attributes, {'test_attr': 6}]
+    assert states[-1] == hass.states.get('test.one')
+
+
+def test_saving_minimal_state_events(hass_recorder):
+    """Test that minimal state_changed events are rebuilt from states."""
+    hass = hass_recorder({'minimal_state_events': True})
+    instance = hass.data[DATA_INSTANCE]
+    events = []
+
+    @callback
+    def event_listener(event):
+        """Record state_changed events."""
+        events.append(event)
+
+    hass.bus.listen(EVENT_STATE_CHANGED, event_listener)
+
+    hass.states.set('test.one', 'on', {'test_attr': 5})
+    hass.states.set('test.one', 'off')
+    hass.block_till_done()
+    instance.block_till_done()
+    # The old state was written in an earlier batch
+    hass.states.set('test.one', 'on')
+    hass.states.remove('test.one')
+    hass.block_till_done()
+    instance.block_till_done()
+
+    with session_scope(hass=hass) as session:
+        db_events = list(session.query(Events).filter_by(
+            event_type=EVENT_STATE_CHANGED).order_by(Events.event_id))
+        assert [json.loads(event.event_data) for event in db_events[:3]] \
+            == [{'entity_id': 'test.one'}] * 3
+        # Removals are stored with all their data
+        assert 'new_state' in json.loads(db_events[3].event_data)
+        native = [event.to_native() for event in db_events]
+
+    assert len(native) == len(events) == 4
+    for event, db_event in zip(events, native):
+        assert json.loads(json.dumps(event.data, cls=JSONEncoder)) == \
+            db_event.data
+
+
+def test_recorder_queue_drop_oldest():
+    """Test that a full queue drops its oldest event."""
+    rec_queue = RecorderQueue(2)
+    purge_task = PurgeTask(1, False)
+    rec_queue.put(purge_task)
+    for event_type in ('first', 'second', 'third'):
+        rec_queue.put_event(Event(event_type))
+
+    assert rec_queue.dropped == 1
+    items = [rec_queue.get_nowait() for _ in range(rec_queue.qsize())]
+    assert items[0] is purge_task
+    assert [item.event_type for item in items[1:]] == ['second', 'third']
+
+    for _ in items:
+        rec_queue.task_done()
+    rec_queue.join()
+
+
+def test_recorder_queue_drop_new():
+    """Test that a full queue can drop new events instead."""
+    rec_queue = RecorderQueue(2, OVERFLOW_DROP_NEW)
+    for event_type in ('first', 'second', 'third'):
+        rec_queue.put_event(Event(event_type))
+    rec_queue.put(None)
+
+    assert rec_queue.dropped == 1
+    items = [rec_queue.get_nowait() for _ in range(rec_queue.qsize())]
+    assert [item.event_type for item in items[:2]] == ['first', 'second']
+    assert items[2] is None
+
+
+async def test_websocket_metrics(hass, hass_ws_client):
+    """Test getting the recorder metrics over the websocket API."""
+    assert await async_setup_component(hass, 'recorder', {
+        'recorder': {'db_url': 'sqlite://', 'commit_interval': 0,
+                     'max_queue_size': 1000}})
+    instance = hass.data[DATA_INSTANCE]
+    hass.states.async_set('test.recorder', 'on')
+    await hass.async_block_till_done()
+    await hass.async_add_job(instance.block_till_done)
+
+    client = await hass_ws_client(hass)
+    await client.send_json({'id': 5, 'type': 'recorder/metrics'})
+    msg = await client.receive_json()
+
+    assert msg['success']
+    metrics = msg['result']
+    assert metrics['queue_depth'] == 0
+    assert metrics['max_queue_size'] == 1000
+    assert metrics['dropped_events'] == 0
+    assert metrics['commit_latency'] >= 0
+    assert metrics['rows_per_second'] > 0
+
+
+async def test_read_connection_sqlite_file(hass, tmpdir):
+    """Test that queries use read-only connections to a database file."""
+    from sqlalchemy.exc import OperationalError
+
+    db_url = 'sqlite:///{}'.format(tmpdir.join('test.db'))
+    assert await async_setup_component(hass, 'recorder', {
+        'recorder': {'db_url': db_url, 'commit_interval': 0}})
+    instance = hass.data[DATA_INSTANCE]
+    hass.states.async_set('test.recorder', 'on')
+    await hass.async_block_till_done()
+    await hass.async_add_job(instance.block_till_done)
+
+    def read_states():
+        """Read the recorded states."""
+        with session_scope(hass=hass) as session:
+            return (threading.current_thread().name,
+                    [state.entity_id for state in session.query(States)])
+
+    def write_state():
+        """Try to write a state."""
+        with session_scope(hass=hass) as session:
+            session.add(States(entity_id='test.write', state='on'))
+
+    thread_name, entity_ids = await async_add_read_job(hass, read_states)
+
+    assert instance.read_engine is not None
+    assert thread_name.startswith('RecorderRead')
+    assert entity_ids == ['test.recorder']
+
+    with pytest.raises(OperationalError):
+        await async_add_read_job(hass, write_state)
@@ -90,3 +90,61 @@ def test_forgiving_add_index():
     )
     models.Base.metadata.create_all(engine)
     migration._create_index(engine, "states", "ix_states_context_id")
+
+
+def test_move_state_attributes():
+    """Test that existing attributes are moved to the shared table."""
+    engine = create_engine(
+        'sqlite://',
+        poolclass=StaticPool
+    )
+    models_original.Base.metadata.create_all(engine)
+    for idx, attributes in enumerate(['{"a": 1}', '{"a": 1}', '{"a": 2}']):
+        engine.execute(
+            "INSERT INTO states (state_id, entity_id, state, attributes) "
+            "VALUES (?, 'test.entity', 'on', ?)", idx + 1, attributes)
+
+    with patch.object(migration, 'MOVE_ATTRIBUTES_CHUNK_SIZE', 2):
+        migration._apply_update(engine, 7, 6)
+
+    rows = engine.execute(
+        "SELECT states.attributes, state_attributes.shared_attrs "
+        "FROM states JOIN state_attributes ON "
+        "states.attributes_id = state_attributes.attributes_id "
+        "ORDER BY states.state_id").fetchall()
+    assert [tuple(row) for row in rows] == [
+        (None, '{"a": 1}'), (None, '{"a": 1}'), (None, '{"a": 2}')]
+    assert engine.execute(
+        "SELECT COUNT(*) FROM state_attributes").scalar() == 2
+
+
+def test_update_significant():
+    """Test that the significance of existing states is set."""
+    engine = create_engine(
+        'sqlite://',
+        poolclass=StaticPool
+    )
+    models_original.Base.metadata.create_all(engine)
+    for idx, (entity_id, changed, attributes) in enumerate([
+            ('light.kitchen', True, '{}'),
+            ('light.kitchen', False, '{}'),
+            ('climate.living', False, '{}'),
+            ('light.hidden', True, '{"hidden": true}'),
+            ('script.cannot_cancel', True, '{}'),
+            ('script.can_cancel', True, '{"can_cancel": true}')]):
+        engine.execute(
+            "INSERT INTO states (state_id, domain, entity_id, state, "
+            "attributes, last_changed, last_updated) "
+            "VALUES (?, ?, ?, 'on', ?, ?, ?)", idx + 1,
+            entity_id.split('.')[0], entity_id, attributes,
+            '2018-01-01 00:00:00' if changed else '2017-01-01 00:00:00',
+            '2018-01-01 00:00:00')
+
+    migration._apply_update(engine, 7, 6)
+    migration._apply_update(engine, 8, 7)
+    with patch.object(migration, 'SIGNIFICANT_CHUNK_SIZE', 4):
+        migration._apply_update(engine, 9, 8)
+
+    rows = engine.execute(
+        "SELECT significant FROM states ORDER BY state_id").fetchall()
+    assert [row[0] for row in rows] == [1, 0, 1, 0, 0, 1]
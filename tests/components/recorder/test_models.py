@@ -1,6 +1,6 @@
 """The tests for the Recorder component."""
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import scoped_session, sessionmaker
@@ -63,6 +63,27 @@ class TestStates(unittest.TestCase):
         }, context=state.context)
         assert state == States.from_event(event).to_native()
 
+    def test_from_event_significant(self):
+        """Test that the significance of a state is stored."""
+        def significant(entity_id, attributes=None, changed=True):
+            """Return if the state is stored as significant."""
+            now = dt.utcnow()
+            state = ha.State(
+                entity_id, 'on', attributes,
+                now if changed else now - timedelta(seconds=1), now)
+            return States.from_event(ha.Event(EVENT_STATE_CHANGED, {
+                'entity_id': entity_id,
+                'old_state': None,
+                'new_state': state,
+            })).significant
+
+        assert significant('light.kitchen')
+        assert not significant('light.kitchen', changed=False)
+        assert significant('climate.living', changed=False)
+        assert not significant('light.kitchen', {'hidden': True})
+        assert not significant('script.test')
+        assert significant('script.test', {'can_cancel': True})
+
     def test_from_event_to_delete_state(self):
         """Test converting deleting state event to db state."""
         event = ha.Event(EVENT_STATE_CHANGED, {
@@ -6,8 +6,10 @@ from unittest.mock import patch
 
 from homeassistant.components import recorder
 from homeassistant.components.recorder.const import DATA_INSTANCE
-from homeassistant.components.recorder.purge import purge_old_data
-from homeassistant.components.recorder.models import States, Events
+from homeassistant.components.recorder import purge
+from homeassistant.components.recorder.purge import PurgeRun, purge_old_data
+from homeassistant.components.recorder.models import (
+    Events, LogbookEntries, States, StateAttributes)
 from homeassistant.components.recorder.util import session_scope
 from tests.common import get_test_home_assistant, init_recorder_component
 
@@ -132,6 +134,24 @@ class TestRecorderPurge(unittest.TestCase):
             # we should only have 3 states left after purging
             assert states.count() == 3
 
+    def test_purge_unused_state_attributes(self):
+        """Test deleting shared attributes no state refers to anymore."""
+        self._add_test_states()
+        with session_scope(hass=self.hass) as session:
+            used = StateAttributes(hash='used', shared_attrs='{}')
+            unused = StateAttributes(hash='unused', shared_attrs='{}')
+            session.add_all([used, unused])
+            session.flush()
+            session.add(States(
+                entity_id='test.shared', domain='test', state='on',
+                attributes_id=used.attributes_id))
+            session.flush()
+
+            purge_old_data(self.hass.data[DATA_INSTANCE], 4, repack=False)
+
+            assert [attributes.hash for attributes in
+                    session.query(StateAttributes)] == ['used']
+
     def test_purge_old_events(self):
         """Test deleting old events."""
         self._add_test_events()
@@ -147,6 +167,70 @@ class TestRecorderPurge(unittest.TestCase):
             # no state to protect, now we should only have 2 events left
             assert events.count() == 2
 
+    def test_purge_old_logbook_entries(self):
+        """Test deleting old logbook entries."""
+        now = datetime.now()
+        with session_scope(hass=self.hass) as session:
+            for days in (2, 11):
+                session.add(LogbookEntries(
+                    time_fired=now - timedelta(days=days), name='Alarm',
+                    message='is triggered'))
+
+        purge_old_data(self.hass.data[DATA_INSTANCE], 4, repack=False)
+
+        with session_scope(hass=self.hass) as session:
+            assert session.query(LogbookEntries).count() == 1
+
+    def test_purge_in_batches(self):
+        """Test that a purge run can continue after every batch."""
+        self._add_test_events()
+        self._add_test_states()
+        purge_run = PurgeRun(4, repack=False)
+        runs = 1
+
+        with patch.object(purge, 'PURGE_BATCH_SIZE', 2):
+            while not purge_run.run(self.hass.data[DATA_INSTANCE],
+                                    time_budget=0):
+                runs += 1
+
+        assert runs > 4
+        assert purge_run.deleted_states == 4
+        assert purge_run.deleted_events == 4
+
+        with session_scope(hass=self.hass) as session:
+            assert session.query(States).count() == 3
+            assert session.query(Events).filter(
+                Events.event_type.like("EVENT_TEST%")).count() == 3
+
+    def test_purge_service_interleaved(self):
+        """Test that the recorder writes events between purge batches."""
+        self._add_test_states()
+        instance = self.hass.data[DATA_INSTANCE]
+        written = []
+        commit_events = instance._commit_events
+
+        def record_commit(events):
+            """Record the events that were written."""
+            written.extend(event.event_type for event in events)
+            commit_events(events)
+
+        with patch.object(purge, 'PURGE_BATCH_SIZE', 1), \
+                patch.object(purge, 'PURGE_TIME_BUDGET', 0), \
+                patch.object(instance, '_commit_events',
+                             side_effect=record_commit), \
+                patch.object(PurgeRun, 'run', autospec=True,
+                             side_effect=PurgeRun.run) as run:
+            self.hass.services.call('recorder', 'purge', {'keep_days': 4})
+            self.hass.bus.fire('test_event')
+            self.hass.block_till_done()
+            instance.block_till_done()
+
+        assert 'test_event' in written
+        assert len(run.mock_calls) > 1
+
+        with session_scope(hass=self.hass) as session:
+            assert session.query(States).count() == 3
+
     def test_purge_method(self):
         """Test purge method."""
         service_data = {'keep_days': 4}
@@ -207,5 +291,6 @@ class TestRecorderPurge(unittest.TestCase):
                                         service_data=service_data)
                 self.hass.block_till_done()
                 self.hass.data[DATA_INSTANCE].block_till_done()
-                assert mock_logger.debug.mock_calls[4][1][0] == \
-                    "Vacuuming SQLite to free space"
+                assert "Vacuuming SQLite to free space" in (
+                    mock_call[1][0] for mock_call in
+                    mock_logger.debug.mock_calls)
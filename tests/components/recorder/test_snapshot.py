@@ -0,0 +1,95 @@
+"""The tests for the recorder snapshots."""
+# pylint: disable=protected-access
+from datetime import timedelta
+
+import pytest
+
+from homeassistant.components import history
+from homeassistant.components.recorder.const import DATA_INSTANCE
+from homeassistant.components.recorder.models import (
+    SnapshotStates, StateSnapshots)
+from homeassistant.components.recorder.purge import purge_old_data
+from homeassistant.components.recorder.snapshot import SNAPSHOT_INTERVAL
+from homeassistant.components.recorder.util import session_scope
+import homeassistant.util.dt as dt_util
+
+from tests.common import (
+    fire_time_changed, get_test_home_assistant, init_recorder_component)
+
+
+@pytest.fixture
+def hass_recorder():
+    """HASS fixture with in-memory recorder."""
+    hass = get_test_home_assistant()
+    init_recorder_component(hass, {'purge_interval': 0})
+    hass.start()
+    hass.block_till_done()
+    hass.data[DATA_INSTANCE].block_till_done()
+    yield hass
+    hass.stop()
+
+
+def _wait_recording_done(hass):
+    """Block till recording is done."""
+    hass.block_till_done()
+    hass.data[DATA_INSTANCE].block_till_done()
+
+
+def _states(hass, point_in_time):
+    """Return the states at point_in_time by entity id."""
+    return {state.entity_id: state.state
+            for state in history.get_states(hass, point_in_time)}
+
+
+def test_snapshot_point_in_time(hass_recorder):
+    """Test that states at a point in time start from the snapshot."""
+    hass = hass_recorder
+    hass.states.set('test.one', '1')
+    hass.states.set('test.two', '1')
+    hass.states.set('test.three', '1')
+    hass.states.remove('test.three')
+    _wait_recording_done(hass)
+    before_snapshot = dt_util.utcnow()
+
+    fire_time_changed(hass, dt_util.utcnow() + SNAPSHOT_INTERVAL)
+    _wait_recording_done(hass)
+
+    with session_scope(hass=hass) as session:
+        assert session.query(StateSnapshots).count() == 1
+        assert session.query(SnapshotStates).count() == 3
+
+    hass.states.set('test.one', '2')
+    _wait_recording_done(hass)
+    now = dt_util.utcnow()
+
+    expected = {'test.one': '2', 'test.two': '1', 'test.three': ''}
+    assert _states(hass, now) == expected
+    assert _states(hass, before_snapshot) == {
+        'test.one': '1', 'test.two': '1', 'test.three': ''}
+
+    with session_scope(hass=hass) as session:
+        session.query(SnapshotStates).delete()
+        session.query(StateSnapshots).delete()
+
+    assert _states(hass, now) == expected
+
+
+def test_purge_snapshots(hass_recorder):
+    """Test that snapshots older than the purged data are deleted."""
+    hass = hass_recorder
+    now = dt_util.utcnow()
+
+    with session_scope(hass=hass) as session:
+        for days, snapshot_id in ((5, 1), (11, 2)):
+            session.add(StateSnapshots(
+                snapshot_id=snapshot_id, last_state_id=0,
+                point_in_time=now - timedelta(days=days)))
+            session.add(SnapshotStates(snapshot_id=snapshot_id, state_id=1))
+
+    purge_old_data(hass.data[DATA_INSTANCE], 10, repack=False)
+
+    with session_scope(hass=hass) as session:
+        assert [row.snapshot_id for row in
+                session.query(StateSnapshots)] == [1]
+        assert [row.snapshot_id for row in
+                session.query(SnapshotStates)] == [1]
@@ -0,0 +1,121 @@
+"""The tests for the recorder statistics."""
+# pylint: disable=protected-access
+from datetime import timedelta
+
+import pytest
+
+from homeassistant.components.recorder.const import DATA_INSTANCE
+from homeassistant.components.recorder.models import Statistics
+from homeassistant.components.recorder.purge import purge_old_data
+from homeassistant.components.recorder.statistics import (
+    StatisticsCollector, get_statistics, period_start)
+from homeassistant.components.recorder.util import session_scope
+from homeassistant.const import EVENT_STATE_CHANGED
+import homeassistant.core as ha
+import homeassistant.util.dt as dt_util
+
+from tests.common import get_test_home_assistant, init_recorder_component
+
+
+@pytest.fixture
+def hass_recorder():
+    """HASS fixture with in-memory recorder."""
+    hass = get_test_home_assistant()
+    init_recorder_component(hass, {'purge_interval': 0})
+    hass.start()
+    hass.block_till_done()
+    hass.data[DATA_INSTANCE].block_till_done()
+    yield hass
+    hass.stop()
+
+
+def _state_changed(entity_id, state, last_updated):
+    """Return a state_changed event of a state updated at last_updated."""
+    return ha.Event(EVENT_STATE_CHANGED, {
+        'entity_id': entity_id,
+        'old_state': None,
+        'new_state': ha.State(entity_id, state, None, last_updated,
+                              last_updated),
+    })
+
+
+def test_recording_statistics(hass_recorder):
+    """Test that statistics are maintained while states are recorded."""
+    hass = hass_recorder
+    start = period_start(dt_util.utcnow(), 3600) - timedelta(hours=2)
+
+    for minutes, entity_id, state in (
+            (0, 'sensor.power', '1'),
+            (1, 'sensor.power', '2'),
+            (1, 'sensor.power', 'unavailable'),
+            (2, 'sensor.power', '3'),
+            (6, 'sensor.power', '4'),
+            (6, 'light.kitchen', '4')):
+        event = _state_changed(
+            entity_id, state, start + timedelta(minutes=minutes))
+        hass.bus.fire(event.event_type, event.data)
+    hass.block_till_done()
+    hass.data[DATA_INSTANCE].block_till_done()
+
+    assert get_statistics(hass, start, resolution='5minute') == {
+        'sensor.power': [{
+            'entity_id': 'sensor.power', 'start': start,
+            'min': 1, 'max': 3, 'mean': 2, 'last': 3, 'count': 3,
+        }, {
+            'entity_id': 'sensor.power',
+            'start': start + timedelta(minutes=5),
+            'min': 4, 'max': 4, 'mean': 4, 'last': 4, 'count': 1,
+        }]}
+    assert get_statistics(hass, start, resolution='hour') == {
+        'sensor.power': [{
+            'entity_id': 'sensor.power', 'start': start,
+            'min': 1, 'max': 4, 'mean': 2.5, 'last': 4, 'count': 4,
+        }]}
+    assert get_statistics(
+        hass, start, start + timedelta(minutes=5), ['light.kitchen'],
+        resolution='5minute') == {}
+
+
+def test_merge_partial_period(hass_recorder):
+    """Test that a period written in parts is merged."""
+    hass = hass_recorder
+    start = period_start(dt_util.utcnow(), 3600) - timedelta(hours=2)
+
+    for values in (('1', '5'), ('3',)):
+        collector = StatisticsCollector()
+        collector.add_events([
+            _state_changed('sensor.temperature', value, start)
+            for value in values])
+        # Like on shutdown
+        assert collector.complete()
+        with session_scope(hass=hass) as session:
+            collector.write(session)
+
+    assert get_statistics(hass, start) == {
+        'sensor.temperature': [{
+            'entity_id': 'sensor.temperature', 'start': start,
+            'min': 1, 'max': 5, 'mean': 3, 'last': 3, 'count': 3,
+        }]}
+
+
+def test_purge_statistics(hass_recorder):
+    """Test that statistics are kept for statistics_keep_days."""
+    hass = hass_recorder
+    instance = hass.data[DATA_INSTANCE]
+    now = dt_util.utcnow()
+
+    with session_scope(hass=hass) as session:
+        for days in (5, 11):
+            session.add(Statistics(
+                entity_id='sensor.power', period=3600,
+                start=now - timedelta(days=days), min=1, max=1, mean=1,
+                last=1, count=1))
+
+    purge_old_data(instance, 1, repack=False)
+    with session_scope(hass=hass) as session:
+        assert session.query(Statistics).count() == 2
+
+    instance.statistics_keep_days = 10
+    purge_old_data(instance, 1, repack=False)
+    with session_scope(hass=hass) as session:
+        assert session.query(Statistics).count() == 1
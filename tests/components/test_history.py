@@ -5,6 +5,7 @@ import unittest
 from unittest.mock import patch, sentinel
 
 from homeassistant.setup import setup_component, async_setup_component
+from homeassistant.const import EVENT_STATE_CHANGED
 import homeassistant.core as ha
 import homeassistant.util.dt as dt_util
 from homeassistant.components import history, recorder
@@ -176,6 +177,35 @@ class TestComponentHistory(unittest.TestCase):
             self.hass, zero, four, filters=history.Filters())
         assert states == hist
 
+    def test_get_significant_states_no_attributes(self):
+        """Test that states are returned without their attributes."""
+        zero, four, states = self.record_states()
+        hist = history.get_significant_states(
+            self.hass, zero, four, filters=history.Filters(),
+            no_attributes=True)
+
+        for ent_states in states.values():
+            ent_states[:] = [
+                ha.State(state.entity_id, state.state, None,
+                         state.last_changed, state.last_updated,
+                         state.context)
+                for state in ent_states]
+        assert states == hist
+
+    def test_get_significant_states_minimal_response(self):
+        """Test that only the first and last state are full states."""
+        zero, four, states = self.record_states()
+        hist = history.get_significant_states(
+            self.hass, zero, four, filters=history.Filters(),
+            minimal_response=True)
+
+        for ent_states in states.values():
+            ent_states[1:-1] = [
+                [state.last_updated, state.state]
+                for state in ent_states[1:-1]]
+        assert len(states['thermostat.test']) == 3
+        assert states == hist
+
     def test_get_significant_states_with_initial(self):
         """Test that only significant states are returned.
 
@@ -428,6 +458,57 @@ class TestComponentHistory(unittest.TestCase):
                     history.CONF_ENTITIES: ['media_player.test']}}})
         self.check_significant_states(zero, four, states, config)
 
+    def test_recent_history(self):
+        """Test that queries within the window are answered from memory."""
+        recent = history.RecentHistory(
+            self.hass, timedelta(hours=1), 100, lambda entity_id: True)
+        self.hass.data[history.DATA_RECENT_HISTORY] = recent
+        self.hass.bus.listen(EVENT_STATE_CHANGED, recent.async_add_event)
+        zero, four, _ = self.record_states()
+        two = zero + timedelta(seconds=2)
+        filters = history.Filters()
+        filters.excluded_domains = ['thermostat']
+
+        def simplify(result):
+            """Return comparable states of a query result."""
+            return {
+                entity_id: [
+                    tuple(state) if isinstance(state, list) else
+                    (state.state, dict(state.attributes), state.last_changed,
+                     state.last_updated, state.context)
+                    for state in states]
+                for entity_id, states in result.items()}
+
+        queries = [
+            (history.get_significant_states, (zero, four),
+             {'filters': history.Filters()}),
+            (history.get_significant_states, (two, four),
+             {'filters': history.Filters()}),
+            (history.get_significant_states, (two, four),
+             {'filters': filters, 'no_attributes': True}),
+            (history.get_significant_states, (zero, None),
+             {'filters': history.Filters(), 'minimal_response': True,
+              'entity_ids': ['media_player.test', 'thermostat.test']}),
+            (history.state_changes_during_period, (two, four),
+             {'entity_id': 'media_player.test'}),
+            (history.state_changes_during_period, (zero, four), {}),
+        ]
+        for query, args, kwargs in queries:
+            with patch('homeassistant.components.history.session_scope',
+                       side_effect=AssertionError):
+                from_memory = query(self.hass, *args, **kwargs)
+            del self.hass.data[history.DATA_RECENT_HISTORY]
+            from_database = query(self.hass, *args, **kwargs)
+            self.hass.data[history.DATA_RECENT_HISTORY] = recent
+
+            assert from_memory
+            assert simplify(from_memory) == simplify(from_database)
+
+        # Not in the window
+        with patch('homeassistant.components.history.dt_util.utcnow',
+                   return_value=zero + timedelta(hours=2)):
+            assert recent.state_changes(zero, four, None, False) is None
+
     def check_significant_states(self, zero, four, states, config):
         """Check if significant states are retrieved."""
         filters = history.Filters()
@@ -525,3 +606,71 @@ async def test_fetch_period_api(hass, aiohttp_client):
     response = await client.get(
         '/api/history/period/{}'.format(dt_util.utcnow().isoformat()))
     assert response.status == 200
+
+
+async def test_fetch_period_api_stream(hass, aiohttp_client):
+    """Test the streamed response of the fetch period view."""
+    await hass.async_add_job(init_recorder_component, hass)
+    await async_setup_component(hass, 'history', {})
+    await hass.components.recorder.wait_connection_ready()
+    start = dt_util.utcnow()
+    for value in range(3):
+        hass.states.async_set('sensor.one', value, {'unit': 'W'})
+        hass.states.async_set('sensor.two', value)
+        await hass.async_block_till_done()
+    await hass.async_add_job(hass.data[recorder.DATA_INSTANCE].block_till_done)
+    client = await aiohttp_client(hass.http.app)
+    url = '/api/history/period/{}'.format(start.isoformat())
+
+    for options in ('', '&minimal_response', '&no_attributes'):
+        response = await client.get(url + '?' + options)
+        assert response.status == 200
+        expected = await response.json()
+
+        with patch('homeassistant.components.history.STREAM_CHUNK_SIZE', 2):
+            response = await client.get(url + '?stream' + options)
+        assert response.status == 200
+        streamed = await response.json()
+
+        assert len(streamed) == 2
+        assert sorted(streamed, key=lambda states: states[0]['entity_id']) \
+            == sorted(expected, key=lambda states: states[0]['entity_id'])
+
+    assert streamed[0][0]['attributes'] == {}
+    response = await client.get(url + '?stream&minimal_response')
+    streamed = await response.json()
+    assert streamed[0][0]['state'] == '0'
+    assert streamed[0][1][1] == '1'
+    assert streamed[0][2]['state'] == '2'
+    assert streamed[0][2]['attributes'] == {'unit': 'W'}
+
+
+async def test_fetch_period_api_resolution(hass, aiohttp_client):
+    """Test the fetch period view returning statistics."""
+    from homeassistant.components.recorder.models import Statistics
+
+    await hass.async_add_job(init_recorder_component, hass)
+    await async_setup_component(hass, 'history', {})
+    await hass.components.recorder.wait_connection_ready()
+    start = dt_util.utcnow().replace(minute=0, second=0, microsecond=0)
+
+    def add_statistics():
+        """Add statistics of an hour."""
+        with recorder.session_scope(hass=hass) as session:
+            session.add(Statistics(
+                entity_id='sensor.power', period=3600, start=start,
+                min=1, max=3, mean=2, last=3, count=3))
+
+    await hass.async_add_job(add_statistics)
+    client = await aiohttp_client(hass.http.app)
+    url = '/api/history/period/{}'.format(start.isoformat())
+
+    response = await client.get(url + '?resolution=hour')
+    assert response.status == 200
+    result = await response.json()
+    assert len(result) == 1
+    assert result[0][0]['entity_id'] == 'sensor.power'
+    assert result[0][0]['mean'] == 2
+
+    response = await client.get(url + '?resolution=day')
+    assert response.status == 400
@@ -3,6 +3,7 @@
 import logging
 from datetime import (timedelta, datetime)
 import unittest
+from unittest.mock import patch
 
 from homeassistant.components import sun
 import homeassistant.core as ha
@@ -384,6 +385,113 @@ class TestComponentLogbook(unittest.TestCase):
         self.assert_entry(entries[0], pointA, 'bla', domain='switch',
                           entity_id=entity_id)
 
+    def test_get_events_minimal_state_events(self):
+        """Test that minimal state_changed events give the same entries."""
+        instance = self.hass.data[recorder.DATA_INSTANCE]
+        start = dt_util.utcnow()
+        self.hass.states.set('light.kitchen', STATE_OFF)
+        self.hass.states.set('light.kitchen', STATE_ON)
+        self.hass.block_till_done()
+        instance.block_till_done()
+
+        instance.minimal_state_events = True
+        self.hass.states.set('light.kitchen', STATE_OFF)
+        self.hass.states.set('light.kitchen', STATE_OFF, {'brightness': 5})
+        self.hass.states.set('light.hall', STATE_ON)
+        self.hass.block_till_done()
+        instance.block_till_done()
+
+        entries = list(logbook._get_events(
+            self.hass, {}, start, dt_util.utcnow() + timedelta(seconds=1)))
+
+        assert [(entry['entity_id'], entry['message'])
+                for entry in entries] == [
+                    ('light.kitchen', 'turned on'),
+                    ('light.kitchen', 'turned off')]
+
+    def test_states_filter(self):
+        """Test that the SQL filter matches the configured filters."""
+        from homeassistant.components.recorder.util import (
+            execute, session_scope)
+
+        instance = self.hass.data[recorder.DATA_INSTANCE]
+        start = dt_util.utcnow()
+        for entity_id in ('switch.a', 'switch.b', 'light.a', 'light.b',
+                          'alarm_control_panel.a'):
+            self.hass.states.set(entity_id, STATE_OFF)
+            self.hass.states.set(entity_id, STATE_ON)
+        logbook.log_entry(self.hass, 'Alarm', 'is triggered', 'switch',
+                          'switch.a')
+        self.hass.block_till_done()
+        instance.block_till_done()
+        end = dt_util.utcnow() + timedelta(seconds=1)
+
+        for config in (
+                {},
+                {'exclude': {'entities': ['switch.a']}},
+                {'exclude': {'domains': ['switch']}},
+                {'exclude': {'domains': ['switch']},
+                 'include': {'entities': ['switch.b']}},
+                {'include': {'domains': ['light']}},
+                {'include': {'domains': ['light'],
+                             'entities': ['switch.b']}},
+                {'include': {'entities': ['light.b']}},
+                {'include': {'domains': ['light', 'switch'],
+                             'entities': ['alarm_control_panel.a']},
+                 'exclude': {'domains': ['switch'],
+                             'entities': ['light.a']}}):
+            config = logbook.CONFIG_SCHEMA({logbook.DOMAIN: config})[
+                logbook.DOMAIN]
+            with session_scope(hass=self.hass) as session:
+                events = execute(
+                    logbook._events_query(session, {}, start, end),
+                    lambda row: row.Events.to_native(row.States))
+                filtered = execute(
+                    logbook._events_query(session, config, start, end),
+                    lambda row: row.Events.to_native(row.States))
+
+            expected = list(logbook._exclude_events(events, config))
+            assert list(logbook._exclude_events(filtered, config)) == \
+                expected
+            # Only the states of included entities are read
+            assert {event.data['entity_id'] for event in filtered
+                    if event.event_type == EVENT_STATE_CHANGED} == \
+                {event.data['entity_id'] for event in expected
+                 if event.event_type == EVENT_STATE_CHANGED}
+
+    def test_get_events_page(self):
+        """Test that pages end at the end of a batch of events."""
+        instance = self.hass.data[recorder.DATA_INSTANCE]
+        start = dt_util.utcnow().replace(
+            minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        for minutes in (1, 2, 3, 16, 17, 31):
+            instance.event_listener(ha.Event(
+                logbook.EVENT_LOGBOOK_ENTRY,
+                {logbook.ATTR_NAME: str(minutes), logbook.ATTR_MESSAGE: 'on'},
+                time_fired=start + timedelta(minutes=minutes)))
+        instance.block_till_done()
+        end = start + timedelta(hours=1)
+
+        pages = []
+        page_start = start
+        while page_start is not None:
+            entries, page_start = logbook._get_events_page(
+                self.hass, {}, page_start, end, 2)
+            pages.append(([entry['name'] for entry in entries], page_start))
+
+        assert pages == [
+            (['1', '2', '3'], start + timedelta(minutes=15)),
+            (['16', '17'], start + timedelta(minutes=30)),
+            (['31'], None)]
+        assert [entry['name'] for entry in logbook._get_events(
+            self.hass, {}, start, end)] == ['1', '2', '3', '16', '17', '31']
+
+        entries, page_start = logbook._get_events_page(
+            self.hass, {}, start + timedelta(minutes=15),
+            start + timedelta(minutes=30), 2)
+        assert [entry['name'] for entry in entries] == ['16', '17']
+        assert page_start is None
+
     def test_exclude_attribute_changes(self):
         """Test if events of attribute changes are filtered."""
         entity_id = 'switch.bla'
@@ -649,6 +757,138 @@ async def test_logbook_view_period_entity(hass, aiohttp_client):
     assert json[0]['entity_id'] == entity_id_test
 
 
+async def test_logbook_view_stream_and_pages(hass, aiohttp_client):
+    """Test the streamed and paged logbook view."""
+    await hass.async_add_job(init_recorder_component, hass)
+    await async_setup_component(hass, 'logbook', {})
+    await hass.components.recorder.wait_connection_ready()
+    start = dt_util.utcnow()
+    context = ha.Context()
+    hass.states.async_set('switch.test', STATE_OFF)
+    hass.states.async_set('switch.test', STATE_ON)
+    hass.states.async_set('switch.second', STATE_OFF)
+    hass.states.async_set('switch.second', STATE_ON, context=context)
+    await hass.async_block_till_done()
+    await hass.async_add_job(hass.data[recorder.DATA_INSTANCE].block_till_done)
+    client = await aiohttp_client(hass.http.app)
+    url = '/api/logbook/{}'.format(start.isoformat())
+
+    response = await client.get(url)
+    expected = await response.json()
+    assert len(expected) == 2
+
+    with patch('homeassistant.components.logbook.STREAM_CHUNK_SIZE', 1):
+        response = await client.get(url + '?stream')
+    assert response.status == 200
+    assert await response.json() == expected
+
+    response = await client.get(url + '?limit=100')
+    assert response.status == 200
+    assert await response.json() == {'entries': expected, 'continue': None}
+
+    response = await client.get(url + '?limit=1')
+    page = await response.json()
+    assert page['entries'] == expected
+    assert page['continue'].endswith('Z')
+    response = await client.get('{}?limit=1&continue={}'.format(
+        url, page['continue']))
+    assert await response.json() == {'entries': [], 'continue': None}
+
+    response = await client.get(url + '?context_id=' + context.id)
+    entries = await response.json()
+    assert len(entries) == 1
+    assert entries[0]['entity_id'] == 'switch.second'
+    assert entries[0]['context_id'] == context.id
+
+    response = await client.get(url + '?limit=0')
+    assert response.status == 400
+    response = await client.get(url + '?limit=1&continue=invalid')
+    assert response.status == 400
+
+
+async def test_materialized_entries(hass, hass_storage, aiohttp_client):
+    """Test that the written entries match the ones of the events."""
+    await hass.async_add_job(init_recorder_component, hass)
+    config = {'logbook': {'materialize': True,
+                          'exclude': {'entities': ['switch.excluded']}}}
+    await async_setup_component(hass, 'logbook', config)
+    await hass.components.recorder.wait_connection_ready()
+    instance = hass.data[recorder.DATA_INSTANCE]
+    assert hass_storage[logbook.STORAGE_KEY]['data']['since'] is not None
+
+    start = dt_util.utcnow().replace(
+        minute=0, second=0, microsecond=0) - timedelta(hours=1)
+
+    def state_changed(minutes, entity_id, old, new, attributes=None):
+        """Return a state_changed event fired minutes after start."""
+        when = start + timedelta(minutes=minutes)
+        return ha.Event(EVENT_STATE_CHANGED, {
+            'entity_id': entity_id,
+            'old_state': ha.State(entity_id, old, attributes, when, when),
+            'new_state': ha.State(entity_id, new, attributes, when, when),
+        }, time_fired=when)
+
+    for event in (
+            ha.Event(EVENT_HOMEASSISTANT_STOP, time_fired=start),
+            ha.Event(EVENT_HOMEASSISTANT_START,
+                     time_fired=start + timedelta(seconds=30)),
+            state_changed(1, 'switch.kitchen', STATE_OFF, STATE_ON),
+            state_changed(2, 'switch.excluded', STATE_OFF, STATE_ON),
+            state_changed(3, 'sensor.door', 'closed', 'open'),
+            state_changed(4, 'sensor.door', 'open', 'closed'),
+            state_changed(5, 'sensor.power', '1', '2', {
+                'unit_of_measurement': 'W'}),
+            state_changed(20, 'sensor.door', 'closed', 'open'),
+            ha.Event(logbook.EVENT_LOGBOOK_ENTRY, {
+                logbook.ATTR_NAME: 'Alarm',
+                logbook.ATTR_MESSAGE: 'is triggered',
+                logbook.ATTR_ENTITY_ID: 'switch.kitchen',
+            }, time_fired=start + timedelta(minutes=21)),
+            ha.Event(EVENT_HOMEASSISTANT_STOP,
+                     time_fired=start + timedelta(minutes=40))):
+        instance.event_listener(event)
+    await hass.async_add_job(instance.block_till_done)
+
+    end = start + timedelta(hours=1)
+    entries = await hass.async_add_job(
+        logbook._get_entries, hass, start, end)
+    assert entries == list(await hass.async_add_job(
+        logbook._get_events, hass,
+        logbook.CONFIG_SCHEMA(config)['logbook'], start, end))
+    assert [(entry['name'], entry['message']) for entry in entries] == [
+        ('Home Assistant', 'restarted'),
+        ('kitchen', 'turned on'),
+        ('door', 'changed to closed'),
+        ('door', 'changed to open'),
+        ('Alarm', 'is triggered'),
+        ('Home Assistant', 'stopped')]
+
+    entries = await hass.async_add_job(
+        logbook._get_entries, hass, start, end, 'sensor.door')
+    assert len(entries) == 2
+
+    client = await aiohttp_client(hass.http.app)
+    with patch('homeassistant.components.logbook._get_events') as events:
+        response = await client.get('/api/logbook/{}'.format(
+            dt_util.utcnow().isoformat()))
+        assert await response.json() == []
+        assert not events.called
+
+        await client.get('/api/logbook/{}'.format(start.isoformat()))
+        assert events.called
+
+
+async def test_materialize_disabled(hass, hass_storage):
+    """Test that the entries are no longer used once disabled."""
+    hass_storage[logbook.STORAGE_KEY] = {
+        'version': logbook.STORAGE_VERSION, 'key': logbook.STORAGE_KEY,
+        'data': {'since': dt_util.utcnow().isoformat()}}
+    await hass.async_add_job(init_recorder_component, hass)
+    await async_setup_component(hass, 'logbook', {})
+
+    assert hass_storage[logbook.STORAGE_KEY]['data'] == {'since': None}
+
+
 async def test_humanify_alexa_event(hass):
     """Test humanifying Alexa event."""
     hass.states.async_set('light.kitchen', 'on', {
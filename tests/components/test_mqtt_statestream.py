@@ -1,11 +1,15 @@
 """The tests for the MQTT statestream component."""
+from datetime import datetime, timedelta
 from unittest.mock import ANY, call, patch
 
 from homeassistant.setup import setup_component
 import homeassistant.components.mqtt_statestream as statestream
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
 from homeassistant.core import State
+import homeassistant.util.dt as dt_util
 
 from tests.common import (
+    fire_time_changed,
     get_test_home_assistant,
     mock_mqtt_component,
     mock_state_change_event
@@ -26,7 +30,7 @@ class TestMqttStateStream:
 
     def add_statestream(self, base_topic=None, publish_attributes=None,
                         publish_timestamps=None, publish_include=None,
-                        publish_exclude=None):
+                        publish_exclude=None, min_interval=None):
         """Add a mqtt_statestream component."""
         config = {}
         if base_topic:
@@ -39,6 +43,8 @@ class TestMqttStateStream:
             config['include'] = publish_include
         if publish_exclude:
             config['exclude'] = publish_exclude
+        if min_interval:
+            config['min_interval'] = min_interval
         return setup_component(self.hass, statestream.DOMAIN, {
             statestream.DOMAIN: config})
 
@@ -157,6 +163,72 @@ class TestMqttStateStream:
         mock_pub.assert_has_calls(calls, any_order=True)
         assert mock_pub.called
 
+    @patch('homeassistant.components.mqtt.async_publish')
+    @patch('homeassistant.core.dt_util.utcnow')
+    def test_state_changed_attr_skips_unchanged(self, mock_utcnow, mock_pub):
+        """Test that attributes are only published when they changed."""
+        e_id = 'fake.entity'
+
+        assert self.add_statestream(base_topic='pub', publish_attributes=True)
+        self.hass.block_till_done()
+
+        mock_state_change_event(
+            self.hass, State(e_id, 'on', attributes={'same': 1, 'other': 2}))
+        self.hass.block_till_done()
+        mock_pub.reset_mock()
+
+        mock_state_change_event(
+            self.hass, State(e_id, 'off', attributes={'same': 1, 'other': 3}))
+        self.hass.block_till_done()
+
+        assert mock_pub.mock_calls == [
+            call(self.hass, 'pub/fake/entity/state', 'off', 1, True),
+            call(self.hass, 'pub/fake/entity/other', '3', 1, True),
+        ]
+
+    @patch('homeassistant.components.mqtt.async_publish')
+    @patch('homeassistant.core.dt_util.utcnow')
+    def test_state_changed_event_min_interval(self, mock_utcnow, mock_pub):
+        """Test that only the latest state is published per min_interval."""
+        e_id = 'fake.entity'
+        now = datetime(2018, 10, 1, 12, tzinfo=dt_util.UTC)
+        mock_utcnow.return_value = now
+
+        assert self.add_statestream(base_topic='pub', min_interval=10)
+        self.hass.block_till_done()
+        mock_pub.reset_mock()
+
+        for state in ('1', '2', '3'):
+            mock_state_change_event(self.hass, State(e_id, state))
+        self.hass.block_till_done()
+
+        assert mock_pub.mock_calls == [
+            call(self.hass, 'pub/fake/entity/state', '1', 1, True)]
+        mock_pub.reset_mock()
+
+        fire_time_changed(self.hass, now + timedelta(seconds=9))
+        self.hass.block_till_done()
+        assert not mock_pub.called
+
+        mock_utcnow.return_value = now + timedelta(seconds=10)
+        fire_time_changed(self.hass, now + timedelta(seconds=10))
+        self.hass.block_till_done()
+
+        assert mock_pub.mock_calls == [
+            call(self.hass, 'pub/fake/entity/state', '3', 1, True)]
+        mock_pub.reset_mock()
+
+        # The final state is not lost on shutdown
+        mock_state_change_event(self.hass, State(e_id, '4'))
+        self.hass.block_till_done()
+        assert not mock_pub.called
+
+        self.hass.bus.fire(EVENT_HOMEASSISTANT_STOP)
+        self.hass.block_till_done()
+
+        assert mock_pub.mock_calls == [
+            call(self.hass, 'pub/fake/entity/state', '4', 1, True)]
+
     @patch('homeassistant.components.mqtt.async_publish')
     @patch('homeassistant.core.dt_util.utcnow')
     def test_state_changed_event_include_domain(self, mock_utcnow, mock_pub):
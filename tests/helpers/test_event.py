@@ -10,9 +10,12 @@ import pytest
 from homeassistant.core import callback
 from homeassistant.setup import setup_component
 import homeassistant.core as ha
-from homeassistant.const import MATCH_ALL
+from homeassistant.const import (
+    EVENT_STATE_CHANGED, EVENT_TIME_CHANGED, MATCH_ALL)
 from homeassistant.helpers.event import (
+    DATA_STATE_CHANGE_CALLBACKS,
     async_call_later,
+    async_track_point_in_utc_time,
     call_later,
     track_point_in_utc_time,
     track_point_in_time,
@@ -85,6 +88,45 @@ class TestEventHelpers(unittest.TestCase):
         self.hass.block_till_done()
         assert 2 == len(runs)
 
+    def test_track_point_in_time_scheduler(self):
+        """Test point in time listeners share a single time listener."""
+        birthday_paulus = datetime(1986, 7, 9, 12, 0, 0, tzinfo=dt_util.UTC)
+        runs = []
+
+        @callback
+        def reschedule(now):
+            runs.append('reschedule')
+            async_track_point_in_utc_time(
+                self.hass, callback(lambda x: runs.append('new')), now)
+
+        @callback
+        def failing(now):
+            raise ValueError
+
+        track_point_in_utc_time(
+            self.hass, callback(lambda x: runs.append('late')),
+            birthday_paulus + timedelta(seconds=2))
+        unsub = track_point_in_utc_time(
+            self.hass, callback(lambda x: runs.append('removed')),
+            birthday_paulus)
+        track_point_in_utc_time(self.hass, failing, birthday_paulus)
+        track_point_in_utc_time(self.hass, reschedule, birthday_paulus)
+
+        assert 1 == self.hass.bus.listeners[EVENT_TIME_CHANGED]
+
+        unsub()
+        # Removing twice is a no-op
+        unsub()
+
+        self._send_time_changed(birthday_paulus)
+        self.hass.block_till_done()
+        assert ['reschedule'] == runs
+
+        self._send_time_changed(birthday_paulus + timedelta(seconds=2))
+        self.hass.block_till_done()
+        assert ['reschedule', 'new', 'late'] == runs
+        assert EVENT_TIME_CHANGED not in self.hass.bus.listeners
+
     def test_track_state_change(self):
         """Test track_state_change."""
         # 2 lists to track how often our callbacks get called
@@ -164,6 +206,58 @@ class TestEventHelpers(unittest.TestCase):
         assert 5 == len(wildcard_runs)
         assert 6 == len(wildercard_runs)
 
+    def test_track_state_change_entity_index(self):
+        """Test state changes only reach listeners of that entity."""
+        kitchen_runs = []
+        bowl_runs = []
+
+        unsub_kitchen = track_state_change(
+            self.hass, ['light.Kitchen', 'light.kitchen'],
+            ha.callback(lambda *args: kitchen_runs.append(args)))
+        unsub_bowl = track_state_change(
+            self.hass, 'light.bowl',
+            ha.callback(lambda *args: bowl_runs.append(args)))
+
+        assert 1 == self.hass.bus.listeners[EVENT_STATE_CHANGED]
+        assert sorted(self.hass.data[DATA_STATE_CHANGE_CALLBACKS]) == \
+            ['light.bowl', 'light.kitchen']
+
+        self.hass.states.set('light.kitchen', 'on')
+        self.hass.block_till_done()
+        assert 1 == len(kitchen_runs)
+        assert 0 == len(bowl_runs)
+
+        unsub_kitchen()
+        assert list(self.hass.data[DATA_STATE_CHANGE_CALLBACKS]) == \
+            ['light.bowl']
+
+        self.hass.states.set('light.kitchen', 'off')
+        self.hass.states.set('light.bowl', 'on')
+        self.hass.block_till_done()
+        assert 1 == len(kitchen_runs)
+        assert 1 == len(bowl_runs)
+
+        unsub_bowl()
+        assert DATA_STATE_CHANGE_CALLBACKS not in self.hass.data
+        assert EVENT_STATE_CHANGED not in self.hass.bus.listeners
+
+    def test_track_state_change_entity_listener_error(self):
+        """Test a failing listener does not block other listeners."""
+        runs = []
+
+        @ha.callback
+        def failing_callback(entity_id, old_state, new_state):
+            raise ValueError
+
+        track_state_change(self.hass, 'light.bowl', failing_callback)
+        track_state_change(
+            self.hass, 'light.bowl',
+            ha.callback(lambda *args: runs.append(args)))
+
+        self.hass.states.set('light.bowl', 'on')
+        self.hass.block_till_done()
+        assert 1 == len(runs)
+
     def test_track_template(self):
         """Test tracking template."""
         specific_runs = []
@@ -605,6 +699,48 @@ class TestTrackTimeChange(unittest.TestCase):
         self.hass.block_till_done()
         assert 3 == len(specific_runs)
 
+    def test_periodic_task_clock_jump_forward(self):
+        """Test periodic tasks fire once when the clock jumps forward."""
+        specific_runs = []
+
+        unsub = track_utc_time_change(
+            self.hass, lambda x: specific_runs.append(x), minute=0,
+            second=0)
+
+        self._send_time_changed(datetime(2014, 5, 24, 22, 30, 0))
+        self.hass.block_till_done()
+        assert 0 == len(specific_runs)
+
+        self._send_time_changed(datetime(2014, 5, 25, 3, 30, 0))
+        self.hass.block_till_done()
+        assert [datetime(2014, 5, 25, 3, 30, 0)] == specific_runs
+
+        self._send_time_changed(datetime(2014, 5, 25, 3, 59, 59))
+        self.hass.block_till_done()
+        assert 1 == len(specific_runs)
+
+        self._send_time_changed(datetime(2014, 5, 25, 4, 0, 0))
+        self.hass.block_till_done()
+        assert 2 == len(specific_runs)
+
+        unsub()
+        assert EVENT_TIME_CHANGED not in self.hass.bus.listeners
+
+    def test_periodic_task_remove_before_time_changed(self):
+        """Test removing a periodic task before any time changed event."""
+        specific_runs = []
+
+        unsub = track_utc_time_change(
+            self.hass, lambda x: specific_runs.append(1), second=0)
+        assert 1 == self.hass.bus.listeners[EVENT_TIME_CHANGED]
+
+        unsub()
+        assert EVENT_TIME_CHANGED not in self.hass.bus.listeners
+
+        self._send_time_changed(datetime(2014, 5, 24, 22, 0, 0))
+        self.hass.block_till_done()
+        assert 0 == len(specific_runs)
+
     def test_periodic_task_wrong_input(self):
         """Test periodic tasks with wrong input."""
         specific_runs = []
@@ -737,6 +873,44 @@ class TestTrackTimeChange(unittest.TestCase):
 
         unsub()
 
+    def _run_minutes_across(self, start, **kwargs):
+        """Track a time pattern while sending an event every minute."""
+        runs = []
+        unsub = track_time_change(
+            self.hass, lambda x: runs.append(x), **kwargs)
+
+        for minutes in range(5 * 60):
+            self._send_time_changed(start + timedelta(minutes=minutes))
+            self.hass.block_till_done()
+
+        unsub()
+        return runs
+
+    def test_periodic_task_across_entering_dst(self):
+        """Test periodic tasks while the clock jumps from 02:00 to 03:00."""
+        dt_util.set_default_time_zone(dt_util.get_time_zone('Europe/Vienna'))
+        start = datetime(2018, 3, 24, 22, 0, 0, tzinfo=dt_util.UTC)
+
+        # 02:30 does not exist, 03:30 CEST is only an hour after 01:30 CET
+        assert [start + timedelta(hours=hours, minutes=30)
+                for hours in range(5)] == \
+            self._run_minutes_across(start, minute=30, second=0)
+        assert [] == self._run_minutes_across(
+            start, hour=2, minute=30, second=0)
+
+    def test_periodic_task_across_leaving_dst(self):
+        """Test periodic tasks while the clock goes from 03:00 to 02:00."""
+        dt_util.set_default_time_zone(dt_util.get_time_zone('Europe/Vienna'))
+        start = datetime(2018, 10, 27, 22, 0, 0, tzinfo=dt_util.UTC)
+
+        assert [start + timedelta(hours=hours, minutes=30)
+                for hours in range(5)] == \
+            self._run_minutes_across(start, minute=30, second=0)
+        # 02:30 exists twice, once in CEST and once in CET
+        assert [start + timedelta(hours=2, minutes=30),
+                start + timedelta(hours=3, minutes=30)] == \
+            self._run_minutes_across(start, hour=2, minute=30, second=0)
+
     def test_call_later(self):
         """Test calling an action later."""
         def action(): pass
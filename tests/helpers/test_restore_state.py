@@ -1,20 +1,22 @@
 """The tests for the Restore component."""
 import asyncio
-from datetime import timedelta
+from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock
 
 from homeassistant.setup import setup_component
-from homeassistant.const import EVENT_HOMEASSISTANT_START
+from homeassistant.const import (
+    EVENT_HOMEASSISTANT_START, EVENT_HOMEASSISTANT_STOP)
 from homeassistant.core import CoreState, split_entity_id, State
 import homeassistant.util.dt as dt_util
 from homeassistant.components import input_boolean, recorder
 from homeassistant.helpers.restore_state import (
-    async_get_last_state, DATA_RESTORE_CACHE)
+    async_get_last_state, DATA_RESTORE_CACHE, DUMP_INTERVAL, STORAGE_KEY,
+    STORAGE_VERSION)
 from homeassistant.components.recorder.models import RecorderRuns, States
 
 from tests.common import (
-    get_test_home_assistant, mock_coro, init_recorder_component,
-    mock_component)
+    async_fire_time_changed, get_test_home_assistant, mock_coro,
+    init_recorder_component, mock_component, mock_storage)
 
 
 @asyncio.coroutine
@@ -130,6 +132,59 @@ def test_cache_timeout(hass):
     assert state is None
 
 
+async def test_restore_stored_states(hass, hass_storage):
+    """Test that the cache is filled from the stored states."""
+    hass.state = CoreState.starting
+    hass_storage[STORAGE_KEY] = {
+        'version': STORAGE_VERSION, 'key': STORAGE_KEY,
+        'data': {'states': [
+            {'entity_id': 'input_boolean.b1', 'state': 'on',
+             'attributes': {'icon': 'mdi:power'},
+             'last_changed': '2018-10-17T08:00:00+00:00',
+             'last_updated': '2018-10-17T08:00:00+00:00',
+             'context': {'id': 'abc', 'user_id': None}},
+        ]}}
+
+    with patch('homeassistant.helpers.restore_state.last_recorder_run') \
+            as last_run:
+        state = await async_get_last_state(hass, 'input_boolean.b1')
+        assert await async_get_last_state(hass, 'input_boolean.b2') is None
+
+    assert not last_run.called
+    assert state.state == 'on'
+    assert state.attributes == {'icon': 'mdi:power'}
+    assert state.last_changed == datetime(2018, 10, 17, 8, tzinfo=dt_util.UTC)
+
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_START)
+    await hass.async_block_till_done()
+    assert DATA_RESTORE_CACHE not in hass.data
+
+
+async def test_dump_states(hass, hass_storage):
+    """Test that the states are dumped periodically and on stop."""
+    hass.state = CoreState.starting
+    assert await async_get_last_state(hass, 'input_boolean.b1') is None
+    hass.state = CoreState.running
+
+    hass.states.async_set('input_boolean.b1', 'on', {'since': datetime(
+        2018, 10, 17, 8, tzinfo=dt_util.UTC)})
+    async_fire_time_changed(hass, dt_util.utcnow() + DUMP_INTERVAL)
+    await hass.async_block_till_done()
+
+    states = hass_storage[STORAGE_KEY]['data']['states']
+    assert [(state['entity_id'], state['state'], state['attributes'])
+            for state in states] == [
+                ('input_boolean.b1', 'on',
+                 {'since': '2018-10-17T08:00:00+00:00'})]
+
+    hass.states.async_set('input_boolean.b1', 'off')
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+    await hass.async_block_till_done()
+
+    states = hass_storage[STORAGE_KEY]['data']['states']
+    assert states[0]['state'] == 'off'
+
+
 def _add_data_in_last_run(hass, entities):
     """Add test data in the last recorder_run."""
     # pylint: disable=protected-access
@@ -155,6 +210,7 @@ def _add_data_in_last_run(hass, entities):
                 created=t_min_1))
 
 
+@mock_storage()
 def test_filling_the_cache():
     """Test filling the cache from the DB."""
     test_entity_id1 = 'input_boolean.b1'
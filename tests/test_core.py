@@ -21,7 +21,8 @@ from homeassistant.const import (
     __version__, EVENT_STATE_CHANGED, ATTR_FRIENDLY_NAME, CONF_UNIT_SYSTEM,
     ATTR_NOW, EVENT_TIME_CHANGED, EVENT_TIMER_OUT_OF_SYNC, ATTR_SECONDS,
     EVENT_HOMEASSISTANT_STOP, EVENT_HOMEASSISTANT_CLOSE,
-    EVENT_SERVICE_REGISTERED, EVENT_SERVICE_REMOVED, EVENT_SERVICE_EXECUTED)
+    EVENT_SERVICE_REGISTERED, EVENT_SERVICE_REMOVED, EVENT_SERVICE_EXECUTED,
+    EVENT_CALL_SERVICE, ATTR_SERVICE_CALL_ID)
 
 from tests.common import get_test_home_assistant, async_mock_service
 
@@ -524,6 +525,31 @@ class TestStateMachine(unittest.TestCase):
         states = sorted(state.entity_id for state in self.states.all())
         assert ['light.bowl', 'switch.ac'] == states
 
+        states = [state.entity_id for state in self.states.all('Light')]
+        assert ['light.bowl'] == states
+
+        assert [] == self.states.all('sensor')
+
+    def test_domain_index(self):
+        """Test domain scoped counts and iteration follow set and remove."""
+        self.states.set('light.kitchen', 'off')
+        self.states.set('light.bowl', 'off')
+
+        assert 3 == self.states.async_entity_ids_count()
+        assert 2 == self.states.async_entity_ids_count('light')
+        assert ['light.bowl', 'light.kitchen'] == sorted(
+            state.entity_id
+            for state in self.states.async_domain_states('light'))
+        assert 'off' == self.states.get('light.bowl').state
+
+        self.states.remove('light.bowl')
+        self.states.remove('switch.ac')
+
+        assert 1 == self.states.async_entity_ids_count()
+        assert ['light.kitchen'] == self.states.entity_ids('light')
+        assert 0 == self.states.async_entity_ids_count('switch')
+        assert [] == list(self.states.async_domain_states('switch'))
+
     def test_remove(self):
         """Test remove method."""
         events = []
@@ -1006,3 +1032,71 @@ async def test_service_executed_with_subservices(hass):
     assert [call.service for call in calls] == [
         'outer', 'inner', 'inner', 'outer']
     assert len(hass.bus.async_listeners().get(EVENT_SERVICE_EXECUTED, [])) == 0
+
+
+async def test_service_call_fires_events(hass):
+    """Test a direct service call still fires the service events."""
+    calls = async_mock_service(hass, 'test', 'service')
+    call_events = []
+    executed_events = []
+
+    hass.bus.async_listen(
+        EVENT_CALL_SERVICE, ha.callback(lambda e: call_events.append(e)))
+    hass.bus.async_listen(
+        EVENT_SERVICE_EXECUTED,
+        ha.callback(lambda e: executed_events.append(e)))
+
+    assert await hass.services.async_call('test', 'service', {'hello': 1},
+                                          blocking=True)
+    await hass.async_block_till_done()
+
+    assert len(calls) == 1
+    assert len(call_events) == 1
+    assert call_events[0].data['service_data'] == {'hello': 1}
+    assert len(executed_events) == 1
+    assert executed_events[0].data[ATTR_SERVICE_CALL_ID] == \
+        call_events[0].data[ATTR_SERVICE_CALL_ID]
+    assert executed_events[0].context is call_events[0].context
+    assert hass.bus.async_listeners()[EVENT_SERVICE_EXECUTED] == 1
+
+
+async def test_service_call_from_event(hass):
+    """Test services are still executed from call_service events."""
+    calls = async_mock_service(hass, 'test', 'service')
+
+    hass.bus.async_fire(EVENT_CALL_SERVICE, {
+        'domain': 'test',
+        'service': 'service',
+        'service_data': {'hello': 1},
+    })
+    await hass.async_block_till_done()
+
+    assert len(calls) == 1
+    assert calls[0].data == {'hello': 1}
+
+
+async def test_service_call_failing_service(hass):
+    """Test a blocking call to a failing service returns False."""
+    async def handle_service(call):
+        """Raise an error."""
+        raise ValueError
+
+    hass.services.async_register('test', 'failing', handle_service)
+
+    with patch('homeassistant.core.SERVICE_CALL_LIMIT', 10**6):
+        assert not await hass.services.async_call(
+            'test', 'failing', blocking=True)
+
+
+async def test_service_call_executed_elsewhere(hass):
+    """Test a blocking call resolves from another registry's event."""
+    @ha.callback
+    def remote_registry(event):
+        """Answer the call like a remote registry."""
+        hass.bus.async_fire(EVENT_SERVICE_EXECUTED, {
+            ATTR_SERVICE_CALL_ID: event.data[ATTR_SERVICE_CALL_ID]})
+
+    hass.bus.async_listen(EVENT_CALL_SERVICE, remote_registry)
+
+    assert await hass.services.async_call('remote', 'service', blocking=True)
+    assert EVENT_SERVICE_EXECUTED not in hass.bus.async_listeners()